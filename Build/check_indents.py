@@ -3,56 +3,232 @@
 ##
 # check_indents.py: If a file has both space and tab indenting, returns an exit
 #     code and normalizes \t to four spaces.
+#
+#     Files are either given on the command line, or found by walking a
+#     directory with --walk, skipping files matched by .gitignore or by
+#     --ignore. With --jobs, files are checked in parallel, and with --cache,
+#     files that were clean when last checked and whose size and modification
+#     time, or contents, have not changed since are skipped. For example:
+#
+#         python Build/check_indents.py --walk . --jobs 0 --cache .check-indents-cache.json --stats
 ##
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 ##
 
+import fnmatch
+import hashlib
+import json
+import os
 import re
-from typing import Tuple
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 
-def find_whitespace(string : str) -> Tuple[str, str]:
-    groups = re.match(r'(\s*)([^\s].*$)?', string, flags=re.S).groups()
-    return groups[0], groups[1] or ''
+# Extensions of the files checked by --walk.
+DEFAULT_EXTENSIONS = ('.qs', '.cs', '.py', '.ipynb')
+# Directories never walked into.
+DEFAULT_IGNORE = ('.git', 'bin', 'obj', 'node_modules', '__pycache__')
+
+# Leading whitespace, in the sense of str.isspace, not including the end
+# of the line.
+_LEADING_TAB = re.compile(rb'^[ \t\r\f\v]*\t', flags=re.M)
+_LEADING_SPACE = re.compile(rb'^[ \t\r\f\v]* ', flags=re.M)
+_LEADING_WHITESPACE = re.compile(rb'^[ \t\r\f\v]+', flags=re.M)
+
+def has_mixed_indents(contents : bytes) -> bool:
+    """
+    Returns True if some lines of contents start with whitespace containing a
+    tab, and some with whitespace containing a space. Each search stops at
+    the first match, and the search for spaces is skipped unless a tab was
+    found.
+    """
+    return b'\t' in contents and \
+        _LEADING_TAB.search(contents) is not None and \
+        _LEADING_SPACE.search(contents) is not None
+
+def normalize_indents(contents : bytes) -> bytes:
+    """ Replaces each tab in the leading whitespace of each line by four spaces. """
+    return _LEADING_WHITESPACE.sub(lambda match: match.group().replace(b'\t', b'    '), contents)
+
+def write_atomically(filename : str, contents : bytes) -> None:
+    # Write to a temporary file next to the original first, so that an
+    # interrupted run never leaves a partially written file behind.
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), prefix=".check_indents-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contents)
+        shutil.copymode(filename, temp_path)
+        os.replace(temp_path, filename)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
 
 def check_file(filename : str) -> bool:
     """
     Checks a single file, returning True and writing a cleaned file if a mix
     of tabs and spaces was found.
     """
-    problem_found = False
-    found_spaces = False
-    found_tabs = False
+    return _check_file(filename)[1]
 
-    with open(filename, 'r') as f:
-        contents = list(f.readlines())
-
-    for line in contents:
-        # Find the leading whitespace.
-        whitespace, rest = find_whitespace(line)
-        found_spaces = found_spaces or (' ' in whitespace)
-        found_tabs = found_tabs or ('\t' in whitespace)
-
-    problem_found = found_spaces and found_tabs
+def _check_file(filename : str) -> Tuple[str, bool, Optional[str]]:
+    # Returns the file name, whether a mix of tabs and spaces was found, and
+    # the hash of the contents of the file once clean.
+    with open(filename, 'rb') as f:
+        contents = f.read()
 
+    problem_found = has_mixed_indents(contents)
     if problem_found:
         print(f"Found mixed spaces and tabs in {filename}.")
         # Time to normalize!
-        with open(filename, 'w') as f:
-            f.writelines(
-                whitespace.replace('\t', '    ') + rest
-                for whitespace, rest in map(find_whitespace, contents)
-            )
+        contents = normalize_indents(contents)
+        write_atomically(filename, contents)
+
+    return filename, problem_found, hashlib.sha256(contents).hexdigest()
+
+def read_ignore_patterns(root : str) -> List[str]:
+    """ Reads the patterns of the .gitignore file at root, if any, except negations. """
+    try:
+        with open(os.path.join(root, '.gitignore'), 'r') as f:
+            lines = [line.strip() for line in f]
+    except OSError:
+        return []
+    return [line for line in lines if line and not line.startswith(('#', '!'))]
+
+def is_ignored(relative_path : str, is_dir : bool, patterns : List[str]) -> bool:
+    name = os.path.basename(relative_path)
+    for pattern in patterns:
+        if pattern.endswith('/'):
+            if not is_dir:
+                continue
+            pattern = pattern.rstrip('/')
+        if pattern.startswith('/'):
+            # Anchored patterns only match paths relative to the root.
+            if fnmatch.fnmatch(relative_path, pattern[1:]):
+                return True
+        elif fnmatch.fnmatch(name, pattern) or ('/' in pattern and fnmatch.fnmatch(relative_path, pattern)):
+            return True
+    return False
+
+def walk_files(root : str, extensions=DEFAULT_EXTENSIONS, ignore : List[str] = ()) -> Iterator[str]:
+    """ Yields the files under root with the given extensions that are not ignored. """
+    patterns = list(DEFAULT_IGNORE) + read_ignore_patterns(root) + list(ignore)
+    for dirpath, dirnames, filenames in os.walk(root):
+        relative_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+        relative_dir = '' if relative_dir == '.' else relative_dir + '/'
+        # Prune ignored directories in place, so that they are not walked.
+        dirnames[:] = sorted(
+            dirname for dirname in dirnames if not is_ignored(relative_dir + dirname, True, patterns)
+        )
+        for filename in sorted(filenames):
+            if filename.endswith(tuple(extensions)) and not is_ignored(relative_dir + filename, False, patterns):
+                yield os.path.join(dirpath, filename)
 
-    return problem_found
+class CleanFileCache:
+    """
+    Remembers the size, modification time and hash of files that were found
+    to be clean, in a JSON file, such that unchanged files need not be
+    checked again.
+    """
+
+    def __init__(self, path : Optional[str]):
+        self.path = path
+        self.entries : Dict[str, list] = {}
+        if path is not None:
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def is_clean(self, filename : str) -> bool:
+        key = os.path.abspath(filename)
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        stat = os.stat(filename)
+        size, mtime_ns, digest = entry
+        if stat.st_size != size:
+            return False
+        if stat.st_mtime_ns == mtime_ns:
+            return True
+        # The file was touched, e.g. by checking out a branch; it is still
+        # clean if its contents are unchanged.
+        with open(filename, 'rb') as f:
+            if hashlib.sha256(f.read()).hexdigest() != digest:
+                return False
+        self.entries[key] = [size, stat.st_mtime_ns, digest]
+        return True
+
+    def mark_clean(self, filename : str, digest : str) -> None:
+        stat = os.stat(filename)
+        self.entries[os.path.abspath(filename)] = [stat.st_size, stat.st_mtime_ns, digest]
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), prefix=".check_indents-")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, self.path)
+
+def check_files(filenames : List[str], jobs : int = 1, cache : Optional[CleanFileCache] = None) -> Dict[str, int]:
+    """
+    Checks files, in a pool of `jobs` worker processes if jobs is not 1 (0
+    to use all cores), skipping files that the cache knows to be clean.
+    Returns counts of the files checked, skipped and fixed.
+    """
+    cache = cache or CleanFileCache(None)
+    pending = [filename for filename in filenames if not cache.is_clean(filename)]
+    stats = {'files': len(filenames), 'scanned': len(pending), 'skipped': len(filenames) - len(pending), 'fixed': 0}
+
+    if jobs == 1 or len(pending) < 2:
+        results = map(_check_file, pending)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs or None)
+        results = executor.map(_check_file, pending, chunksize=max(1, min(64, len(pending) // (4 * (jobs or os.cpu_count())))))
+    try:
+        for filename, problem_found, digest in results:
+            stats['fixed'] += problem_found
+            cache.mark_clean(filename, digest)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    cache.save()
+    return stats
 
 if __name__ == "__main__":
+    import argparse
     import sys
-    filenames = sys.argv[1:]
-    exit_code = 0
+    import time
+
+    parser = argparse.ArgumentParser(
+        description="Find files indented with both tabs and spaces, and normalize their tabs to four spaces.")
+    parser.add_argument('filenames', nargs='*', help='files to check.')
+    parser.add_argument('--walk', metavar='ROOT', default=None,
+        help='also check every file under ROOT with one of the extensions, except ignored files.')
+    parser.add_argument('--extensions', nargs='+', default=list(DEFAULT_EXTENSIONS),
+        help=f'with --walk, extensions of the files to check.(default={" ".join(DEFAULT_EXTENSIONS)})')
+    parser.add_argument('--ignore', nargs='+', default=[],
+        help='with --walk, further .gitignore-style patterns of files and directories to skip.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+        help='number of worker processes, or 0 to use all cores.(default=1)')
+    parser.add_argument('--cache', default=None,
+        help='JSON file remembering clean files, so that unchanged files are skipped.(default: none)')
+    parser.add_argument('--stats', action='store_true', default=False,
+        help='print how many files were scanned, skipped and fixed, and the time taken.')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    filenames = list(args.filenames)
+    if args.walk is not None:
+        filenames += walk_files(args.walk, args.extensions, args.ignore)
+    stats = check_files(filenames, args.jobs, CleanFileCache(args.cache))
 
-    for filename in filenames:
-        if check_file(filename):
-            exit_code = -1
+    if args.stats:
+        print(f"{stats['files']} files: {stats['scanned']} scanned, {stats['skipped']} skipped via cache, "
+              f"{stats['fixed']} fixed, in {time.perf_counter() - start:.2f} s.")
 
-    sys.exit(exit_code)
+    sys.exit(-1 if stats['fixed'] else 0)
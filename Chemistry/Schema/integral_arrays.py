@@ -0,0 +1,153 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Vectorized checks for the sparse integral arrays stored in Broombridge
+instances, such as `one_electron_integrals.values`, whose rows are of the
+form [i, j, v], and `two_electron_integrals.values`, whose rows are of the
+form [i, j, k, l, v].
+"""
+
+import numpy as np
+
+# Number of orbital indices in each row of a given integral block.
+N_INDICES = {
+    'one_electron_integrals': 2,
+    'two_electron_integrals': 4
+}
+
+# Maximum number of offending rows to list in each problem report.
+MAX_REPORTED_ROWS = 10
+
+def canonicalize(indices):
+    """
+    Given an array of shape (n_rows, 2) or (n_rows, 4) of orbital indices,
+    returns a new array in which each row has been replaced by the
+    representative of its orbit under permutational symmetry.
+
+    For one-electron integrals (i, j), the representative is
+    (max(i, j), min(i, j)). For two-electron integrals (ij|kl) in Mulliken
+    convention, the 8-fold symmetry i ↔ j, k ↔ l and (ij) ↔ (kl) is used,
+    and the representative is the lexicographically largest of the eight
+    equivalent index tuples.
+    """
+    if indices.shape[1] == 2:
+        return np.sort(indices, axis=1)[:, ::-1]
+
+    pairs = np.sort(indices.reshape(-1, 2, 2), axis=2)[:, :, ::-1]
+    first, second = pairs[:, 0, :], pairs[:, 1, :]
+    swap = (first[:, 0] < second[:, 0]) | (
+        (first[:, 0] == second[:, 0]) & (first[:, 1] < second[:, 1])
+    )
+    return np.where(
+        swap[:, np.newaxis],
+        np.concatenate([second, first], axis=1),
+        np.concatenate([first, second], axis=1)
+    )
+
+def find_conflicts(canonical_indices, values, atol=1e-8):
+    """
+    Returns the row numbers of each row that repeats the canonical index
+    tuple of an earlier row, but with a value that differs from that of
+    the other rows in its orbit by more than atol.
+    """
+    _, first_rows, orbits = np.unique(
+        canonical_indices, axis=0, return_index=True, return_inverse=True
+    )
+    orbits = orbits.reshape(-1)
+    lowest = np.full(len(first_rows), np.inf)
+    highest = np.full(len(first_rows), -np.inf)
+    np.fmin.at(lowest, orbits, values)
+    np.fmax.at(highest, orbits, values)
+
+    is_repeat = np.ones(len(values), dtype=bool)
+    is_repeat[first_rows] = False
+    return np.flatnonzero(is_repeat & (highest - lowest > atol)[orbits])
+
+def to_arrays(rows, n_indices):
+    """
+    Converts the rows of an integral block into a pair of typed arrays
+    (indices, values), with dtypes int64 and float64 respectively.
+
+    Returns a tuple (indices, values, problems), where problems is a list of
+    (message, row_numbers) tuples. If any rows do not have the right shape
+    or types, indices and values are None.
+    """
+    n_columns = n_indices + 1
+    lengths = np.fromiter(
+        (len(row) if isinstance(row, list) else -1 for row in rows),
+        dtype=np.int64, count=len(rows)
+    )
+    bad_shape = np.flatnonzero(lengths != n_columns)
+    if bad_shape.size:
+        return None, None, [
+            (f"rows must be lists of {n_indices} indices followed by a value", bad_shape)
+        ]
+
+    table = np.empty((len(rows), n_columns), dtype=object)
+    table[:] = rows
+    kinds = np.frompyfunc(type, 1, 1)(table)
+
+    problems = []
+    bad_indices = np.flatnonzero(np.any(kinds[:, :n_indices] != int, axis=1))
+    if bad_indices.size:
+        problems.append(("indices must be integers", bad_indices))
+    bad_values = np.flatnonzero((kinds[:, n_indices] != int) & (kinds[:, n_indices] != float))
+    if bad_values.size:
+        problems.append(("values must be numbers", bad_values))
+    if problems:
+        return None, None, problems
+
+    return (
+        table[:, :n_indices].astype(np.int64),
+        table[:, n_indices].astype(np.float64),
+        problems
+    )
+
+def check_integrals(rows, block, n_orbitals=None):
+    """
+    Checks the rows of a single integral block, returning a list of
+    (message, row_numbers) tuples describing each problem found.
+
+    Besides the shape and types of each row, this checks that each value is
+    finite, that each index lies between 1 and n_orbitals (when given), and
+    that rows which are equivalent under permutational symmetry agree on
+    their value. Such rows are allowed to repeat, as many generators list
+    both (i, j) and (j, i) for one-electron integrals.
+    """
+    indices, values, problems = to_arrays(rows, N_INDICES[block])
+    if indices is None or not len(rows):
+        return problems
+
+    non_finite = np.flatnonzero(~np.isfinite(values))
+    if non_finite.size:
+        problems.append(("values must be finite", non_finite))
+
+    upper = np.inf if n_orbitals is None else n_orbitals
+    out_of_range = np.flatnonzero(np.any((indices < 1) | (indices > upper), axis=1))
+    if out_of_range.size:
+        problems.append((
+            "indices must be at least 1" + (
+                "" if n_orbitals is None else f" and at most n_orbitals = {n_orbitals}"
+            ),
+            out_of_range
+        ))
+
+    conflicts = find_conflicts(canonicalize(indices), values)
+    if conflicts.size:
+        problems.append((
+            "rows that are equivalent under permutational symmetry must have the same value",
+            conflicts
+        ))
+
+    return problems
+
+def format_problem(message, row_numbers, location):
+    """
+    Formats a problem reported by check_integrals as a human-readable
+    message, listing the first few offending rows.
+    """
+    listed = ", ".join(str(row) for row in row_numbers[:MAX_REPORTED_ROWS])
+    if len(row_numbers) > MAX_REPORTED_ROWS:
+        listed += f", ... ({len(row_numbers)} rows in total)"
+    return f"In {location}, {message}.\n\nOffending rows: {listed}"
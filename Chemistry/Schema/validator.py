@@ -9,51 +9,393 @@ except ImportError:
     except ImportError:
         import yaml
 
+import hashlib
 import json
+import os
+import time
 import jsonschema
 import click
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from sys import exit, stderr
 from glob import glob
 
+broombridge_v0_1 = "broombridge-0.1.schema.json"
+broombridge_v0_2 = "broombridge-0.2.schema.json"
+
+# Compiled validators, and hashes of their schemas, keyed by schema path.
+# These are populated once per process by load_validators, so that each
+# schema is only checked and compiled a single time, rather than once for
+# every instance.
+_validators = {}
+_schema_hashes = {}
+_default_schema = None
+
+# How thoroughly each mode validates files. Cached results are only replayed
+# for runs in a mode that is at most as strict as the one that produced them.
+MODE_STRICTNESS = {'plain': 0, 'streaming': 0, 'arrays': 1}
+
+def load_validators(schema_paths, default_schema):
+    """
+    Loads, checks and compiles each of the given schemas, returning a
+    dictionary from schema paths to hashes of their contents.
+    """
+    global _default_schema
+    _default_schema = default_schema
+    for schema_path in schema_paths:
+        if schema_path in _validators:
+            continue
+        with open(schema_path, 'rb') as f:
+            raw_schema = f.read()
+        schema_data = json.loads(raw_schema)
+        validator_class = jsonschema.validators.validator_for(schema_data)
+        validator_class.check_schema(schema_data)
+        _validators[schema_path] = validator_class(schema_data)
+        _schema_hashes[schema_path] = hashlib.sha256(raw_schema).hexdigest()
+    return {schema_path: _schema_hashes[schema_path] for schema_path in schema_paths}
+
+def get_schema_name(instance_data):
+    """
+    Returns the path of the schema that a given instance should be
+    validated against, based on its format version.
+    """
+    version_number = instance_data['format']['version']
+    if version_number == "0.1":
+        return broombridge_v0_1
+    elif version_number == "0.2":
+        return broombridge_v0_2
+    else:
+        return _default_schema
+
+def is_integral_values(path):
+    """
+    Returns True if a path into a Broombridge instance points to the values
+    of an integral block, such as
+    ('problem_description', 0, 'hamiltonian', 'two_electron_integrals', 'values').
+    """
+    return len(path) >= 3 and path[-1] == 'values' and path[-3] == 'hamiltonian'
+
+def validate_rows(schema_name, path, offset, rows):
+    """
+    Validates a chunk of rows from the integral block at the given path,
+    returning the most relevant error (if any) with its path rewritten to
+    point at the offending row of the full instance.
+
+    The rows are placed into an otherwise empty stand-in instance, so that
+    the compiled validator for the whole schema can be reused; errors that
+    are not about the rows themselves are discarded.
+    """
+    stand_in = rows
+    for key in reversed(path):
+        stand_in = [stand_in] if isinstance(key, int) else {key: stand_in}
+    prefix = [0 if isinstance(key, int) else key for key in path]
+
+    row_errors = [
+        error for error in _validators[schema_name].iter_errors(stand_in)
+        if list(error.absolute_path)[:len(prefix)] == prefix and
+           len(error.absolute_path) > len(prefix)
+    ]
+    error = jsonschema.exceptions.best_match(row_errors)
+    if error is not None:
+        row_path = list(error.absolute_path)[len(prefix):]
+        row_path[0] += offset
+        error.path.clear()
+        error.path.extend(list(path) + row_path)
+    return error
+
+class StreamingValidator(object):
+    """
+    Walks the YAML parser events for a single Broombridge instance,
+    building only the small structural part of the document. The rows of
+    each integral `values` array are never held in full, but are instead
+    validated in chunks of at most `chunk_size` rows as they are parsed.
+    """
+
+    def __init__(self, stream, chunk_size):
+        self.loader = yaml.SafeLoader(stream)
+        self.chunk_size = chunk_size
+        self.schema_name = None
+        self.deferred_rows = False
+        self.row_error = None
+
+    def run(self):
+        self.loader.get_event() # StreamStartEvent
+        self.loader.get_event() # DocumentStartEvent
+        document = self.construct(())
+        self.loader.dispose()
+        return document
+
+    def construct(self, path):
+        event = self.loader.get_event()
+        if isinstance(event, yaml.ScalarEvent):
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = self.loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+            node = yaml.ScalarNode(tag, event.value, style=event.style)
+            constructor = self.loader.yaml_constructors.get(
+                tag, self.loader.yaml_constructors[None]
+            )
+            value = constructor(self.loader, node)
+            if path == ('format', 'version'):
+                self.schema_name = get_schema_name({'format': {'version': value}})
+            return value
+
+        elif isinstance(event, yaml.MappingStartEvent):
+            mapping = {}
+            while not self.loader.check_event(yaml.MappingEndEvent):
+                key = self.construct(path + (None,))
+                mapping[key] = self.construct(path + (key,))
+            self.loader.get_event()
+            return mapping
+
+        elif isinstance(event, yaml.SequenceStartEvent):
+            if is_integral_values(path):
+                self.stream_rows(path)
+                return []
+            sequence = []
+            while not self.loader.check_event(yaml.SequenceEndEvent):
+                sequence.append(self.construct(path + (len(sequence),)))
+            self.loader.get_event()
+            return sequence
+
+        raise yaml.YAMLError(
+            f"Unsupported YAML event {event} at {event.start_mark}; "
+            "streaming validation does not support anchors or aliases."
+        )
+
+    def stream_rows(self, path):
+        # We can't check rows until we know which schema to check them
+        # against; if the format version hasn't been seen yet, we skip the
+        # rows and let the caller make a second pass.
+        check = self.schema_name is not None
+        self.deferred_rows = self.deferred_rows or not check
+        offset = 0
+        chunk = []
+        while not self.loader.check_event(yaml.SequenceEndEvent):
+            chunk.append(self.construct(path + (offset + len(chunk),)))
+            if len(chunk) == self.chunk_size:
+                if check:
+                    self.check_rows(path, offset, chunk)
+                offset += len(chunk)
+                chunk = []
+        if chunk and check:
+            self.check_rows(path, offset, chunk)
+        self.loader.get_event()
+
+    def check_rows(self, path, offset, rows):
+        if self.row_error is None:
+            self.row_error = validate_rows(self.schema_name, path, offset, rows)
+
+def validate_stream(instance_path, chunk_size):
+    with open(instance_path, 'rb') as f:
+        walker = StreamingValidator(f, chunk_size)
+        skeleton = walker.run()
+    schema_name = get_schema_name(skeleton)
+
+    if walker.deferred_rows:
+        with open(instance_path, 'rb') as f:
+            walker = StreamingValidator(f, chunk_size)
+            walker.schema_name = schema_name
+            walker.run()
+
+    # Structural problems take precedence over problems with individual
+    # rows, as they are more likely to explain what went wrong.
+    error = jsonschema.exceptions.best_match(
+        _validators[schema_name].iter_errors(skeleton)
+    ) or walker.row_error
+    return schema_name, error
+
+def validate_arrays(instance_data):
+    """
+    Validates an instance by checking its integral arrays in vectorized
+    form with NumPy, leaving only the remaining structure of the instance to
+    be checked by jsonschema.
+    """
+    # NumPy is only needed for this mode, so we import it on first use.
+    import integral_arrays
+
+    schema_name = get_schema_name(instance_data)
+    problems = []
+    for problems_key in ('integral_sets', 'problem_description'):
+        problem_list = instance_data.get(problems_key)
+        if not isinstance(problem_list, list):
+            continue
+        for idx_problem, problem in enumerate(problem_list):
+            hamiltonian = problem.get('hamiltonian') if isinstance(problem, dict) else None
+            if not isinstance(hamiltonian, dict):
+                continue
+            for block in integral_arrays.N_INDICES:
+                integrals = hamiltonian.get(block)
+                if not isinstance(integrals, dict) or not isinstance(integrals.get('values'), list):
+                    continue
+                rows = integrals['values']
+                integrals['values'] = []
+                n_orbitals = problem.get('n_orbitals')
+                location = f"instance[{problems_key!r}][{idx_problem}]['hamiltonian'][{block!r}]['values']"
+                problems.extend(
+                    integral_arrays.format_problem(message, row_numbers, location)
+                    for message, row_numbers in integral_arrays.check_integrals(
+                        rows, block, n_orbitals if isinstance(n_orbitals, int) else None
+                    )
+                )
+
+    error = jsonschema.exceptions.best_match(
+        _validators[schema_name].iter_errors(instance_data)
+    )
+    if error is None and problems:
+        error = "\n\n".join(problems)
+    return schema_name, error
+
+def validate_file(instance_path, streaming=False, chunk_size=4096, arrays=False):
+    """
+    Validates a single YAML file using the compiled validators, returning
+    a tuple (instance_path, schema_name, error), where error is None if the
+    file is a valid instance.
+
+    If streaming is True, the file is validated from parser events without
+    ever loading the integral arrays into memory all at once. Otherwise, if
+    arrays is True, integral arrays are checked using NumPy, including
+    checks that cannot be expressed by the schema itself.
+    """
+    if streaming:
+        schema_name, error = validate_stream(instance_path, chunk_size)
+    elif arrays:
+        with open(instance_path, 'rb') as f:
+            schema_name, error = validate_arrays(yaml.safe_load(f))
+    else:
+        with open(instance_path, 'rb') as f:
+            instance_data = yaml.safe_load(f)
+
+        schema_name = get_schema_name(instance_data)
+        error = jsonschema.exceptions.best_match(
+            _validators[schema_name].iter_errors(instance_data)
+        )
+    return instance_path, schema_name, None if error is None else str(error)
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_cache(cache_path):
+    if cache_path is None or not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, 'r') as f:
+        return json.load(f)
+
+def save_cache(cache_path, cache):
+    # Write to a temporary file first, so that an interrupted run never
+    # leaves a truncated cache behind.
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(temp_path, cache_path)
+
 @click.command()
 @click.argument("instance", type=str)
 @click.argument("schema", type=str, default="broombridge-0.2.schema.json")
-def validate(instance, schema):
+@click.option("--jobs", "-j", type=int, default=1,
+    help="Number of worker processes to validate with (0 uses all cores).")
+@click.option("--cache", "cache_path", type=click.Path(dir_okay=False), default=None,
+    help="JSON file in which to persist results; files whose content and "
+         "schema are unchanged since the last run are skipped.")
+@click.option("--streaming", is_flag=True, default=False,
+    help="Validate from YAML parser events, checking integral values in "
+         "chunks so that memory use does not grow with the size of the file.")
+@click.option("--chunk-size", type=int, default=4096,
+    help="Number of integral rows to validate at a time when streaming.")
+@click.option("--arrays", is_flag=True, default=False,
+    help="Check integral arrays with NumPy, including index ranges and "
+         "consistency under permutational symmetry.")
+def validate(instance, schema, jobs, cache_path, streaming, chunk_size, arrays):
     """
     Given a YAML-serialized object, determines if
     that object is a valid instance of a given schema.
     """
+    if streaming and arrays:
+        raise click.UsageError("--streaming and --arrays cannot be used together.")
+
     failed = []
-    schema_data = {}
-    broombridge_v0_1 = "broombridge-0.1.schema.json"
-    broombridge_v0_2 = "broombridge-0.2.schema.json"
-    
-    # Get version number
-    def get_schema_name(instance_data):
-        version_number = instance_data['format']['version']
-        if version_number == "0.1":
-            return broombridge_v0_1
-        elif version_number == "0.2":
-            return broombridge_v0_2
-        else:
-            return schema
+    start = time.perf_counter()
+    mode = 'arrays' if arrays else 'streaming' if streaming else 'plain'
 
-    for schema_path in [schema, broombridge_v0_1, broombridge_v0_2]:
-        with open(schema_path, 'r') as f:
-            schema_data[schema_path] = json.load(f)
+    schema_paths = [schema, broombridge_v0_1, broombridge_v0_2]
+    schema_hashes = load_validators(schema_paths, schema)
+    cache = load_cache(cache_path)
 
+    # Sort out which files actually need validating, replaying cached
+    # results for the rest.
+    results = []
+    pending = []
+    instance_hashes = {}
+    # The mode that produced the result for each file.
+    result_modes = {}
+    n_bytes = 0
     for instance_path in glob(instance, recursive=True):
-        with open(instance_path, 'r') as f:
-            instance_data = yaml.safe_load(f)
-        
-        try:
-            schema_name = get_schema_name(instance_data)
-            jsonschema.validate(instance_data, schema_data[schema_name])
-        except jsonschema.ValidationError as ex:
-            print(f"Validation of {instance_path} failed with exception:\n{ex}")
+        n_bytes += os.path.getsize(instance_path)
+        if cache_path is None:
+            pending.append(instance_path)
+            continue
+        instance_hashes[instance_path] = hash_file(instance_path)
+        entry = cache.get(instance_path)
+        if entry is not None:
+            # Entries written before modes were recorded come from plain runs.
+            entry_mode = entry.get('mode', 'plain')
+            # A stricter mode may report errors that this mode would not, so
+            # only successes are replayed from stricter modes.
+            replay_mode = entry_mode == mode or (
+                entry['error'] is None and
+                MODE_STRICTNESS.get(entry_mode, -1) >= MODE_STRICTNESS[mode]
+            )
+        if (
+            entry is not None and replay_mode and
+            entry['sha256'] == instance_hashes[instance_path] and
+            entry['schema_sha256'] == schema_hashes.get(entry['schema'])
+        ):
+            results.append((instance_path, entry['schema'], entry['error']))
+            result_modes[instance_path] = entry_mode
+        else:
+            pending.append(instance_path)
+    n_cached = len(results)
+
+    check_file = partial(
+        validate_file, streaming=streaming, chunk_size=chunk_size, arrays=arrays
+    )
+    if jobs == 1 or len(pending) <= 1:
+        results.extend(map(check_file, pending))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=jobs or None,
+            initializer=load_validators,
+            initargs=(schema_paths, schema)
+        ) as executor:
+            results.extend(executor.map(check_file, pending, chunksize=4))
+
+    for instance_path, schema_name, error in sorted(results):
+        if error is not None:
+            print(f"Validation of {instance_path} failed with exception:\n{error}")
             failed.append(instance_path)
         else:
             print(f"{instance_path} is a valid instance of {schema_name}.")
+        if cache_path is not None:
+            cache[instance_path] = {
+                'sha256': instance_hashes[instance_path],
+                'schema': schema_name,
+                'schema_sha256': schema_hashes[schema_name],
+                'mode': result_modes.get(instance_path, mode),
+                'error': error
+            }
+
+    if cache_path is not None:
+        save_cache(cache_path, cache)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"\nChecked {len(results)} files ({n_cached} from cache) in {elapsed:.2f} s: "
+        f"{len(results) / elapsed:.1f} files/s, {n_bytes / elapsed / 2**20:.2f} MB/s."
+    )
 
     if failed:
         stderr.write("\n\nThe following files failed validation:\n")
@@ -62,6 +404,6 @@ def validate(instance, schema):
         exit(-1)
 
 if __name__ == "__main__":
-    
+
     validate()
-    
+
@@ -2,36 +2,262 @@
 # Licensed under the MIT License.
 
 import argparse
+import math
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
 import qsharp
 from qsharp import IQSharpError
 from Microsoft.Quantum.Samples.IntegerFactorization import FactorSemiprimeInteger
 
 
-def factor_integer(number_to_factor, n_trials, use_robust_phase_estimation):
+def _small_primes(bound):
+    """ Returns the primes up to bound, using the sieve of Eratosthenes. """
+    is_prime = [True] * (bound + 1)
+    is_prime[:2] = [False] * min(2, bound + 1)
+    for p in range(2, math.isqrt(bound) + 1):
+        if is_prime[p]:
+            is_prime[p * p::p] = [False] * len(range(p * p, bound + 1, p))
+    return [p for p, prime in enumerate(is_prime) if prime]
+
+
+def _is_probable_prime(number):
+    """ Miller-Rabin primality test, deterministic for numbers below 3.3⋅10²⁴. """
+    if number < 2:
+        return False
+    bases = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+    if number in bases:
+        return True
+    d, s = number - 1, 0
+    while d % 2 == 0:
+        d, s = d // 2, s + 1
+    for base in bases:
+        x = pow(base, d, number)
+        if x in (1, number - 1):
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, number)
+            if x == number - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _integer_root(number, k):
+    """ Returns the largest integer r such that rᵏ ≤ number. """
+    root = int(round(number ** (1. / k)))
+    while root ** k > number:
+        root -= 1
+    while (root + 1) ** k <= number:
+        root += 1
+    return root
+
+
+def classical_prescreen(number, trial_division_bound=2):
+    """ Tries to factor an integer with cheap classical checks, before using
+    Shor's algorithm.
+
+    Returns a tuple (factors, reason), where factors is a pair of numbers
+    p > 1 and q > 1 such that p⋅q = number, or None if number has no such
+    factors, and reason describes the check that decided. If none of the
+    checks decide, returns None instead, and Shor's algorithm is needed.
+    """
+    if number < 4:
+        return None, "too small to have nontrivial factors"
+    # A single gcd with the product of all small primes finds whether
+    # number has a small prime factor, including 2.
+    primes = _small_primes(trial_division_bound)
+    if math.gcd(number, math.prod(primes)) > 1:
+        p = next(p for p in primes if number % p == 0)
+        if p != number:
+            return (p, number // p), "small prime factor"
+    if _is_probable_prime(number):
+        return None, "prime"
+    for k in range(2, number.bit_length()):
+        root = _integer_root(number, k)
+        if root < 2:
+            break
+        if root ** k == number:
+            return (root, number // root), "perfect power"
+    return None
+
+
+def run_trial(job):
+    """ Runs a single trial of Shor's algorithm, returning a dictionary with
+    the factors found, or the reason the trial failed, and its wall time.
+    """
+    number_to_factor, trial, use_robust_phase_estimation = job
+    start = time.perf_counter()
+    try:
+        factors = FactorSemiprimeInteger.simulate(
+            number=number_to_factor,
+            useRobustPhaseEstimation=use_robust_phase_estimation,
+            raise_on_stderr=True)
+        reason = None
+    except IQSharpError as error:
+        factors = None
+        # Group failures by the first line of their error message.
+        reason = str(error).strip().splitlines()[0] if str(error).strip() else type(error).__name__
+    return {
+        'number': number_to_factor,
+        'trial': trial,
+        'factors': tuple(factors) if factors is not None else None,
+        'reason': reason,
+        'wall_time': time.perf_counter() - start
+    }
+
+
+def _report_trial(result):
+    print("==========================================")
+    print(f"Factoring {result['number']} (trial {result['trial'] + 1}, {result['wall_time']:.2f} s)")
+    if result['factors'] is not None:
+        factor_1, factor_2 = result['factors']
+        print(f"Factors are {factor_1} and {factor_2}.")
+    else:
+        # Report the failed attempt.
+        print("This run of Shor's algorithm failed:")
+        print(result['reason'])
+
+
+class TrialPool:
+    """ Runs trials of Shor's algorithm in up to `jobs` worker processes, or
+    one per core if jobs is 0, which are started when first needed.
+
+    Trials that are already running cannot be cancelled, so terminate stops
+    the workers instead, and new workers are started for the next trials.
+    """
+
+    def __init__(self, jobs):
+        self.jobs = jobs or os.cpu_count()
+        self._executor = None
+
+    def submit(self, job):
+        if self._executor is None:
+            # Forked workers would share the connection to this process's
+            # kernel, so we spawn fresh workers, each of which starts its own
+            # kernel on import.
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor.submit(run_trial, job)
+
+    def terminate(self):
+        """ Stops every trial, whether pending or running. """
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        if hasattr(executor, 'terminate_workers'):
+            executor.terminate_workers()
+            return
+        # Before Python 3.14, ProcessPoolExecutor cannot terminate its
+        # workers itself.
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def factor_integer(number_to_factor, n_trials, use_robust_phase_estimation, pool=None):
     """ Use Shor's algorithm to factor an integer.
 
     Shor's algorithm is a probabilistic algorithm and can fail with certain probability in several ways.
     For more details see Shor.qs.
+
+    Trials stop as soon as one of them returns the factors. If a TrialPool is
+    given, up to pool.jobs trials run concurrently in it; once a trial
+    succeeds, no further trials are started, and the workers of trials
+    still running are terminated, so that they do not hold up the trials of
+    the next number.
+
+    Returns the list of results of run_trial for each trial whose result
+    was used, in the order in which they finished.
     """
-    # Repeat Shor's algorithm multiple times because the algorithm is
-    # probabilistic.
-    for i in range(n_trials):
-        # Report the number to factor on each attempt.
-        print("==========================================")
-        print(f'Factoring {number_to_factor}')
-        # Compute the factors
-        try:
-            output = FactorSemiprimeInteger.simulate(
-                number=number_to_factor,
-                useRobustPhaseEstimation=use_robust_phase_estimation,
-                raise_on_stderr=True)
-            factor_1, factor_2 = output
-            print(f"Factors are {factor_1} and {factor_2}.")
-        except IQSharpError as error:
-            # Report the failed attempt.
-            print("This run of Shor's algorithm failed:")
-            print(error)
+    results = []
+    jobs_to_run = iter([(number_to_factor, trial, use_robust_phase_estimation) for trial in range(n_trials)])
 
+    if pool is None:
+        # Repeat Shor's algorithm multiple times because the algorithm is
+        # probabilistic.
+        for job in jobs_to_run:
+            results.append(run_trial(job))
+            _report_trial(results[-1])
+            if results[-1]['factors'] is not None:
+                break
+        return results
+
+    running = {pool.submit(job) for job, _ in zip(jobs_to_run, range(pool.jobs))}
+    while running:
+        done, running = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            results.append(future.result())
+            _report_trial(results[-1])
+        if any(result['factors'] is not None for result in results):
+            if running:
+                pool.terminate()
+            break
+        # Start another trial for each trial that finished.
+        for job, _ in zip(jobs_to_run, range(len(done))):
+            running.add(pool.submit(job))
+    return results
+
+
+def factor_integers(numbers, n_trials, use_robust_phase_estimation, jobs=1, trial_division_bound=2):
+    """ Factors a batch of integers, first with cheap classical checks, and
+    then using Shor's algorithm for those numbers that remain, running up to
+    `jobs` trials at once in worker processes.
+
+    Returns a dictionary from each number to a tuple (factors, method), where
+    factors is None if no factors were found.
+    """
+    outcomes = {}
+    trial_results = []
+    start = time.perf_counter()
+
+    pool = TrialPool(jobs) if jobs != 1 else None
+    try:
+        for number in numbers:
+            screened = classical_prescreen(number, trial_division_bound)
+            if screened is not None:
+                factors, reason = screened
+                print("==========================================")
+                print(f"{number}: {reason}" + (f"; factors are {factors[0]} and {factors[1]}." if factors else "."))
+                outcomes[number] = (factors, reason)
+                continue
+            results = factor_integer(number, n_trials, use_robust_phase_estimation, pool)
+            trial_results += results
+            factors = next((result['factors'] for result in results if result['factors'] is not None), None)
+            outcomes[number] = (factors, "Shor's algorithm")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    print_statistics(outcomes, trial_results, time.perf_counter() - start)
+    return outcomes
+
+
+def print_statistics(outcomes, trial_results, wall_time):
+    print("==========================================")
+    n_factored = sum(factors is not None for factors, _ in outcomes.values())
+    print(f"Factored {n_factored} of {len(outcomes)} numbers in {wall_time:.2f} s "
+          f"({len(outcomes) / wall_time:.2f} numbers/s).")
+    for method, count in Counter(method for _, method in outcomes.values()).most_common():
+        print(f"    {method}: {count}")
+    if trial_results:
+        trial_times = [result['wall_time'] for result in trial_results]
+        n_succeeded = sum(result['factors'] is not None for result in trial_results)
+        print(f"Ran {len(trial_results)} trials of Shor's algorithm, {n_succeeded} succeeded; "
+              f"mean trial time {sum(trial_times) / len(trial_times):.2f} s, max. {max(trial_times):.2f} s.")
+        for reason, count in Counter(result['reason'] for result in trial_results if result['reason']).most_common():
+            print(f"    failed {count} times: {reason}")
 
 
 if __name__ == "__main__":
@@ -41,14 +267,15 @@ if __name__ == "__main__":
         '-n',
         '--number',
         type=int,
-        help='number to be factored.(default=15)',
-        default=15
+        nargs='+',
+        help='number(s) to be factored.(default=15)',
+        default=[15]
     )
     parser.add_argument(
         '-t',
         '--trials',
         type=int,
-        help='number of trial to perform.(default=10)',
+        help='maximum number of trials to perform for each number.(default=10)',
         default=10
     )
     parser.add_argument(
@@ -57,8 +284,22 @@ if __name__ == "__main__":
         action='store_true',
         help='if true uses Robust Phase Estimation, otherwise uses Quantum Phase Estimation.(default=False)',
         default=False)
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        help='number of trials to run concurrently in worker processes, or 0 to use all cores.(default=1)',
+        default=1
+    )
+    parser.add_argument(
+        '-b',
+        '--trial-division-bound',
+        type=int,
+        help='look for prime factors up to this bound classically before using Shor\'s algorithm.(default=2)',
+        default=2
+    )
     args = parser.parse_args()
-    if args.number >= 1:
-        factor_integer(args.number, args.trials, args.use_robust_pe)
+    if all(number >= 1 for number in args.number):
+        factor_integers(args.number, args.trials, args.use_robust_pe, args.jobs, args.trial_division_bound)
     else:
         print("Error: Invalid number. The number '-n' must be greater than or equal to 1.")
@@ -2,20 +2,38 @@
 # Licensed under the MIT License.
 
 import argparse
+import multiprocessing
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import qsharp
-from Microsoft.Quantum.Samples.OrderFinding import FindOrder
+from Microsoft.Quantum.Samples.OrderFinding import FindOrder, FindOrderHistogram
+
+import permutation_cycles
+from permutation_cycles import PermutationCycles
+
+# The probability distribution of guesses when the quantum algorithm
+# measures 0, for orders 1, 2, 3 and 4; see guess_quantum below.
+ZERO_RESULT_PROBABILITIES = [0.5505, 0.1009, 0.1468, 1 - 0.5505 - 0.1009 - 0.1468]
+# The post-processing of guess_quantum assumes permutations of this size;
+# larger permutations are only guessed classically.
+QUANTUM_PERMUTATION_SIZE = 4
+
+_rng = np.random.default_rng()
 
 
 def get_order(perm, index):
     """Returns the exact order (length) of the cycle that contains a given index.
+
+    The permutation may be given either as a list, or as a PermutationCycles
+    object, which answers order queries for every index without walking
+    its cycles again.
     """
-    order = 1
-    curr = index
-    while index != perm[curr]:
-        order += 1
-        curr = perm[curr]
-    return order
+    if not isinstance(perm, PermutationCycles):
+        perm = PermutationCycles(perm)
+    return perm.order(index)
 
 
 def guess_quantum(perm, index):
@@ -47,16 +65,102 @@ def guess_quantum(perm, index):
 def guess_classical(perm, index):
     """Guesses the order (classically) for cycle that contains a given index
 
-    The algorithm computes π³(index).  If the result is index, it
-    returns 1 or 3 with probability 50% each, otherwise, it
-    returns 2 or 4 with probability 50% each.
+    For permutations of 4 elements, the algorithm computes π³(index).  If
+    the result is index, it returns 1 or 3 with probability 50% each,
+    otherwise, it returns 2 or 4 with probability 50% each.  Permutations of
+    n elements are guessed in the same way using πⁿ⁻¹(index); see
+    permutation_cycles.classical_guesses.
+    """
+    if not isinstance(perm, PermutationCycles):
+        perm = PermutationCycles(perm)
+    return int(permutation_cycles.classical_guesses(perm, [index], _rng)[0, 0])
+
+
+def quantum_orders(n_results):
+    """Returns the order guessed by guess_quantum for each possible result of
+    the quantum algorithm, or 0 for the result 0, whose guess is random.
+    """
+    results = np.arange(n_results)
+    orders = np.where(results % 2 == 1, 3, np.where((results == 2) | (results == 6), 4, 2))
+    orders[0] = 0
+    return orders
+
+
+def guesses_from_histogram(histogram, rng):
+    """Converts a histogram of results of the quantum algorithm, as returned by
+    FindOrderHistogram, into the number of times each order is guessed, as
+    guess_quantum would for each shot.  Returns an array whose i-th element
+    counts the guesses of order i.
+    """
+    histogram = np.asarray(histogram)
+    orders = quantum_orders(len(histogram))
+    counts = np.bincount(orders, weights=histogram, minlength=5).astype(np.int64)
+    # Draw the guesses for all shots that measured 0 at once.
+    counts[1:5] += rng.multinomial(histogram[0], ZERO_RESULT_PROBABILITIES)
+    counts[0] = 0
+    return counts
+
+
+def count_classical_guesses(perm, index, n, rng):
+    """Guesses the order classically 'n' times, as guess_classical would for
+    each shot.  Returns an array whose i-th element counts the guesses of
+    order i.
+    """
+    guesses = permutation_cycles.classical_guesses(PermutationCycles(perm), [index], rng, shots=n)
+    return np.bincount(guesses[0], minlength=len(perm) + 1)
+
+
+def simulate_histogram(job):
+    """Runs a chunk of shots in a single simulation, returning the histogram
+    of results.
+    """
+    perm, index, shots = job
+    return np.asarray(FindOrderHistogram.simulate(perm=perm, input=index, shots=shots))
+
+
+def run_histogram(perm, index, n, chunk_size=None, jobs=1):
+    """Runs 'n' shots of the quantum algorithm in chunks of at most chunk_size
+    shots, each in a single simulation, and returns the combined histogram of
+    results.  Chunks are spread across 'jobs' worker processes, each of which
+    starts its own simulator.
+    """
+    if chunk_size is None:
+        # By default, give each worker a single chunk.
+        chunk_size = -(-n // (jobs or os.cpu_count()))
+    chunks = [(perm, index, min(chunk_size, n - start)) for start in range(0, n, chunk_size)]
+    if jobs == 1:
+        return sum(map(simulate_histogram, chunks))
+    # Forked workers would share the connection to this process's kernel, so
+    # we spawn fresh workers, each of which starts its own kernel on import.
+    with ProcessPoolExecutor(max_workers=jobs or None, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return sum(executor.map(simulate_histogram, chunks))
+
+
+def print_guesses(title, counts, n):
+    print(f"\n{title}: ")
+    for order, count in enumerate(counts):
+        if order > 0:
+            # Return the percentage of each order guess, which = (num_of_guesses /
+            # total_guesses) * 100.
+            print(f"{order}: {count / n : 0.2%}")
+
+
+def guess_order_batched(perm, index, n, chunk_size=None, jobs=1, seed=None):
+    """Same as guess_order, but runs all shots of the quantum algorithm in a
+    few chunked simulations rather than one simulation per shot, and
+    post-processes the results in vectorized form.
     """
-    if perm[perm[perm[index]]] == index:
-        return random.choice([1, 3])
-    return random.choice([2, 4])
+    rng = np.random.default_rng(seed)
+    print_guesses("Classical Guesses", count_classical_guesses(perm, index, n, rng), n)
+
+    if len(perm) == QUANTUM_PERMUTATION_SIZE:
+        histogram = run_histogram(perm, index, n, chunk_size, jobs)
+        print_guesses("Quantum Guesses", guesses_from_histogram(histogram, rng), n)
 
 
 def guess_order(perm, index, n):
+    cycles = PermutationCycles(perm)
+    quantum = len(perm) == QUANTUM_PERMUTATION_SIZE
 
     # This object counts the number of times the quantum algorithm guesses a
     # given order.(so { order: count })
@@ -68,9 +172,10 @@ def guess_order(perm, index, n):
     # Guess the order, 'n' amount of times.
     for i in range(n):
         # Count the classical guesses.
-        c_guesses[guess_classical(perm, index)] += 1
+        c_guesses[guess_classical(cycles, index)] += 1
         # Count the quantum guesses.
-        q_guesses[guess_quantum(perm, index)] += 1
+        if quantum:
+            q_guesses[guess_quantum(perm, index)] += 1
 
     print("\nClassical Guesses: ")
     for order, count in c_guesses.items():
@@ -78,6 +183,9 @@ def guess_order(perm, index, n):
         # total_guesses) * 100.
         print(f"{order}: {count / n : 0.2%}")
 
+    if not quantum:
+        return
+
     print("\nQuantum Guesses: ")
     for order, count in q_guesses.items():
         # Return the percentage of each order guess, which = (num_of_guesses /
@@ -91,9 +199,10 @@ if __name__ == "__main__":
     parser.add_argument(
         '-p',
         '--permutation',
-        nargs=4,
+        nargs='+',
         type=int,
-        help='provide only four integers to form a permutation.(default=[1,2,3,0])',
+        help='provide the integers forming a permutation of 0, ..., n - 1; quantum guesses '
+             'are only made for permutations of four integers.(default=[1,2,3,0])',
         metavar='INT',
         default=[
             1,
@@ -114,6 +223,33 @@ if __name__ == "__main__":
         help='number of repetitions when guessing.(default=1024)',
         default=1024
     )
+    parser.add_argument(
+        '-b',
+        '--batched',
+        action='store_true',
+        help='run shots in a few chunked simulations rather than one simulation per shot.(default=False)',
+        default=False
+    )
+    parser.add_argument(
+        '-c',
+        '--chunk-size',
+        type=int,
+        help='with --batched, the number of shots per simulation.(default: all shots in one simulation)',
+        default=None
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        help='with --batched, the number of worker processes, or 0 to use all cores.(default=1)',
+        default=1
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help='with --batched, the seed for classical post-processing.(default: random)',
+        default=None
+    )
 
     args = parser.parse_args()
     print(f"Permutation: {args.permutation}")
@@ -122,4 +258,7 @@ if __name__ == "__main__":
     exact_order = get_order(args.permutation, args.index)
     print(f"Exact order: {exact_order}")
 
-    guess_order(args.permutation, args.index, args.shots)
+    if args.batched:
+        guess_order_batched(args.permutation, args.index, args.shots, args.chunk_size, args.jobs, args.seed)
+    else:
+        guess_order(args.permutation, args.index, args.shots)
@@ -0,0 +1,163 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module analyzes the cycle structure of permutations of any
+# size, as used by order_finding.py, where the order of an index is the
+# length of the cycle of the permutation that contains it.
+#
+# Permutations are stored as NumPy arrays, and are decomposed into cycles
+# once, after which the order of every index is known. To analyze a
+# random permutation with a million elements, run e.g.:
+#
+#     python permutation_cycles.py --random 1000000 --seed 42
+
+import argparse
+import functools
+import math
+import time
+
+import numpy as np
+
+
+class PermutationCycles:
+    """Decomposes a permutation of the integers 0, ..., n - 1 into its cycles.
+
+    Each cycle is labelled by its smallest element, such that `labels[i]`
+    is the label of the cycle containing i, and `orders[i]` is the length of
+    that cycle, i.e. the order of i.
+    """
+
+    def __init__(self, perm):
+        self.perm = np.asarray(perm, dtype=np.int64)
+        n = len(self.perm)
+        if self.perm.ndim != 1 or np.any((self.perm < 0) | (self.perm >= n)) or \
+                np.any(np.bincount(self.perm, minlength=n) != 1):
+            raise ValueError("Expected a permutation of the integers 0, ..., n - 1.")
+
+        # Label each element by the smallest element of its cycle, in a single
+        # pass: the first element of each cycle that the loop reaches is its
+        # smallest, and walking the cycle from it labels every element in it,
+        # such that each element is visited once. Python lists are indexed
+        # faster than NumPy arrays, one element at a time.
+        perm = self.perm.tolist()
+        labels = [-1] * n
+        for start, label in enumerate(labels):
+            if label < 0:
+                labels[start] = start
+                current = perm[start]
+                while current != start:
+                    labels[current] = start
+                    current = perm[current]
+        labels = np.array(labels, dtype=np.int64)
+        self.labels = labels
+
+        self._lengths = np.bincount(labels, minlength=n)
+        self.orders = self._lengths[labels]
+        self._powers = {1: self.perm}
+
+    def __len__(self):
+        return len(self.perm)
+
+    def order(self, index):
+        """Returns the order of a given index, or an array of the orders of an
+        array of indices.
+        """
+        orders = self.orders[index]
+        return int(orders) if np.ndim(orders) == 0 else orders
+
+    def cycle_lengths(self):
+        """Returns the lengths of all cycles, sorted by their smallest element.
+        """
+        return self._lengths[self._lengths > 0]
+
+    def cycles(self):
+        """Returns a list of arrays holding the elements of each cycle, in the
+        order in which the permutation visits them, starting from their
+        smallest element.
+        """
+        cycles = []
+        for start in np.flatnonzero(self._lengths):
+            cycle = np.empty(self._lengths[start], dtype=np.int64)
+            current = start
+            for position in range(len(cycle)):
+                cycle[position] = current
+                current = self.perm[current]
+            cycles.append(cycle)
+        return cycles
+
+    def permutation_order(self):
+        """Returns the order of the permutation itself, i.e. the smallest k > 0
+        such that πᵏ is the identity.
+        """
+        return functools.reduce(
+            lambda a, b: a * b // math.gcd(a, b),
+            (int(length) for length in np.unique(self.cycle_lengths())), 1
+        )
+
+    def power(self, k):
+        """Returns the permutation πᵏ, by repeated squaring.
+        """
+        if k in self._powers:
+            return self._powers[k]
+        result = np.arange(len(self.perm))
+        square, exponent = self.perm, k
+        while exponent:
+            if exponent & 1:
+                result = square[result]
+            square = square[square]
+            exponent >>= 1
+        self._powers[k] = result
+        return result
+
+
+def classical_guesses(cycles, indices, rng, shots=1):
+    """Guesses the orders of the given indices classically, 'shots' times each,
+    using a single evaluation of a power of the permutation per index.
+
+    This generalizes guess_classical in order_finding.py to permutations of
+    any size n: it computes πᵐ(index) for m = n - 1.  If the result is index,
+    the order divides m, and one of the divisors of m is guessed uniformly at
+    random; otherwise, one of the other possible orders 1, ..., n is.  For
+    n = 4, this is the π³ test of guess_classical.
+
+    Returns an array of shape (len(indices), shots) of guesses.
+    """
+    indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+    n = len(cycles)
+    m = max(n - 1, 1)
+    candidates = np.arange(1, n + 1)
+    divisors = candidates[m % candidates == 0]
+    others = candidates[m % candidates != 0]
+    if not len(others):
+        others = divisors
+
+    returns = cycles.power(m)[indices] == indices
+    uniform = rng.random((len(indices), shots))
+    return np.where(
+        returns[:, np.newaxis],
+        divisors[(uniform * len(divisors)).astype(np.int64)],
+        others[(uniform * len(others)).astype(np.int64)]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Decompose a permutation into cycles, and print their lengths and the order of the permutation.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('-p', '--permutation', nargs='+', type=int, metavar='INT',
+        help='the integers forming a permutation of 0, ..., n - 1.')
+    group.add_argument('-r', '--random', type=int, metavar='N',
+        help='analyze a random permutation of N elements.')
+    parser.add_argument('--seed', type=int, default=None,
+        help='seed for the random permutation.(default: random)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    perm = args.permutation if args.permutation is not None else rng.permutation(args.random)
+
+    start = time.perf_counter()
+    cycles = PermutationCycles(perm)
+    print(f"Decomposed a permutation of {len(cycles)} elements in {time.perf_counter() - start:.3f} s.")
+    lengths = cycles.cycle_lengths()
+    print(f"Number of cycles: {len(lengths)}, longest cycle: {lengths.max()}, "
+          f"order of the permutation: {cycles.permutation_order()}")
@@ -0,0 +1,165 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module simulates reversible circuits of X, CNOT and Toffoli
+# gates classically, on every basis state at once, so that a circuit
+# synthesized for a permutation can be checked exhaustively without a
+# quantum simulator, whose memory grows exponentially with the number of
+# qubits.
+#
+# Circuits are lists of gates (control mask, target mask), as returned by
+# permutation_synthesis.synthesize. The simulation is bit-sliced: the
+# states of all 2ⁿ inputs are stored as n bit planes, where bit k of plane
+# j, packed into NumPy uint64 words, is bit j of the state of input k. Each
+# gate then updates 64 inputs per word operation. To synthesize a circuit
+# for a random permutation of 2¹⁴ elements and verify it, run e.g.:
+#
+#     python bitsliced_simulator.py --random 14 --seed 42
+
+import functools
+
+import numpy as np
+
+WORD_BITS = 64
+
+# The bit planes of the inputs 0, ..., 63 for bits 0, ..., 5 of each input.
+_LOW_PLANES = np.array([
+    0xAAAAAAAAAAAAAAAA, 0xCCCCCCCCCCCCCCCC, 0xF0F0F0F0F0F0F0F0,
+    0xFF00FF00FF00FF00, 0xFFFF0000FFFF0000, 0xFFFFFFFF00000000
+], dtype=np.uint64)
+_ALL_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _bits(mask):
+    return [bit for bit in range(mask.bit_length()) if mask >> bit & 1]
+
+
+def input_planes(n_bits):
+    """Returns the bit planes of the inputs 0, ..., 2ⁿ - 1, as an array of
+    shape (n_bits, max(2ⁿ / 64, 1)). For n_bits < 6, the unused bits of the
+    single word are those of inputs 2ⁿ, ..., 63.
+    """
+    n_words = max((1 << n_bits) // WORD_BITS, 1)
+    planes = np.empty((n_bits, n_words), dtype=np.uint64)
+    words = np.arange(n_words, dtype=np.uint64)
+    for bit in range(n_bits):
+        if bit < 6:
+            planes[bit] = _LOW_PLANES[bit]
+        else:
+            # Higher bits are the same for all 64 inputs of a word.
+            planes[bit] = np.where((words >> np.uint64(bit - 6)) & np.uint64(1), _ALL_ONES, np.uint64(0))
+    return planes
+
+
+def simulate_circuit(gates, n_bits, planes=None):
+    """Applies a circuit to the bit planes of all inputs, in place, starting
+    from input_planes(n_bits) if no planes are given, and returns them.
+    """
+    if planes is None:
+        planes = input_planes(n_bits)
+    condition = np.empty(planes.shape[1], dtype=np.uint64)
+    for control_mask, target_mask in gates:
+        if (control_mask | target_mask) >> n_bits:
+            raise ValueError(f"Gate ({control_mask}, {target_mask}) acts on more than {n_bits} bits.")
+        controls, targets = _bits(control_mask), _bits(target_mask)
+        if not controls:
+            for target in targets:
+                np.invert(planes[target], out=planes[target])
+            continue
+        # The condition holds for those inputs whose control bits are all 1.
+        np.copyto(condition, planes[controls[0]])
+        for control in controls[1:]:
+            np.bitwise_and(condition, planes[control], out=condition)
+        for target in targets:
+            np.bitwise_xor(planes[target], condition, out=planes[target])
+    return planes
+
+
+def permutation_planes(perm):
+    """Returns the bit planes of the outputs of a permutation, as an array of
+    the same shape as input_planes.
+    """
+    perm = np.asarray(perm, dtype=np.int64)
+    n_bits = max(len(perm) - 1, 1).bit_length()
+    n_words = max(len(perm) // WORD_BITS, 1)
+    planes = np.zeros((n_bits, n_words), dtype=np.uint64)
+    for bit in range(n_bits):
+        packed = np.packbits(((perm >> bit) & 1).astype(np.uint8), bitorder='little')
+        packed = np.pad(packed, (0, 8 * n_words - len(packed)))
+        planes[bit] = packed.view('<u8')
+    return planes
+
+
+def planes_to_integers(planes, indices):
+    """Returns the states of the given inputs from their bit planes."""
+    indices = np.asarray(indices, dtype=np.int64)
+    words, offsets = indices // WORD_BITS, (indices % WORD_BITS).astype(np.uint64)
+    values = np.zeros(len(indices), dtype=np.int64)
+    for bit, plane in enumerate(planes):
+        values |= ((plane[words] >> offsets) & np.uint64(1)).astype(np.int64) << bit
+    return values
+
+
+def verify_circuit(gates, perm, max_mismatches=10):
+    """Checks that a circuit maps each input i to perm[i], for every input.
+
+    Returns a list of up to max_mismatches tuples (input, expected, actual)
+    for the first inputs that the circuit maps incorrectly, which is empty
+    if the circuit realizes the permutation.
+    """
+    if len(perm) == 0 or len(perm) & (len(perm) - 1):
+        raise ValueError(f"Expected a permutation of 2ⁿ elements, got {len(perm)} elements.")
+    expected = permutation_planes(perm)
+    actual = simulate_circuit(gates, expected.shape[0])
+    # A word differs if any of its planes differ; only those words are
+    # decoded.
+    differences = functools.reduce(np.bitwise_or, actual ^ expected)
+    if len(perm) < WORD_BITS:
+        differences &= np.uint64((1 << len(perm)) - 1)
+    mismatches = []
+    for word in np.flatnonzero(differences):
+        bits = int(differences[word])
+        indices = [WORD_BITS * int(word) + offset for offset in _bits(bits)]
+        mismatches += indices[:max_mismatches - len(mismatches)]
+        if len(mismatches) >= max_mismatches:
+            break
+    values = planes_to_integers(actual, mismatches)
+    return [(index, int(perm[index]), int(value)) for index, value in zip(mismatches, values)]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from permutation_synthesis import synthesize
+
+    parser = argparse.ArgumentParser(
+        description="Synthesize a circuit for a permutation and verify it on every input, bit-sliced.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('-p', '--permutation', nargs='+', type=int, metavar='INT',
+        help='a permutation of 0, ..., 2ⁿ - 1.')
+    group.add_argument('-r', '--random', type=int, metavar='N',
+        help='use a random permutation of 2ᴺ elements.')
+    parser.add_argument('--seed', type=int, default=None,
+        help='seed for the random permutation.(default: random)')
+    parser.add_argument('--drop-gate', type=int, default=None,
+        help='remove the gate with this index from the circuit before verifying it, to show mismatches.')
+    args = parser.parse_args()
+
+    perm = args.permutation if args.permutation is not None else \
+        np.random.default_rng(args.seed).permutation(2 ** args.random)
+    start = time.perf_counter()
+    gates = synthesize(perm)
+    print(f"Synthesized {len(gates)} gates in {time.perf_counter() - start:.3f} s.")
+    if args.drop_gate is not None:
+        del gates[args.drop_gate]
+
+    start = time.perf_counter()
+    mismatches = verify_circuit(gates, perm)
+    print(f"Verified all {len(perm)} inputs in {time.perf_counter() - start:.3f} s.")
+    if mismatches:
+        print("The circuit does not realize the permutation:")
+        for index, expected, actual in mismatches:
+            print(f"    input {index}: expected {expected}, got {actual}")
+    else:
+        print("The circuit realizes the permutation.")
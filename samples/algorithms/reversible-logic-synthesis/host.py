@@ -6,15 +6,113 @@
 # This sample demonstrates:
 # - How to use Q# to decompose permutations into quantum operations.
 # - How to apply decomposed permutations in algorithms such as hidden shift.
+#
+# With --batched, the circuit for the permutation is synthesized once, in
+# Python, and cached, and verified classically on every input; every shift
+# is then evaluated using that circuit in a single call, or in one call per
+# worker process with --jobs.
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 import qsharp
-from Microsoft.Quantum.Samples.ReversibleLogicSynthesis import SimulatePermutation, FindHiddenShift
+from Microsoft.Quantum.Samples.ReversibleLogicSynthesis import (
+    SimulatePermutation, FindHiddenShift, FindHiddenShiftsUsingGates
+)
+
+from bitsliced_simulator import verify_circuit
+from permutation_synthesis import DEFAULT_CACHE_DIR, SynthesisCache
+
+
+def find_hidden_shifts(job):
+    gates, n_bits, shifts = job
+    return FindHiddenShiftsUsingGates.simulate(gates=gates, nBits=n_bits, shifts=shifts)
+
+
+def run_batched(perm, shifts, jobs=1, cache=None):
+    """ Runs the hidden shift algorithm for each shift, using a circuit for
+    perm synthesized once and cached, in one call, or split across `jobs`
+    worker processes (0 to use all cores).
+
+    Returns the list of measured shifts, and a dictionary giving the time
+    spent in each phase.
+    """
+    cache = cache or SynthesisCache()
+    timings = {}
+    start = time.perf_counter()
+    gates = cache.get(perm)
+    timings['synthesis'] = time.perf_counter() - start
+    print(f"Circuit has {len(gates)} gates ({'cached' if cache.hits else 'synthesized'}).")
+
+    # The circuit is classical, so we check it on every input with a
+    # bit-sliced simulator, rather than with SimulatePermutation.
+    start = time.perf_counter()
+    mismatches = verify_circuit(gates, perm)
+    timings['verification'] = time.perf_counter() - start
+    print(f'Does circuit realize permutation: {not mismatches}')
+    for index, expected, actual in mismatches:
+        print(f'    input {index}: expected {expected}, got {actual}')
+
+    n_bits = max(len(perm) - 1, 1).bit_length()
+    start = time.perf_counter()
+    if jobs == 1:
+        measured = find_hidden_shifts((gates, n_bits, list(shifts)))
+    else:
+        jobs = jobs or os.cpu_count()
+        chunks = [chunk.tolist() for chunk in np.array_split(np.asarray(shifts), jobs) if len(chunk)]
+        # Forked workers would share the connection to this process's
+        # kernel, so we spawn fresh workers, each of which starts its own
+        # kernel on import.
+        with ProcessPoolExecutor(max_workers=len(chunks), mp_context=multiprocessing.get_context('spawn')) as executor:
+            measured = [
+                shift
+                for chunk in executor.map(find_hidden_shifts, [(gates, n_bits, chunk) for chunk in chunks])
+                for shift in chunk
+            ]
+    timings['hidden shift'] = time.perf_counter() - start
+    return measured, timings
+
 
 if __name__ == "__main__":
-    perm = [0, 2, 3, 5, 7, 1, 4, 6]
-    res = SimulatePermutation.simulate(perm=perm)
-    print(f'Does circuit realize permutation: {res}')
+    parser = argparse.ArgumentParser(
+        description="Synthesize circuits for permutations and use them to find hidden shifts.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('-p', '--permutation', nargs='+', type=int, metavar='INT',
+        help='a permutation of 0, ..., 2ⁿ - 1.(default=0 2 3 5 7 1 4 6)')
+    group.add_argument('-r', '--random', type=int, metavar='N',
+        help='use a random permutation of 2ᴺ elements.')
+    parser.add_argument('--seed', type=int, default=None,
+        help='seed for the random permutation.(default: random)')
+    parser.add_argument('-s', '--shifts', nargs='+', type=int, default=None,
+        help='hidden shifts to find.(default: every shift)')
+    parser.add_argument('-b', '--batched', action='store_true', default=False,
+        help='synthesize the circuit once, and evaluate every shift in one call.(default=False)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+        help='with --batched, number of worker processes, or 0 to use all cores.(default=1)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+        help=f'with --batched, directory in which to cache synthesized circuits.(default={DEFAULT_CACHE_DIR})')
+    args = parser.parse_args()
+
+    if args.random is not None:
+        perm = np.random.default_rng(args.seed).permutation(2 ** args.random).tolist()
+    else:
+        perm = args.permutation or [0, 2, 3, 5, 7, 1, 4, 6]
+    shifts = args.shifts if args.shifts is not None else list(range(len(perm)))
+
+    if args.batched:
+        measured, timings = run_batched(perm, shifts, args.jobs, SynthesisCache(args.cache_dir))
+        for shift, measure in zip(shifts, measured):
+            print(f'Applied shift = {shift}   Measured shift: {measure}')
+        print(", ".join(f"{phase}: {seconds:.3f} s" for phase, seconds in timings.items()))
+    else:
+        res = SimulatePermutation.simulate(perm=perm)
+        print(f'Does circuit realize permutation: {res}')
 
-    for shift in range(len(perm)):
-        measure = FindHiddenShift.simulate(perm=perm, shift=shift)
-        print(f'Applied shift = {shift}   Measured shift: {measure}')
+        for shift in shifts:
+            measure = FindHiddenShift.simulate(perm=perm, shift=shift)
+            print(f'Applied shift = {shift}   Measured shift: {measure}')
@@ -0,0 +1,114 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module synthesizes circuits for permutations ahead of time, so
+# that the same circuit can be applied many times without being synthesized
+# again, as ApplyPermutationUsingTransformation does on every call.
+#
+# Circuits are found by transformation-based synthesis, as in the Q#
+# standard library, and are lists of multiple-controlled multiple-target
+# Toffoli gates, each given by a pair (control mask, target mask) as taken
+# by the Q# operation ApplyMaskedToffoliGates in ReversibleLogicSynthesis.qs.
+# SynthesisCache keeps the circuits it synthesizes in memory, and on disk
+# keyed by the permutation. To run the hidden shift algorithm for every
+# shift of a random permutation of 2⁴ elements in one call, using such a
+# circuit, run e.g.:
+#
+#     python host.py --random 4 --batched
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = ".synthesis-cache"
+
+
+def synthesize(perm):
+    """Returns a list of gates (control mask, target mask), in the order in
+    which they are applied, such that the circuit maps each basis state i
+    to perm[i].
+
+    Each gate flips the bits in its target mask if all of the bits in its
+    control mask are set. The permutation is fixed one basis state at a
+    time, in increasing order: for x such that f(x) = y ≠ x, gates are
+    applied after f to first set the bits of x missing from y, controlled on
+    y, and then clear the bits of y missing from x, controlled on x. Neither
+    gate changes any state below x, which are fixed already.
+    """
+    perm = np.array(perm, dtype=np.int64)
+    if len(perm) == 0 or len(perm) & (len(perm) - 1):
+        raise ValueError(f"Expected a permutation of 2ⁿ elements, got {len(perm)} elements.")
+    if np.any(np.sort(perm) != np.arange(len(perm))):
+        raise ValueError("Expected a permutation of the integers 0, ..., n - 1.")
+    gates = []
+    for x in range(len(perm)):
+        y = int(perm[x])
+        if y == x:
+            continue
+        # Only the images of x, ..., n - 1 can still change.
+        rest = perm[x:]
+        set_bits = x & ~y
+        if set_bits:
+            gates.append((y, set_bits))
+            rest[(rest & y) == y] ^= set_bits
+            y |= set_bits
+        clear_bits = y & ~x
+        if clear_bits:
+            gates.append((x, clear_bits))
+            rest[(rest & x) == x] ^= clear_bits
+    # The gates map f to the identity, applied after f; each gate is its own
+    # inverse, so applying them in reverse order realizes f.
+    return gates[::-1]
+
+
+def permutation_key(perm):
+    """Returns a hash of a permutation, used to look up its circuit."""
+    return hashlib.sha256(np.asarray(perm, dtype=np.int64).tobytes()).hexdigest()
+
+
+class SynthesisCache:
+    """Caches the circuits synthesized for permutations, in memory, and in
+    cache_dir as one JSON file per permutation, if cache_dir is given.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._gates = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, perm):
+        """Returns the circuit for a permutation, synthesizing it only if it
+        is in neither the memory nor the disk cache.
+        """
+        key = permutation_key(perm)
+        if key in self._gates:
+            self.hits += 1
+            return self._gates[key]
+        if self.cache_dir is not None:
+            try:
+                with open(self._path(key), 'r') as f:
+                    self._gates[key] = [tuple(gate) for gate in json.load(f)['gates']]
+                self.hits += 1
+                return self._gates[key]
+            except (OSError, ValueError, KeyError):
+                pass
+
+        self.misses += 1
+        gates = synthesize(perm)
+        self._gates[key] = gates
+        if self.cache_dir is not None:
+            # Write to a temporary file first, so that a partially written
+            # circuit is never read back.
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".staging-")
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'n_elements': len(perm), 'gates': gates}, f)
+            os.replace(temp_path, self._path(key))
+        return gates
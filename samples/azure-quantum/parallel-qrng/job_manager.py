@@ -0,0 +1,296 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module runs many Azure Quantum jobs concurrently, rather than
+# submitting one job and blocking until it finishes as parallel_qrng.py
+# does.
+#
+# Jobs are described by JobSpec tuples, giving the Q# operation to run, the
+# target to run it on, the number of shots and any parameters of the
+# operation. The AzureJobManager class then:
+# - submits up to a given number of jobs at a time, retrying calls that
+#   fail with exponential backoff, and resubmitting jobs that fail,
+# - polls each job with a growing interval, so that long-running jobs are
+#   not polled needlessly often, while waiting on all jobs at once,
+# - optionally caches the results of each job on disk, keyed by its
+#   operation, target, shots and parameters.
+#
+# The manager talks to the workspace through a backend: QSharpAzureBackend
+# uses the qsharp.azure module, while MockWorkspaceBackend in
+# mock_workspace.py uses a local stand-in. To compare submitting jobs one
+# at a time against the manager offline, run e.g.:
+#
+#     python job_manager.py --mock --n-jobs 20 --latency 1
+#
+# To run jobs on an Azure Quantum workspace, run e.g.:
+#
+#     python job_manager.py --resource-id RESOURCE_ID --location LOCATION --target ionq.simulator --n-jobs 4
+
+import asyncio
+import functools
+import hashlib
+import importlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+
+# Statuses after which a job no longer changes.
+TERMINAL_STATUSES = ("Succeeded", "Failed", "Cancelled")
+
+JobSpec = namedtuple('JobSpec', ['program', 'target', 'shots', 'name', 'params'], defaults=(None, None))
+JobSpec.__doc__ = """Describes a job: the fully qualified name of a Q# operation, such as
+"Microsoft.Quantum.Samples.SampleRandomNumber", the target to run it on,
+the number of shots, an optional job name and an optional dictionary of
+arguments for the operation."""
+
+
+class JobFailedError(Exception):
+    """Raised when a job fails on every submission."""
+
+
+class ResultCache:
+    """Caches job results on disk, as one JSON file per job, keyed by the
+    operation, target, shots and parameters of the job.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, spec):
+        description = {
+            'program': spec.program,
+            'target': spec.target,
+            'shots': spec.shots,
+            'params': spec.params or {}
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, spec):
+        try:
+            with open(os.path.join(self.cache_dir, self.key(spec) + ".json"), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, spec, result):
+        # Write to a temporary file first, so that a partially written
+        # result is never read back.
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".staging-")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(result, f)
+        os.replace(temp_path, os.path.join(self.cache_dir, self.key(spec) + ".json"))
+
+
+class QSharpAzureBackend:
+    """Job manager backend that submits jobs through the qsharp.azure module.
+
+    The active target of qsharp.azure is shared by all submissions, so calls
+    into the IQ# kernel are made one at a time.
+    """
+
+    def __init__(self, resource_id, location):
+        import qsharp.azure
+        self._azure = qsharp.azure
+        self._azure.connect(resourceId=resource_id, location=location)
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def _operation(self, program):
+        if program not in self._operations:
+            namespace, name = program.rsplit(".", 1)
+            self._operations[program] = getattr(importlib.import_module(namespace), name)
+        return self._operations[program]
+
+    def submit(self, program, target, shots, name, params):
+        with self._lock:
+            self._azure.target(target)
+            job = self._azure.submit(self._operation(program), shots=shots, jobName=name or program, **(params or {}))
+        return job.id
+
+    def status(self, job_id):
+        with self._lock:
+            return self._azure.status(job_id).status
+
+    def output(self, job_id):
+        with self._lock:
+            return dict(self._azure.output(job_id))
+
+
+class AzureJobManager:
+    """Runs many jobs concurrently on a backend, as described at the top of
+    this file.
+
+    At most max_concurrent_jobs jobs are submitted and not yet finished at
+    any time. Each job is first polled after initial_poll_interval seconds,
+    with the interval growing by a factor of poll_backoff after each poll,
+    up to max_poll_interval. Backend calls that raise are retried up to
+    max_retries times, waiting retry_delay seconds and then twice as long
+    after each failure, and jobs that fail are resubmitted up to
+    max_resubmissions times. The stats attribute counts the calls made.
+    """
+
+    def __init__(self, backend, max_concurrent_jobs=8, cache=None, initial_poll_interval=1.0,
+                 max_poll_interval=30.0, poll_backoff=1.5, max_retries=3, retry_delay=1.0,
+                 max_resubmissions=1):
+        self.backend = backend
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.cache = cache
+        self.initial_poll_interval = initial_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.poll_backoff = poll_backoff
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_resubmissions = max_resubmissions
+        self.stats = Counter()
+
+    async def _call(self, method, *args):
+        # Backend calls block, so we run them on threads, such that waiting
+        # for one call does not hold up the other jobs.
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.stats[method.__name__] += 1
+                return await loop.run_in_executor(None, functools.partial(method, *args))
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                self.stats['retries'] += 1
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+    async def _wait(self, job_id):
+        interval = self.initial_poll_interval
+        while True:
+            await asyncio.sleep(interval)
+            status = await self._call(self.backend.status, job_id)
+            if status in TERMINAL_STATUSES:
+                return status
+            interval = min(interval * self.poll_backoff, self.max_poll_interval)
+
+    async def run(self, spec, semaphore=None):
+        """Runs a single job, returning its result, i.e. a dictionary from
+        each outcome to its frequency.
+        """
+        if self.cache is not None:
+            result = self.cache.get(spec)
+            if result is not None:
+                self.stats['cache_hits'] += 1
+                return result
+
+        semaphore = semaphore or asyncio.Semaphore(self.max_concurrent_jobs)
+        async with semaphore:
+            for _ in range(self.max_resubmissions + 1):
+                job_id = await self._call(
+                    self.backend.submit, spec.program, spec.target, spec.shots, spec.name, spec.params
+                )
+                status = await self._wait(job_id)
+                if status == "Succeeded":
+                    break
+                self.stats['failed_jobs'] += 1
+            else:
+                raise JobFailedError(f"Job {spec.name or spec.program} on {spec.target} ended with status {status}.")
+            result = await self._call(self.backend.output, job_id)
+
+        if self.cache is not None:
+            self.cache.put(spec, result)
+        return result
+
+    async def run_all(self, specs, return_exceptions=False):
+        """Runs a list of jobs concurrently, returning their results in the
+        same order. If return_exceptions is True, jobs that fail return their
+        exception rather than raising it.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+        return await asyncio.gather(
+            *(self.run(spec, semaphore) for spec in specs), return_exceptions=return_exceptions
+        )
+
+
+def run_sequentially(backend, specs, poll_interval=1.0):
+    """Runs jobs one at a time, blocking until each finishes, as
+    qsharp.azure.execute does. Used as a baseline for benchmarks.
+    """
+    results = []
+    for spec in specs:
+        job_id = backend.submit(spec.program, spec.target, spec.shots, spec.name, spec.params)
+        while backend.status(job_id) not in TERMINAL_STATUSES:
+            time.sleep(poll_interval)
+        results.append(backend.output(job_id))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Run many Azure Quantum jobs concurrently, or benchmark doing so against a local stand-in.")
+    parser.add_argument('--mock', action='store_true', default=False,
+        help='run against a local stand-in for a workspace, and compare against running jobs one at a time.')
+    parser.add_argument('--resource-id', default=None, help='resource ID of the Azure Quantum workspace.')
+    parser.add_argument('--location', default=None, help='location of the Azure Quantum workspace.')
+    parser.add_argument('--program', default="Microsoft.Quantum.Samples.SampleRandomNumber",
+        help='fully qualified name of the Q# operation to run.(default=Microsoft.Quantum.Samples.SampleRandomNumber)')
+    parser.add_argument('--target', nargs='+', default=["ionq.simulator"],
+        help='targets to run jobs on.(default=ionq.simulator)')
+    parser.add_argument('--shots', type=int, nargs='+', default=[1000],
+        help='shot counts to run jobs with.(default=1000)')
+    parser.add_argument('--n-jobs', type=int, default=1,
+        help='number of jobs to run for each target and shot count.(default=1)')
+    parser.add_argument('--max-concurrent-jobs', type=int, default=8,
+        help='maximum number of jobs to run at once.(default=8)')
+    parser.add_argument('--cache-dir', default=None,
+        help='directory in which to cache job results.(default: no cache)')
+    parser.add_argument('--latency', type=float, default=1.0,
+        help='with --mock, the average time, in seconds, that jobs take.(default=1.0)')
+    parser.add_argument('--failure-rate', type=float, default=0.1,
+        help='with --mock, the fraction of submissions and of jobs that fail.(default=0.1)')
+    args = parser.parse_args()
+
+    specs = [
+        JobSpec(args.program, target, shots, name=f"job {idx} ({target}, {shots} shots)")
+        for target in args.target for shots in args.shots for idx in range(args.n_jobs)
+    ]
+    cache = ResultCache(args.cache_dir) if args.cache_dir else None
+
+    if args.mock:
+        from mock_workspace import MockWorkspace, MockWorkspaceBackend
+        poll_interval = args.latency / 10
+        with MockWorkspace(latency=args.latency, submit_failure_rate=args.failure_rate,
+                           job_failure_rate=args.failure_rate, seed=42) as workspace:
+            backend = MockWorkspaceBackend(workspace.url)
+            manager = AzureJobManager(
+                backend, args.max_concurrent_jobs, cache, initial_poll_interval=poll_interval,
+                max_poll_interval=args.latency, retry_delay=poll_interval, max_resubmissions=3
+            )
+            start = time.perf_counter()
+            results = asyncio.run(manager.run_all(specs, return_exceptions=True))
+            concurrent_time = time.perf_counter() - start
+            print(f"Ran {len(specs)} jobs concurrently in {concurrent_time:.2f} s; calls: {dict(manager.stats)}")
+
+            # The baseline does not retry, so it runs against a workspace
+            # where nothing fails.
+            workspace.submit_failure_rate = workspace.job_failure_rate = 0.0
+            start = time.perf_counter()
+            run_sequentially(backend, specs, poll_interval)
+            sequential_time = time.perf_counter() - start
+            print(f"Ran {len(specs)} jobs one at a time in {sequential_time:.2f} s "
+                  f"({sequential_time / concurrent_time:.1f}x slower).")
+    else:
+        if args.resource_id is None or args.location is None:
+            parser.error("Either --mock, or both --resource-id and --location, are required.")
+        # Importing qsharp compiles the Q# operations in this folder.
+        import qsharp
+        backend = QSharpAzureBackend(args.resource_id, args.location)
+        manager = AzureJobManager(backend, args.max_concurrent_jobs, cache)
+        results = asyncio.run(manager.run_all(specs, return_exceptions=True))
+        print(f"Calls: {dict(manager.stats)}")
+
+    for spec, result in zip(specs, results):
+        if isinstance(result, Exception):
+            print(f"{spec.name}: failed: {result}")
+        else:
+            most_likely = max(result, key=result.get)
+            print(f"{spec.name}: {len(result)} outcomes, most frequent {most_likely} ({result[most_likely]:.3f})")
@@ -0,0 +1,204 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module contains a local stand-in for an Azure Quantum
+# workspace, so that the job manager in job_manager.py can be tested and
+# benchmarked offline, without submitting paid jobs.
+#
+# The stand-in is a small HTTP server with the following endpoints:
+# - POST /jobs submits a job, described by a JSON object with the keys
+#   "program", "target", "shots", "name" and "params", and returns its ID.
+# - GET /jobs/<id> returns the status of a job, which goes from "Waiting"
+#   to "Executing" to either "Succeeded" or "Failed" as time passes.
+# - GET /jobs/<id>/output returns the histogram of a job that succeeded.
+# - GET /stats returns how many requests of each kind were made.
+#
+# Each job waits in the queue and executes for random amounts of time
+# around a given latency, and submissions can be made to fail at random,
+# so as to exercise retries. To run the server on its own, run e.g.:
+#
+#     python mock_workspace.py --port 8080 --latency 2
+
+import json
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockWorkspace:
+    """A local stand-in for an Azure Quantum workspace, served over HTTP on
+    a background thread for as long as it is used as a context manager.
+
+    Jobs take on average `latency` seconds to complete. A fraction
+    `submit_failure_rate` of submissions are rejected with HTTP status 503,
+    and a fraction `job_failure_rate` of jobs end with status "Failed".
+    Successful jobs return a uniform histogram over `result_bits` bits.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=1.0, submit_failure_rate=0.0,
+                 job_failure_rate=0.0, result_bits=5, seed=None):
+        self.latency = latency
+        self.submit_failure_rate = submit_failure_rate
+        self.job_failure_rate = job_failure_rate
+        self.result_bits = result_bits
+        self.jobs = {}
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def submit(self, request):
+        with self._lock:
+            self.stats['submit'] += 1
+            if self._random.random() < self.submit_failure_rate:
+                self.stats['rejected'] += 1
+                return None
+            job_id = str(uuid.uuid4())
+            now = time.monotonic()
+            queue_time = self._random.uniform(0, self.latency)
+            self.jobs[job_id] = dict(
+                request,
+                id=job_id,
+                begin_execution_time=now + queue_time,
+                end_execution_time=now + queue_time + self._random.uniform(0, self.latency),
+                failed=self._random.random() < self.job_failure_rate
+            )
+            return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            self.stats['status'] += 1
+            job = self.jobs[job_id]
+            now = time.monotonic()
+            if now < job['begin_execution_time']:
+                return "Waiting"
+            if now < job['end_execution_time']:
+                return "Executing"
+            return "Failed" if job['failed'] else "Succeeded"
+
+    def output(self, job_id):
+        with self._lock:
+            self.stats['output'] += 1
+            job = self.jobs[job_id]
+            shots = job['shots']
+            counts = Counter(self._random.getrandbits(self.result_bits) for _ in range(shots))
+        return {
+            json.dumps([(value >> bit) & 1 for bit in range(self.result_bits)]): count / shots
+            for value, count in sorted(counts.items())
+        }
+
+    def _make_handler(self):
+        workspace = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, code, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                if self.path != "/jobs":
+                    return self._reply(404, {'error': f"Unknown path {self.path}."})
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                job_id = workspace.submit(request)
+                if job_id is None:
+                    return self._reply(503, {'error': "The service is busy; try again later."})
+                self._reply(201, {'id': job_id, 'status': "Waiting"})
+
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                if parts == ["stats"]:
+                    with workspace._lock:
+                        return self._reply(200, dict(workspace.stats))
+                if len(parts) < 2 or parts[0] != "jobs" or parts[1] not in workspace.jobs:
+                    return self._reply(404, {'error': f"Unknown path {self.path}."})
+                if len(parts) == 2:
+                    return self._reply(200, {'id': parts[1], 'status': workspace.status(parts[1])})
+                if parts[2:] == ["output"] and workspace.status(parts[1]) == "Succeeded":
+                    return self._reply(200, workspace.output(parts[1]))
+                self._reply(404, {'error': f"No output for job {parts[1]}."})
+
+            def log_message(self, format, *args):
+                # Keep the console quiet while many jobs are being polled.
+                pass
+
+        return Handler
+
+
+class MockWorkspaceBackend:
+    """Job manager backend that submits jobs to a MockWorkspace over HTTP,
+    with the same methods as job_manager.QSharpAzureBackend.
+    """
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def _request(self, path, body=None):
+        data = None if body is None else json.dumps(body).encode('utf-8')
+        request = urllib.request.Request(
+            self.url + path, data=data, method="GET" if body is None else "POST",
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def submit(self, program, target, shots, name, params):
+        return self._request("/jobs", {
+            'program': program, 'target': target, 'shots': shots, 'name': name, 'params': params
+        })['id']
+
+    def status(self, job_id):
+        return self._request(f"/jobs/{job_id}")['status']
+
+    def output(self, job_id):
+        return self._request(f"/jobs/{job_id}/output")
+
+    def stats(self):
+        return self._request("/stats")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local stand-in for an Azure Quantum workspace.")
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on.(default=8080)')
+    parser.add_argument('--latency', type=float, default=1.0,
+        help='average time, in seconds, that jobs take to complete.(default=1.0)')
+    parser.add_argument('--submit-failure-rate', type=float, default=0.0,
+        help='fraction of submissions to reject.(default=0.0)')
+    parser.add_argument('--job-failure-rate', type=float, default=0.0,
+        help='fraction of jobs that fail.(default=0.0)')
+    args = parser.parse_args()
+
+    with MockWorkspace(port=args.port, latency=args.latency, submit_failure_rate=args.submit_failure_rate,
+                       job_failure_rate=args.job_failure_rate) as workspace:
+        print(f"Mock workspace listening on {workspace.url}; press Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
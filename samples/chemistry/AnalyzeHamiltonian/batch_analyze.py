@@ -0,0 +1,152 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python script extends host.py to analyze many Broombridge files at
+# once, so that candidate molecules can be ranked by the one-norm of their
+# Hamiltonians (and hence by the cost of simulating them).
+#
+# For each problem description in each file, and for each index
+# convention, the fermion Hamiltonian is loaded and the following
+# statistics are computed for each term type:
+# - n_terms: the number of terms of that type,
+# - one_norm: the sum of the absolute values of their coefficients,
+# - max_coefficient: the largest absolute value of their coefficients,
+# - sparsity: the fraction of their coefficients whose absolute values are
+#   at most --tolerance, and which could thus be dropped.
+#
+# Files are analyzed in parallel, with each worker process running its own
+# IQ# kernel, and the results are written as a single table. Files that
+# cannot be analyzed are listed at the end, rather than aborting the batch.
+# For example:
+#
+#     python batch_analyze.py "../IntegralData/YAML/**/*.yaml" --jobs 4 --output summary.csv
+#
+# Tables are written as CSV, unless the output ends with `.parquet`, in which
+# case pandas is used to write a Parquet file.
+
+import argparse
+import csv
+import glob
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+COLUMNS = [
+    'file', 'problem', 'index_convention', 'term_type',
+    'n_terms', 'one_norm', 'max_coefficient', 'sparsity'
+]
+
+def term_statistics(coefficients, tolerance):
+    """
+    Computes the statistics for a single term type from its coefficients,
+    in double precision.
+    """
+    magnitudes = np.abs(np.asarray(coefficients, dtype=np.float64))
+    if not magnitudes.size:
+        return {'n_terms': 0, 'one_norm': 0.0, 'max_coefficient': 0.0, 'sparsity': 1.0}
+    return {
+        'n_terms': magnitudes.size,
+        'one_norm': float(magnitudes.sum()),
+        'max_coefficient': float(magnitudes.max()),
+        'sparsity': float(np.mean(magnitudes <= tolerance))
+    }
+
+def _start_worker():
+    # Importing qsharp starts an IQ# kernel; we do so once per worker, such
+    # that each worker reuses its kernel for every file it analyzes.
+    import qsharp.chemistry
+
+def analyze_file(job):
+    """
+    Analyzes every problem description in a single Broombridge file, for
+    each of the given index conventions, returning a list of table rows.
+    """
+    path, convention_names, tolerance = job
+    from qsharp.chemistry import IndexConvention, load_broombridge
+
+    rows = []
+    broombridge = load_broombridge(path)
+    for idx_problem, problem in enumerate(broombridge.problem_description):
+        for convention_name in convention_names:
+            hamiltonian = problem.load_fermion_hamiltonian(
+                index_convention=IndexConvention[convention_name]
+            )
+            for term_type, terms in hamiltonian.terms:
+                row = {
+                    'file': path,
+                    'problem': idx_problem,
+                    'index_convention': convention_name,
+                    'term_type': str(term_type)
+                }
+                row.update(term_statistics([value for _, value in terms], tolerance))
+                rows.append(row)
+    return rows
+
+def write_table(rows, output):
+    if output.endswith('.parquet'):
+        import pandas as pd
+        pd.DataFrame(rows, columns=COLUMNS).to_parquet(output, index=False)
+        return
+
+    with open(output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compute one-norms and term statistics for many Broombridge files in parallel.")
+    parser.add_argument('files', nargs='+', help='Broombridge files or glob patterns to analyze.')
+    parser.add_argument('-c', '--index-convention', action='append', choices=['UpDown', 'HalfUp'],
+        help='index convention(s) to analyze with. May be repeated.(default: both)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+        help='number of worker processes, or 0 to use all cores.(default=1)')
+    parser.add_argument('-t', '--tolerance', type=float, default=1e-8,
+        help='coefficients at most this large are counted towards sparsity.(default=1e-8)')
+    parser.add_argument('-o', '--output', default='summary.csv',
+        help='file to write the summary table to.(default=summary.csv)')
+    args = parser.parse_args()
+
+    conventions = args.index_convention or ['UpDown', 'HalfUp']
+    paths = sorted(path for pattern in args.files for path in glob.glob(pattern, recursive=True))
+
+    start = time.perf_counter()
+    rows = []
+    failed = []
+    with ProcessPoolExecutor(max_workers=args.jobs or None, initializer=_start_worker) as executor:
+        futures = {
+            executor.submit(analyze_file, (path, conventions, args.tolerance)): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                rows.extend(future.result())
+            except Exception as error:
+                # A file that cannot be analyzed is reported, rather than
+                # losing the rows of every other file.
+                failed.append((path, f"{type(error).__name__}: {error}"))
+                print(f"{path}: failed, {failed[-1][1]}")
+                continue
+            print(f"Analyzed {path}.")
+
+    # Rows are written in the order of the files, however they completed.
+    order = {path: idx for idx, path in enumerate(paths)}
+    rows.sort(key=lambda row: order[row['file']])
+    write_table(rows, args.output)
+    print(f"Wrote {len(rows)} rows for {len(paths) - len(failed)} files to {args.output} in {time.perf_counter() - start:.2f} s.")
+    if failed:
+        print(f"\n{len(failed)} of {len(paths)} files failed:")
+        for path, error in sorted(failed):
+            print(f"    {path}: {error}")
+
+    # Rank the problems by their total one-norm, as a rough proxy for the
+    # cost of simulating each.
+    totals = {}
+    for row in rows:
+        key = (row['file'], row['problem'], row['index_convention'])
+        totals[key] = totals.get(key, 0.0) + row['one_norm']
+    print("\nTotal one-norms, from smallest to largest:")
+    for (path, idx_problem, convention), total in sorted(totals.items(), key=lambda item: item[1]):
+        print(f"{total:16.6f}  {path} [problem {idx_problem}, {convention}]")
@@ -14,5 +14,5 @@ general_hamiltonian = broombridge.problem_description[0].load_fermion_hamiltonia
     index_convention=IndexConvention.UpDown)
 print("End of file. Computing One-norms:")
 for term, matrix in general_hamiltonian.terms:
-    one_norm = LA.norm(np.asarray([v for k, v in matrix], dtype=np.float32), ord=1)
+    one_norm = LA.norm(np.asarray([v for k, v in matrix], dtype=np.float64), ord=1)
     print(f"One-norm for term type {term}: {one_norm}")
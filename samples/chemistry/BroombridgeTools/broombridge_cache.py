@@ -0,0 +1,262 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module converts Broombridge files into a compact binary
+# sidecar, such that integral data can be loaded by memory-mapping NumPy
+# arrays instead of parsing YAML each time.
+#
+# Sidecars are written to a cache directory, .broombridge-cache by default,
+# and are used from Python, e.g. to analyze integrals with NumPy; the Q#
+# chemistry library still reads Broombridge files from YAML. A sidecar is a
+# directory containing:
+# - header.json: the Broombridge document, with the values of each integral
+#   array removed, together with the hash of the YAML file it was made from.
+# - one .npy file of orbital indices and one .npy file of values for each
+#   one- and two-electron integral array in the document.
+#
+# Sidecars are built on first use. To convert files ahead of time, run this
+# module from the command line, e.g.:
+#
+#     python broombridge_cache.py ../IntegralData/YAML/**/*.yaml
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import yaml
+
+# Increment whenever the layout of sidecars changes, so that older
+# sidecars are rebuilt rather than misread.
+SIDECAR_VERSION = 1
+SIDECAR_EXTENSION = ".broombridge"
+DEFAULT_CACHE_DIR = ".broombridge-cache"
+
+# Number of orbital indices in each row of a given integral array.
+N_INDICES = {
+    'one_electron_integrals': 2,
+    'two_electron_integrals': 4
+}
+
+class BroombridgeLoader(getattr(yaml, 'CSafeLoader', yaml.SafeLoader)):
+    """
+    YAML loader that also resolves floats without a decimal point, such as
+    1e-10, as numbers rather than strings, as the Q# chemistry library does.
+    """
+BroombridgeLoader.add_implicit_resolver(
+    'tag:yaml.org,2002:float',
+    re.compile(r'^[-+]?[0-9][0-9_]*(?:\.[0-9_]*)?[eE][-+]?[0-9]+$'),
+    list('-+0123456789')
+)
+
+def sidecar_path(path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Returns the path of the sidecar for a given Broombridge file in
+    cache_dir, or next to that file if cache_dir is None.
+    """
+    if cache_dir is None:
+        return os.path.splitext(path)[0] + SIDECAR_EXTENSION
+    digest = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}-{digest}{SIDECAR_EXTENSION}")
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def problem_list_key(document):
+    """
+    Returns the key under which a Broombridge document lists its problems;
+    this is 'integral_sets' for version 0.1 and 'problem_description' for
+    later versions.
+    """
+    return 'integral_sets' if 'integral_sets' in document else 'problem_description'
+
+def integral_arrays(document):
+    """
+    Yields a tuple (name, block, integrals) for each integral array in a
+    Broombridge document, where integrals is the dictionary holding the
+    array under its 'values' key.
+    """
+    for idx_problem, problem in enumerate(document.get(problem_list_key(document), [])):
+        for block in N_INDICES:
+            integrals = problem.get('hamiltonian', {}).get(block)
+            if integrals is not None:
+                yield f"problem{idx_problem}_{block}", block, integrals
+
+def rows_to_arrays(rows, n_indices):
+    """
+    Converts rows of the form [i, j, ..., value] to a pair of arrays
+    (indices, values).
+    """
+    table = np.array(rows, dtype=object).reshape(len(rows), n_indices + 1)
+    return table[:, :n_indices].astype(np.int32), table[:, n_indices].astype(np.float64)
+
+def arrays_to_rows(indices, values):
+    """
+    Converts a pair of arrays (indices, values) back to rows of the form
+    [i, j, ..., value], as used in Broombridge documents.
+    """
+    return [idx + [value] for idx, value in zip(indices.tolist(), values.tolist())]
+
+def source_info(path):
+    """
+    Returns the size, modification time and hash of the file that a
+    sidecar is made from, so that stale sidecars can later be detected.
+    """
+    stat = os.stat(path)
+    return {
+        'sha256': hash_file(path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime
+    }
+
+def make_staging_dir(target):
+    """
+    Returns a new temporary directory in which to write the contents of a
+    sidecar. Once complete, publish moves it into place, so that readers
+    never see a partially written sidecar.
+    """
+    parent = os.path.dirname(os.path.abspath(target))
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(dir=parent, prefix=".staging-")
+
+def publish(staging, target, source, arrays, document):
+    """
+    Writes the header of a sidecar into its staging directory, then moves
+    the staging directory into place.
+    """
+    with open(os.path.join(staging, "header.json"), 'w') as f:
+        json.dump({
+            'sidecar_version': SIDECAR_VERSION,
+            'source': source,
+            'arrays': arrays,
+            'document': document
+        }, f, default=str)
+
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(staging, target)
+
+def convert(path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Converts a Broombridge file into a sidecar, returning the path to the
+    new sidecar.
+    """
+    source = source_info(path)
+    with open(path, 'rb') as f:
+        document = yaml.load(f, Loader=BroombridgeLoader)
+
+    target = sidecar_path(path, cache_dir)
+    staging = make_staging_dir(target)
+    try:
+        arrays = {}
+        for name, block, integrals in integral_arrays(document):
+            indices, values = rows_to_arrays(integrals.pop('values'), N_INDICES[block])
+            np.save(os.path.join(staging, f"{name}_indices.npy"), indices)
+            np.save(os.path.join(staging, f"{name}_values.npy"), values)
+            arrays[name] = len(values)
+        publish(staging, target, source, arrays, document)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+def read_header(target):
+    with open(os.path.join(target, "header.json"), 'r') as f:
+        return json.load(f)
+
+def is_current(path, header):
+    """
+    Returns True if a sidecar header was made from the current contents of
+    a given Broombridge file. The hash of the file is only recomputed if its
+    size or modification time have changed.
+    """
+    if header.get('sidecar_version') != SIDECAR_VERSION:
+        return False
+    source = header['source']
+    stat = os.stat(path)
+    if stat.st_size == source['size'] and stat.st_mtime == source['mtime']:
+        return True
+    return stat.st_size == source['size'] and hash_file(path) == source['sha256']
+
+def load(path, cache_dir=DEFAULT_CACHE_DIR, rebuild=True):
+    """
+    Loads a Broombridge document from its sidecar, building or rebuilding
+    the sidecar first if it is missing or out of date.
+
+    In the returned document, each one- and two-electron integral array
+    holds read-only memory-mapped arrays under the keys 'indices' and
+    'values', rather than a list of rows under the key 'values'.
+
+    If rebuild is False and there is no current sidecar, or if the sidecar
+    cannot be written, the document is instead read from YAML.
+    """
+    target = sidecar_path(path, cache_dir)
+    try:
+        header = read_header(target)
+        current = is_current(path, header)
+    except (OSError, ValueError, KeyError):
+        current = False
+
+    if not current:
+        if not rebuild:
+            return load_yaml(path)
+        try:
+            convert(path, cache_dir)
+        except OSError:
+            return load_yaml(path)
+        header = read_header(target)
+
+    return read_sidecar(target, header)
+
+def read_sidecar(target, header=None):
+    """
+    Reads the Broombridge document stored in a given sidecar, memory-mapping
+    each of its integral arrays, without checking whether the sidecar is
+    current.
+    """
+    if header is None:
+        header = read_header(target)
+    document = header['document']
+    for name, _, integrals in integral_arrays(document):
+        integrals['indices'] = np.load(os.path.join(target, f"{name}_indices.npy"), mmap_mode='r')
+        integrals['values'] = np.load(os.path.join(target, f"{name}_values.npy"), mmap_mode='r')
+    return document
+
+def load_yaml(path):
+    """
+    Loads a Broombridge document directly from YAML, using the same layout
+    as documents loaded from sidecars.
+    """
+    with open(path, 'rb') as f:
+        document = yaml.load(f, Loader=BroombridgeLoader)
+    for _, block, integrals in integral_arrays(document):
+        integrals['indices'], integrals['values'] = rows_to_arrays(
+            integrals['values'], N_INDICES[block]
+        )
+    return document
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    import time
+
+    parser = argparse.ArgumentParser(
+        description="Convert Broombridge files into memory-mappable binary sidecars.")
+    parser.add_argument('files', nargs='+', help='Broombridge files or glob patterns to convert.')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+        help=f'directory in which to store sidecars.(default={DEFAULT_CACHE_DIR})')
+    args = parser.parse_args()
+
+    for pattern in args.files:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            start = time.perf_counter()
+            target = convert(path, args.cache_dir)
+            print(f"{path} -> {target} ({time.perf_counter() - start:.2f} s)")
@@ -0,0 +1,180 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module removes redundant integrals from Broombridge files.
+#
+# Orbital integrals are symmetric under permutations of their indices:
+# one-electron integrals satisfy h_ij = h_ji, and two-electron integrals in
+# Mulliken convention satisfy the 8-fold symmetry
+#
+#     (ij|kl) = (ji|kl) = (ij|lk) = (ji|lk) = (kl|ij) = (lk|ij) = (kl|ji) = (lk|ji),
+#
+# such that only one entry of each symmetry orbit needs to be stored. This
+# module replaces each set of indices by the representative of its orbit,
+# merges entries that share a representative, and drops entries whose
+# values are below a given threshold. To rewrite files in place, run e.g.:
+#
+#     python canonicalize.py "../IntegralData/YAML/**/*.yaml" --threshold 1e-12
+
+import os
+import sys
+
+import numpy as np
+import yaml
+
+import broombridge_cache
+
+# Orbits are found with the same representatives as the Broombridge validator
+# uses for its symmetry checks.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'Chemistry', 'Schema'))
+import integral_arrays
+
+class SymmetryConflictError(ValueError):
+    """
+    Raised when two entries in the same symmetry orbit have different
+    values, such that they cannot be merged.
+    """
+
+def canonicalize_integrals(indices, values, threshold=0.0, atol=1e-8):
+    """
+    Canonicalizes, merges and thresholds a single integral array.
+
+    Returns a tuple (indices, values, max_conflict), where indices and values
+    hold one entry for each symmetry orbit whose value is larger than
+    threshold in absolute value, sorted by their indices, and max_conflict
+    is the largest difference between two values in the same orbit.
+
+    Values in the same orbit are merged by taking their mean; if they differ
+    by more than atol, SymmetryConflictError is raised. Pass atol=np.inf to
+    merge conflicting values regardless.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return indices.astype(np.int32), values, 0.0
+
+    # Pack each set of canonical indices into a single integer key, so that
+    # orbits can be found by sorting a flat array.
+    canonical = integral_arrays.canonicalize(indices)
+    base = int(canonical.max()) + 1
+    keys = np.zeros(len(values), dtype=np.int64)
+    for column in canonical.T:
+        keys = keys * base + column
+
+    order = np.argsort(keys, kind='stable')
+    keys, values, canonical = keys[order], values[order], canonical[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+
+    max_conflict = float(np.max(
+        np.maximum.reduceat(values, starts) - np.minimum.reduceat(values, starts)
+    ))
+    if max_conflict > atol:
+        raise SymmetryConflictError(
+            f"Entries in the same symmetry orbit differ by up to {max_conflict}."
+        )
+
+    merged = np.add.reduceat(values, starts) / counts
+    keep = np.abs(merged) > threshold
+    return canonical[starts][keep].astype(np.int32), merged[keep], max_conflict
+
+def canonicalize_document(document, threshold=0.0, atol=1e-8):
+    """
+    Canonicalizes each integral array in a Broombridge document, as loaded
+    by yaml, in place. Returns a list of tuples (name, n_before, n_after)
+    describing each array.
+    """
+    report = []
+    for name, block, integrals in broombridge_cache.integral_arrays(document):
+        rows = integrals['values']
+        indices, values = broombridge_cache.rows_to_arrays(rows, broombridge_cache.N_INDICES[block])
+        indices, values, _ = canonicalize_integrals(indices, values, threshold, atol)
+        integrals['values'] = broombridge_cache.arrays_to_rows(indices, values)
+        report.append((name, len(rows), len(values)))
+    return report
+
+def canonicalize_file(path, output=None, threshold=0.0, atol=1e-8):
+    """
+    Canonicalizes a Broombridge file, writing the result to output, or back
+    to path if output is None. Returns a tuple (report, size_before,
+    size_after), where report is as returned by canonicalize_document.
+    """
+    size_before = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        document = yaml.load(f, Loader=broombridge_cache.BroombridgeLoader)
+    report = canonicalize_document(document, threshold, atol)
+
+    output = path if output is None else output
+    # Write to a temporary file first, so that an error part-way through
+    # never leaves a truncated file behind.
+    temp_path = output + ".tmp"
+    try:
+        with open(temp_path, 'w') as f:
+            yaml.dump(
+                document, f,
+                Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper),
+                default_flow_style=None, sort_keys=False, width=1 << 16
+            )
+        os.replace(temp_path, output)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return report, size_before, os.path.getsize(output)
+
+def output_paths(paths, output_dir):
+    """
+    Returns the path under output_dir at which to write each of the given
+    files, keeping their paths relative to the deepest directory containing
+    all of them, so that files with the same name in different directories
+    are not written to the same place.
+    """
+    directories = [os.path.dirname(os.path.abspath(path)) for path in paths]
+    root = os.path.commonpath(directories) if directories else ''
+    return [
+        os.path.join(output_dir, os.path.relpath(os.path.abspath(path), root))
+        for path in paths
+    ]
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(
+        description="Canonicalize and deduplicate the integrals in Broombridge files under permutational symmetry.")
+    parser.add_argument('files', nargs='+', help='Broombridge files or glob patterns to canonicalize.')
+    parser.add_argument('-t', '--threshold', type=float, default=0.0,
+        help='drop integrals whose absolute value is at most this threshold.(default=0.0)')
+    parser.add_argument('-o', '--output-dir', default=None,
+        help='directory in which to write canonicalized files.(default: rewrite files in place)')
+    parser.add_argument('--force', action='store_true', default=False,
+        help='merge symmetry-equivalent integrals even if their values differ.(default=False)')
+    args = parser.parse_args()
+
+    # Files matched by several patterns are only canonicalized once.
+    paths = sorted({
+        os.path.normpath(path) for pattern in args.files for path in glob.glob(pattern, recursive=True)
+    })
+    if args.output_dir is None:
+        outputs = [None] * len(paths)
+    else:
+        outputs = output_paths(paths, args.output_dir)
+        for output in outputs:
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+    total_before = total_after = 0
+    for path, output in zip(paths, outputs):
+        try:
+            report, size_before, size_after = canonicalize_file(
+                path, output, args.threshold, np.inf if args.force else 1e-8
+            )
+        except SymmetryConflictError as ex:
+            print(f"Skipping {path}: {ex} Use --force to merge them anyway.")
+            continue
+        total_before += size_before
+        total_after += size_after
+        print(f"{path}: {size_before} -> {size_after} bytes ({size_before / size_after:.2f}x)")
+        for name, n_before, n_after in report:
+            print(f"    {name}: {n_before} -> {n_after} entries")
+
+    if total_after:
+        print(f"Total: {total_before} -> {total_after} bytes ({total_before / total_after:.2f}x)")
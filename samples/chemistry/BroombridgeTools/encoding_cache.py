@@ -0,0 +1,215 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module caches the Jordan–Wigner encodings returned by
+# qsharp.chemistry.encode on disk, so that running the same molecule again
+# skips loading its Hamiltonian and input state and encoding them.
+#
+# Encodings are content-addressed: each is stored as a pickle file named by
+# the hash of everything that determines it, namely the contents of the
+# Broombridge file, the index of the problem description, the index
+# convention, the label of the input state and any terms added to the
+# Hamiltonian. Once the cache grows beyond a given size, the least recently
+# used encodings are evicted. Encodings are nested tuples and lists, which
+# JSON would not tell apart, so entries are pickled; as with any pickle,
+# only use caches written by yourself.
+#
+# To show or clear the contents of a cache, run e.g.:
+#
+#     python encoding_cache.py --cache-dir .encodings --clear
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+import broombridge_cache
+
+# Increment whenever the layout of cache entries or the way their keys
+# are computed changes, so that older entries are never misread.
+CACHE_VERSION = 2
+ENTRY_EXTENSION = ".pickle"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qsharp-chemistry", "encodings")
+DEFAULT_MAX_BYTES = 1 << 30
+
+class EncodingCache(object):
+    """
+    On-disk least-recently-used cache of Jordan–Wigner encodings, limited to
+    max_bytes in total. The hits and misses attributes count how often
+    encodings were found in, or added to, this cache.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Hashing large Broombridge files is slow, so we remember the hash of
+        # each file for as long as its size and modification time are the
+        # same.
+        self._file_hashes = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+        if key not in self._file_hashes:
+            self._file_hashes[key] = broombridge_cache.hash_file(path)
+        return self._file_hashes[key]
+
+    def key(self, path, problem_index=0, index_convention='UpDown', input_state_label='', added_terms=()):
+        """
+        Returns the key under which the encoding of a given problem is stored.
+        index_convention may be given either by name or as a member of
+        qsharp.chemistry.IndexConvention, and added_terms as a list of
+        (indices, coefficient) pairs, as for FermionHamiltonian.add_terms.
+        """
+        description = {
+            'cache_version': CACHE_VERSION,
+            'broombridge_sha256': self.file_hash(path),
+            'problem_index': problem_index,
+            'index_convention': getattr(index_convention, 'name', index_convention),
+            'input_state_label': input_state_label,
+            'added_terms': [[list(indices), float(coefficient)] for indices, coefficient in added_terms]
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ENTRY_EXTENSION)
+
+    def get(self, key):
+        """
+        Returns the encoding stored under a given key, or None if there is
+        none. Reading an entry marks it as the most recently used.
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                encoding = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return encoding
+
+    def put(self, key, encoding):
+        """
+        Stores an encoding under a given key, then evicts the least recently
+        used entries until the cache fits within max_bytes.
+        """
+        # Write to a temporary file first, so that other processes sharing
+        # the cache never read a partially written entry.
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".staging-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(encoding, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.entry_path(key))
+        except Exception:
+            os.remove(temp_path)
+            raise
+        self.evict()
+
+    def entries(self):
+        """
+        Returns a list of tuples (last_used, size, path) for each entry in
+        the cache, from least to most recently used.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(ENTRY_EXTENSION):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Another process has evicted this entry in the meantime.
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits within
+        max_bytes, returning the number of entries removed.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        n_removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            n_removed += 1
+        return n_removed
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+    def encode(self, path, problem_index=0, index_convention='UpDown', input_state_label='', added_terms=()):
+        """
+        Returns the Jordan–Wigner encoding of a problem description in a
+        Broombridge file, as returned by qsharp.chemistry.encode, computing
+        and caching it only if it is not already in the cache.
+
+        The Hamiltonian and input state are loaded with the given index
+        convention, and added_terms are added to the Hamiltonian before
+        encoding it. An empty input_state_label loads the greedy
+        (Hartree–Fock) state.
+        """
+        key = self.key(path, problem_index, index_convention, input_state_label, added_terms)
+        encoding = self.get(key)
+        if encoding is not None:
+            self.hits += 1
+            return encoding
+
+        from qsharp.chemistry import IndexConvention, encode, load_broombridge
+        if isinstance(index_convention, str):
+            index_convention = IndexConvention[index_convention]
+        problem = load_broombridge(path).problem_description[problem_index]
+        hamiltonian = problem.load_fermion_hamiltonian(index_convention=index_convention)
+        if added_terms:
+            hamiltonian.add_terms(added_terms)
+        input_state = problem.load_input_state(input_state_label, index_convention=index_convention)
+        encoding = encode(hamiltonian, input_state)
+
+        self.misses += 1
+        self.put(key, encoding)
+        return encoding
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries)
+        }
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Show or clear an on-disk cache of Jordan–Wigner encodings.")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+        help=f'directory holding the cache.(default={DEFAULT_CACHE_DIR})')
+    parser.add_argument('--max-bytes', type=int, default=None,
+        help='evict least recently used entries until the cache is at most this large.')
+    parser.add_argument('--clear', action='store_true', default=False,
+        help='remove every entry from the cache.(default=False)')
+    args = parser.parse_args()
+
+    cache = EncodingCache(args.cache_dir)
+    if args.clear:
+        cache.clear()
+    elif args.max_bytes is not None:
+        cache.max_bytes = args.max_bytes
+        print(f"Evicted {cache.evict()} entries.")
+    stats = cache.stats()
+    print(f"{args.cache_dir}: {stats['entries']} entries, {stats['bytes']} bytes.")
@@ -0,0 +1,393 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module reads orbital integrals in the legacy LIQUi|> format
+# used by the files in IntegralData/Liquid, and converts them into
+# Broombridge 0.2 YAML files or binary sidecars (see broombridge_cache.py).
+#
+# LIQUi|> files consist of whitespace-separated `key=value` tokens:
+# - `tst=`, `info=`, `nuc=`, `Ehf=`, `orbs=` and `consts=` are header fields,
+#   where each `tst=` field starts a new problem, such that a single file
+#   may hold many problems (e.g.: one for each geometry in a dissociation
+#   curve). Some files instead end with a summary `orbs: N, constants: M`.
+# - `i,j=value` is a one-electron integral.
+# - `i,j,k,l=value` is a two-electron integral.
+#
+# Orbital indices start at 0. Two-electron integrals are stored such that
+# `i,j,k,l` corresponds to (il|jk) in Mulliken convention.
+#
+# Files are read in fixed-size chunks, so that memory usage does not grow
+# with the number of integrals. To convert the whole LIQUi|> corpus into
+# YAML in parallel, run e.g.:
+#
+#     python liquid.py "../IntegralData/Liquid/*.dat" --output-dir converted --jobs 0
+
+import fnmatch
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import yaml
+
+import broombridge_cache
+
+# Header fields and the types that their values are parsed into.
+HEADER_FIELDS = {
+    'tst': int,
+    'info': str,
+    'nuc': float,
+    'Ehf': float,
+    'orbs': int,
+    'consts': int
+}
+
+# Header fields as named in the summaries at the end of some files.
+SUMMARY_FIELDS = {
+    'orbs': 'orbs',
+    'constants': 'consts'
+}
+
+# Integral arrays, keyed by the number of commas in the key of each integral.
+INTEGRAL_KINDS = {
+    1: 'one_electron_integrals',
+    3: 'two_electron_integrals'
+}
+
+SCHEMA_URL = "https://raw.githubusercontent.com/microsoft/Quantum/main/Chemistry/Schema/broombridge-0.2.schema.json"
+
+def read_tokens(f, block_size):
+    """
+    Yields lists of the whitespace-separated tokens in a text file, reading
+    block_size characters at a time.
+    """
+    remainder = ''
+    for block in iter(lambda: f.read(block_size), ''):
+        tokens = (remainder + block).split()
+        # The last token may continue into the next block.
+        remainder = '' if block[-1].isspace() or not tokens else tokens.pop()
+        yield tokens
+    if remainder:
+        yield [remainder]
+
+def tokens_to_arrays(tokens, n_indices):
+    """
+    Converts integral tokens of the form `i,j,...=value` into a pair of
+    arrays (indices, values), using a single vectorized conversion.
+    """
+    flat = np.array(','.join(tokens).replace('=', ',').split(','), dtype=np.float64)
+    table = flat.reshape(len(tokens), n_indices + 1)
+    return table[:, :n_indices].astype(np.int32), table[:, n_indices].copy()
+
+def parse_liquid(path, chunk_size=65536, block_size=1 << 20):
+    """
+    Parses a LIQUi|> file, yielding tuples (problem, kind, data), where
+    problem counts the `tst=` fields seen so far and:
+    - if kind is 'header', data is a (key, value) tuple for a header field;
+    - otherwise, kind is 'one_electron_integrals' or 'two_electron_integrals'
+      and data is a tuple (indices, values) of NumPy arrays holding at most
+      chunk_size integrals, with indices exactly as in the file.
+    """
+    problem = -1
+    pending = {n_commas: [] for n_commas in INTEGRAL_KINDS}
+    # Some files end with a summary of the form `orbs: 10, constants: 65`,
+    # in which case we need to remember each key until we see its value.
+    summary_key = None
+
+    def flush(n_commas):
+        tokens = pending[n_commas]
+        pending[n_commas] = []
+        return problem, INTEGRAL_KINDS[n_commas], tokens_to_arrays(tokens, n_commas + 1)
+
+    with open(path, 'r') as f:
+        for tokens in read_tokens(f, block_size):
+            for token in tokens:
+                if summary_key is not None:
+                    key, value, summary_key = summary_key, token.rstrip(','), None
+                elif token.endswith(':'):
+                    summary_key = SUMMARY_FIELDS.get(token[:-1], token[:-1])
+                    continue
+                else:
+                    key, _, value = token.partition('=')
+                if key[:1].isdigit():
+                    n_commas = key.count(',')
+                    if n_commas not in INTEGRAL_KINDS:
+                        raise ValueError(f"Unexpected integral {token!r} in {path}.")
+                    pending[n_commas].append(token)
+                    if len(pending[n_commas]) == chunk_size:
+                        yield flush(n_commas)
+                    continue
+
+                if key not in HEADER_FIELDS:
+                    raise ValueError(f"Unexpected field {token!r} in {path}.")
+                if key == 'tst' or problem < 0:
+                    for n_commas in INTEGRAL_KINDS:
+                        if pending[n_commas]:
+                            yield flush(n_commas)
+                    problem += 1
+                yield problem, 'header', (key, HEADER_FIELDS[key](value))
+
+    for n_commas in INTEGRAL_KINDS:
+        if pending[n_commas]:
+            yield flush(n_commas)
+
+def to_broombridge_indices(kind, indices):
+    """
+    Converts orbital indices from a LIQUi|> file into the 1-based indices
+    used by Broombridge, with two-electron integrals in Mulliken convention.
+    """
+    if kind == 'two_electron_integrals':
+        indices = indices[:, [0, 3, 1, 2]]
+    return indices + 1
+
+class IntegralSpool(object):
+    """
+    Collects the rows of an integral array in temporary binary files as they
+    are parsed, so that they can be written out once the rest of their
+    problem is known without holding them in memory.
+    """
+
+    def __init__(self, n_indices):
+        self.n_indices = n_indices
+        self.indices_file = tempfile.TemporaryFile()
+        self.values_file = tempfile.TemporaryFile()
+        self.count = 0
+        self.max_index = 0
+
+    def append(self, indices, values):
+        self.indices_file.write(np.ascontiguousarray(indices, dtype=np.int32).tobytes())
+        self.values_file.write(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        self.count += len(values)
+        if len(values):
+            self.max_index = max(self.max_index, int(indices.max()))
+
+    def chunks(self, chunk_size):
+        """
+        Yields the spooled rows as (indices, values) tuples of at most
+        chunk_size rows each.
+        """
+        self.indices_file.seek(0)
+        self.values_file.seek(0)
+        for start in range(0, self.count, chunk_size):
+            n_rows = min(chunk_size, self.count - start)
+            indices = np.fromfile(self.indices_file, dtype=np.int32, count=n_rows * self.n_indices)
+            values = np.fromfile(self.values_file, dtype=np.float64, count=n_rows)
+            yield indices.reshape(n_rows, self.n_indices), values
+
+    def write_npy(self, indices_path, values_path):
+        """
+        Writes the spooled rows as a pair of .npy files, by writing each
+        header followed by the raw contents of the corresponding spool.
+        """
+        for path, spool, dtype, shape in (
+            (indices_path, self.indices_file, np.int32, (self.count, self.n_indices)),
+            (values_path, self.values_file, np.float64, (self.count,))
+        ):
+            spool.seek(0)
+            with open(path, 'wb') as f:
+                np.lib.format.write_array_header_1_0(f, {
+                    'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                    'fortran_order': False,
+                    'shape': shape
+                })
+                shutil.copyfileobj(spool, f)
+
+    def close(self):
+        self.indices_file.close()
+        self.values_file.close()
+
+def format_value(value):
+    """
+    Formats a float such that YAML 1.1 parsers also read it back as a float
+    (e.g.: 1.0e-10 rather than 1e-10).
+    """
+    text = repr(value)
+    if 'e' in text and '.' not in text:
+        text = text.replace('e', '.0e')
+    return text
+
+def iter_problems(path, n_electrons=None, chunk_size=65536):
+    """
+    Parses a LIQUi|> file, yielding a tuple (problem, spools) for each
+    problem in the file, where problem is a Broombridge problem description
+    without integral values, and spools is a dictionary from integral kinds
+    to IntegralSpool instances holding the corresponding rows.
+
+    The spools are closed once the next problem is requested.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    current = None
+    header = {}
+    spools = {}
+
+    def finish():
+        n_orbitals = header.get('orbs', max(spool.max_index for spool in spools.values()))
+        problem = {
+            'metadata': {
+                'molecule_name': name,
+                'source': os.path.basename(path),
+                'tst': header.get('tst'),
+                'info': header.get('info')
+            },
+            'coulomb_repulsion': {'units': 'hartree', 'value': header.get('nuc', 0.0)},
+            'energy_offset': {'units': 'hartree', 'value': 0.0},
+            'n_orbitals': n_orbitals
+        }
+        if 'Ehf' in header:
+            problem['scf_energy'] = {'units': 'hartree', 'value': header['Ehf']}
+        if n_electrons is not None:
+            problem['n_electrons'] = n_electrons
+        problem['hamiltonian'] = {
+            'one_electron_integrals': {'format': 'sparse', 'units': 'hartree'},
+            'two_electron_integrals': {'format': 'sparse', 'index_convention': 'mulliken', 'units': 'hartree'}
+        }
+        return problem, spools
+
+    try:
+        for problem, kind, data in parse_liquid(path, chunk_size):
+            if problem != current:
+                if current is not None:
+                    yield finish()
+                    for spool in spools.values():
+                        spool.close()
+                current = problem
+                header = {}
+                spools = {
+                    kind: IntegralSpool(n_commas + 1)
+                    for n_commas, kind in INTEGRAL_KINDS.items()
+                }
+            if kind == 'header':
+                header[data[0]] = data[1]
+            else:
+                indices, values = data
+                spools[kind].append(to_broombridge_indices(kind, indices), values)
+        if current is not None:
+            yield finish()
+    finally:
+        for spool in spools.values():
+            spool.close()
+
+def write_yaml(path, output, n_electrons=None, chunk_size=65536):
+    """
+    Converts a LIQUi|> file into a Broombridge 0.2 YAML file, writing the
+    integrals of each problem a chunk at a time.
+    """
+    with open(output, 'w') as f:
+        f.write(f'"$schema": {SCHEMA_URL}\n')
+        f.write("format: {version: '0.2'}\n")
+        f.write("generator: {source: liquid.py}\n")
+        f.write("problem_description:\n")
+        for problem, spools in iter_problems(path, n_electrons, chunk_size):
+            hamiltonian = problem.pop('hamiltonian')
+            text = yaml.safe_dump(problem, default_flow_style=None, sort_keys=False)
+            f.write("- " + text.rstrip('\n').replace('\n', '\n  ') + "\n")
+            f.write("  hamiltonian:\n")
+            for kind, integrals in hamiltonian.items():
+                f.write(f"    {kind}:\n")
+                for key, value in integrals.items():
+                    f.write(f"      {key}: {value}\n")
+                if not spools[kind].count:
+                    f.write("      values: []\n")
+                    continue
+                f.write("      values:\n")
+                for indices, values in spools[kind].chunks(chunk_size):
+                    f.writelines(
+                        f"      - [{', '.join(map(str, idx))}, {format_value(value)}]\n"
+                        for idx, value in zip(indices.tolist(), values.tolist())
+                    )
+
+def write_sidecar(path, output, n_electrons=None, chunk_size=65536):
+    """
+    Converts a LIQUi|> file into a binary sidecar, which can then be read
+    using broombridge_cache.read_sidecar.
+    """
+    source = broombridge_cache.source_info(path)
+    staging = broombridge_cache.make_staging_dir(output)
+    try:
+        document = {
+            '$schema': SCHEMA_URL,
+            'format': {'version': '0.2'},
+            'generator': {'source': 'liquid.py'},
+            'problem_description': []
+        }
+        arrays = {}
+        for idx_problem, (problem, spools) in enumerate(iter_problems(path, n_electrons, chunk_size)):
+            for kind, spool in spools.items():
+                name = f"problem{idx_problem}_{kind}"
+                spool.write_npy(
+                    os.path.join(staging, f"{name}_indices.npy"),
+                    os.path.join(staging, f"{name}_values.npy")
+                )
+                arrays[name] = spool.count
+            document['problem_description'].append(problem)
+        broombridge_cache.publish(staging, output, source, arrays, document)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+def resolve_n_electrons(path, specs):
+    """
+    Finds the number of electrons for a given file from a list of
+    specifications, each either of the form `N`, which applies to all files,
+    or `PATTERN=N`, which applies to files whose names match PATTERN.
+    """
+    for spec in specs:
+        pattern, _, count = spec.rpartition('=')
+        if not pattern or fnmatch.fnmatch(os.path.basename(path), pattern):
+            return int(count)
+    return None
+
+def convert(path, output_dir, n_electrons=None, sidecar=False, chunk_size=65536):
+    """
+    Converts a single LIQUi|> file, returning the path of the output.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if sidecar:
+        output = os.path.join(output_dir, name + broombridge_cache.SIDECAR_EXTENSION)
+        write_sidecar(path, output, n_electrons, chunk_size)
+    else:
+        output = os.path.join(output_dir, name + ".yaml")
+        write_yaml(path, output, n_electrons, chunk_size)
+    return output
+
+def _convert_job(job):
+    path, output_dir, n_electrons, sidecar, chunk_size = job
+    return path, convert(path, output_dir, n_electrons, sidecar, chunk_size)
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = argparse.ArgumentParser(
+        description="Convert LIQUi|> integral files into Broombridge 0.2 YAML files or binary sidecars.")
+    parser.add_argument('files', nargs='+', help='LIQUi|> files or glob patterns to convert.')
+    parser.add_argument('-o', '--output-dir', default='.',
+        help='directory in which to write converted files.(default=.)')
+    parser.add_argument('-e', '--n-electrons', action='append', default=[], metavar='[PATTERN=]N',
+        help='number of electrons, either for all files or for files matching PATTERN. May be repeated.')
+    parser.add_argument('--sidecar', action='store_true', default=False,
+        help='write binary sidecars instead of YAML.(default=False)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+        help='number of files to convert in parallel, or 0 to use all cores.(default=1)')
+    parser.add_argument('--chunk-size', type=int, default=65536,
+        help='number of integrals to process at a time.(default=65536)')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    paths = sorted(path for pattern in args.files for path in glob.glob(pattern, recursive=True))
+    jobs = []
+    for path in paths:
+        n_electrons = resolve_n_electrons(path, args.n_electrons)
+        if n_electrons is None:
+            print(f"Warning: no number of electrons given for {path}; n_electrons will be missing from the output.")
+        jobs.append((path, args.output_dir, n_electrons, args.sidecar, args.chunk_size))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs or None) as executor:
+        for path, output in executor.map(_convert_job, jobs):
+            print(f"{path} -> {output}")
+    elapsed = time.perf_counter() - start
+    n_bytes = sum(os.path.getsize(path) for path in paths)
+    print(f"Converted {len(paths)} files in {elapsed:.2f} s ({n_bytes / elapsed / 2**20:.2f} MB/s).")
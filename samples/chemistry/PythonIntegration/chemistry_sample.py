@@ -1,4 +1,6 @@
 import logging
+import os
+import sys
 ## Uncomment the following lines if you want some detailed execution information:
 #logging.basicConfig(level=logging.INFO)
 
@@ -6,7 +8,10 @@ import logging
 # This module is part of the `qsharp` package. For detailed installation instructions, please visit:
 # https://docs.microsoft.com/azure/quantum/install-python-qdk
 import qsharp.chemistry
-from qsharp.chemistry import load_broombridge, load_fermion_hamiltonian, load_input_state, encode, IndexConvention
+from qsharp.chemistry import load_broombridge, load_fermion_hamiltonian, load_input_state, IndexConvention
+
+# The encoding cache used below is one of the BroombridgeTools.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'BroombridgeTools'))
 
 # Load a fermion Hamiltonian:
 fh1 = load_fermion_hamiltonian("broombridge.yaml")
@@ -47,16 +52,18 @@ qsharp.reload()
 # Import the Q# operation into Python:
 from Microsoft.Quantum.Samples import TrotterEstimateEnergy
 
-# load the broombridge data for H2:
-h2 = load_broombridge("h2.yaml")
-problem = h2.problem_description[0]
-fh = problem.load_fermion_hamiltonian()
-input_state = problem.load_input_state()
-
-
-# Once we have the hamiltonian and input state, we can call 'encode' to generate a Jordan-Wigner
-# representation, suitable for quantum simulation:
-qsharp_encoding = encode(fh, input_state)
+# To simulate H2, we load the Hamiltonian and input state of its first
+# problem description, and call 'encode' to generate a Jordan-Wigner
+# representation, suitable for quantum simulation. Encoding larger molecules
+# takes a while, so when running the same molecule many times, e.g. while
+# sweeping simulation parameters, it is worth caching the encoding on disk.
+# The cache does all of this on a miss, and skips loading and encoding
+# altogether when it already holds the encoding for the same file, problem,
+# index convention, input state and added terms:
+from encoding_cache import EncodingCache
+encoding_cache = EncodingCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.encodings'))
+qsharp_encoding = encoding_cache.encode("h2.yaml", problem_index=0, index_convention=IndexConvention.UpDown)
+print(f"Encoding cache: {encoding_cache.stats()}")
 
 # Simulate the Q# operation:
 print('Starting simulation.')
@@ -0,0 +1,201 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python script sweeps the parameters of the TrotterEstimateEnergy
+# operation in quantum.qs, so as to find the cheapest setting that still
+# estimates energies to within chemical accuracy.
+#
+# Each point of the sweep is a combination of a Broombridge file, a Trotter
+# step size, a number of bits of precision and a repetition (phase
+# estimation is probabilistic, so each point may be repeated). Points are
+# simulated concurrently by a pool of worker processes, each of which keeps
+# its own IQ# kernel with quantum.qs compiled, and each row of results is
+# appended to a CSV file as soon as its point finishes. Rerunning the same
+# sweep with the same results file skips the points already in that file,
+# so that an interrupted sweep can be resumed. For example:
+#
+#     python trotter_sweep.py h2.yaml --step-size 0.2 0.4 0.8 --bits 6 8 10 --repeats 3 --jobs 4 --reference-energy -1.137
+#
+# Alternatively, --configs reads a list of points from a JSON file of
+# objects with the keys "molecule", "step_size", "bits" and, optionally,
+# "repeat".
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SAMPLE_DIR = os.path.dirname(os.path.abspath(__file__))
+COLUMNS = ['molecule', 'step_size', 'bits', 'repeat', 'phase', 'energy', 'wall_time']
+# Chemical accuracy, in Hartree.
+CHEMICAL_ACCURACY = 1.6e-3
+
+def point_key(point):
+    """
+    Returns the key identifying a point of a sweep, used to decide which
+    points of a resumed sweep have already been completed.
+    """
+    return (os.path.abspath(point['molecule']), float(point['step_size']), int(point['bits']), int(point['repeat']))
+
+def grid_points(molecules, step_sizes, bits, repeats):
+    return [
+        {'molecule': molecule, 'step_size': step_size, 'bits': n_bits, 'repeat': repeat}
+        for molecule, step_size, n_bits, repeat in itertools.product(molecules, step_sizes, bits, range(repeats))
+    ]
+
+def load_points(path):
+    with open(path, 'r') as f:
+        points = json.load(f)
+    for point in points:
+        point.setdefault('repeat', 0)
+    return points
+
+def drop_partial_line(path):
+    """
+    Removes a trailing line without a newline, as left by an interrupted
+    sweep, from a given file, if any, such that rows appended to the file
+    start on a line of their own.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        contents = f.read()
+        if contents and not contents.endswith(b'\n'):
+            f.truncate(contents.rfind(b'\n') + 1)
+
+def read_completed(path):
+    """
+    Returns the rows of results already written to a given file, if any.
+    A row truncated by an interrupted sweep is skipped, such that its point
+    is simulated again; call drop_partial_line first, so that a truncated
+    last row is not mistaken for a complete one.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', newline='') as f:
+        return [row for row in csv.DictReader(f) if row.get('wall_time')]
+
+def _start_worker(cache_dir):
+    # Importing qsharp starts an IQ# kernel, which compiles the Q# files in
+    # its working directory; we do so once per worker, such that each worker
+    # reuses its kernel and compiled operation for every point it simulates.
+    global _encoding_cache, _operation
+    os.chdir(SAMPLE_DIR)
+    sys.path.append(os.path.join(SAMPLE_DIR, '..', 'BroombridgeTools'))
+    import qsharp
+    from encoding_cache import EncodingCache
+    qsharp.reload()
+    from Microsoft.Quantum.Samples import TrotterEstimateEnergy
+    _operation = TrotterEstimateEnergy
+    # Encodings only depend on the molecule, so workers share them through
+    # an on-disk cache rather than encoding the same molecule for each point.
+    _encoding_cache = EncodingCache(cache_dir)
+
+def simulate_point(point):
+    encoding = _encoding_cache.encode(point['molecule'])
+    start = time.perf_counter()
+    phase, energy = _operation.simulate(
+        qSharpData=encoding, nBitsPrecision=int(point['bits']), trotterStepSize=float(point['step_size'])
+    )
+    row = dict(point, phase=phase, energy=energy, wall_time=time.perf_counter() - start)
+    return {column: row[column] for column in COLUMNS}
+
+def summarize(rows, reference_energy):
+    """
+    Prints the mean energy and wall time for each setting, marking those
+    whose every repetition is within chemical accuracy of reference_energy,
+    and returns the fastest such setting for each molecule.
+    """
+    settings = {}
+    for row in rows:
+        settings.setdefault((row['molecule'], float(row['step_size']), int(row['bits'])), []).append(row)
+
+    best = {}
+    print(f"\n{'molecule':>24} {'step':>8} {'bits':>5} {'energy':>14} {'time (s)':>10}")
+    for (molecule, step_size, n_bits), setting_rows in sorted(settings.items()):
+        energies = [float(row['energy']) for row in setting_rows]
+        wall_time = sum(float(row['wall_time']) for row in setting_rows) / len(setting_rows)
+        accurate = reference_energy is not None and all(
+            abs(energy - reference_energy) <= CHEMICAL_ACCURACY for energy in energies
+        )
+        print(f"{os.path.basename(molecule):>24} {step_size:8.4f} {n_bits:5d} {sum(energies) / len(energies):14.8f} {wall_time:10.3f}{' *' if accurate else ''}")
+        if accurate and (molecule not in best or wall_time < best[molecule][-1]):
+            best[molecule] = (step_size, n_bits, wall_time)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Sweep the parameters of TrotterEstimateEnergy in parallel, resuming interrupted sweeps.")
+    parser.add_argument('molecules', nargs='*', default=['h2.yaml'], help='Broombridge files to simulate.(default=h2.yaml)')
+    parser.add_argument('-s', '--step-size', type=float, nargs='+', default=[0.4],
+        help='Trotter step sizes to sweep.(default=0.4)')
+    parser.add_argument('-b', '--bits', type=int, nargs='+', default=[10],
+        help='numbers of bits of precision to sweep.(default=10)')
+    parser.add_argument('-r', '--repeats', type=int, default=1,
+        help='number of times to simulate each setting.(default=1)')
+    parser.add_argument('--configs', default=None,
+        help='JSON file listing the points to simulate, instead of a grid.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+        help='number of worker processes, or 0 to use all cores.(default=1)')
+    parser.add_argument('-o', '--output', default='sweep.csv',
+        help='CSV file to append results to, and to resume from.(default=sweep.csv)')
+    parser.add_argument('--cache-dir', default=os.path.join(SAMPLE_DIR, '.encodings'),
+        help='directory in which to cache encodings.(default=.encodings)')
+    parser.add_argument('--reference-energy', type=float, default=None,
+        help='energy, in Hartree, against which to check chemical accuracy.')
+    args = parser.parse_args()
+
+    if args.configs is not None:
+        points = load_points(args.configs)
+    else:
+        points = grid_points(args.molecules, args.step_size, args.bits, args.repeats)
+    # Molecules are given relative to the current directory, while workers
+    # run in the directory of this sample.
+    for point in points:
+        point['molecule'] = os.path.abspath(point['molecule'])
+
+    drop_partial_line(args.output)
+    rows = read_completed(args.output)
+    completed = {point_key(row) for row in rows}
+    pending = [point for point in points if point_key(point) not in completed]
+    print(f"{len(points) - len(pending)} of {len(points)} points already completed; simulating {len(pending)}.")
+
+    start = time.perf_counter()
+    failed = []
+    new_file = not os.path.exists(args.output) or os.path.getsize(args.output) == 0
+    with open(args.output, 'a', newline='') as f, \
+         ProcessPoolExecutor(max_workers=args.jobs or None, initializer=_start_worker, initargs=(args.cache_dir,)) as executor:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if new_file:
+            writer.writeheader()
+        futures = {executor.submit(simulate_point, point): point for point in pending}
+        for idx_done, future in enumerate(as_completed(futures), 1):
+            point = futures[future]
+            try:
+                row = future.result()
+            except Exception as error:
+                # Failed points are not written, so that resuming the sweep
+                # simulates them again.
+                failed.append(point)
+                print(f"[{idx_done}/{len(pending)}] step={point['step_size']} bits={point['bits']} repeat={point['repeat']}: "
+                      f"failed, {type(error).__name__}: {error}")
+                continue
+            writer.writerow(row)
+            # Flush each row, so that an interrupted sweep loses at most
+            # the points still being simulated.
+            f.flush()
+            rows.append(row)
+            print(f"[{idx_done}/{len(pending)}] step={row['step_size']} bits={row['bits']} repeat={row['repeat']}: "
+                  f"energy={row['energy']:.8f} ({row['wall_time']:.2f} s)")
+    print(f"Simulated {len(pending) - len(failed)} points in {time.perf_counter() - start:.2f} s"
+          + (f"; {len(failed)} failed, and will be simulated again when the sweep is resumed." if failed else "."))
+
+    keys = {point_key(point) for point in points}
+    best = summarize([row for row in rows if point_key(row) in keys], args.reference_energy)
+    for molecule, (step_size, n_bits, wall_time) in best.items():
+        print(f"Fastest setting within chemical accuracy for {molecule}: "
+              f"step size {step_size}, {n_bits} bits ({wall_time:.3f} s).")
@@ -0,0 +1,214 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module contains a pool of quantum random bits, built on the
+# operation SampleQuantumRandomBits defined in the file Qrng.qs.
+#
+# Rather than calling into the simulator once per bit, the pool fetches
+# random bits in large blocks, keeps them packed in a NumPy uint8 buffer,
+# and refills that buffer in a background thread while the bits are being
+# used. Bits are then served as uniform integers in any range, or as byte
+# strings.
+#
+# To compare the throughput of the pool against calling
+# SampleQuantumRandomNumberGenerator once per bit, run:
+#
+#     python entropy_pool.py --bits 100000
+
+import threading
+
+import numpy as np
+
+
+def _quantum_source(n_bits):
+    # We import the quantum operation only when it is first needed, so that
+    # pools can also be built on other sources of random bits.
+    from Qrng import SampleQuantumRandomBits
+    return SampleQuantumRandomBits.simulate(nBits=n_bits)
+
+
+class QuantumEntropyPool:
+    """A buffered pool of random bits, refilled in blocks of block_bits bits.
+
+    source is a function taking a number of bits n and returning a sequence
+    of n random bits (0 or 1); by default, this is the Q# operation
+    SampleQuantumRandomBits. If prefetch is True, a background thread keeps
+    up to capacity_bits bits in the pool; otherwise, blocks are only fetched
+    when they are needed.
+    """
+
+    def __init__(self, source=_quantum_source, block_bits=1 << 14, capacity_bits=1 << 18, prefetch=True):
+        self.source = source
+        self.block_bits = block_bits
+        self.capacity_bits = max(capacity_bits, block_bits)
+        self.bits_fetched = 0
+
+        # Packed bits, of which the first _offset have already been used.
+        self._buffer = np.zeros(0, dtype=np.uint8)
+        self._offset = 0
+        # The number of bits that a caller of take_bits is waiting for, which
+        # may exceed capacity_bits.
+        self._wanted_bits = 0
+        self._condition = threading.Condition()
+        self._error = None
+        self._closed = False
+        self._thread = None
+        if prefetch:
+            self._thread = threading.Thread(target=self._refill_forever, daemon=True)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Stops the background thread, if any."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def available_bits(self):
+        """The number of random bits currently held in the pool."""
+        return 8 * len(self._buffer) - self._offset
+
+    def _fetch_block(self):
+        bits = np.asarray(self.source(self.block_bits), dtype=np.uint8)
+        if bits.shape != (self.block_bits,):
+            raise ValueError(f"Expected {self.block_bits} bits from the source, got {bits.shape}.")
+        return np.packbits(bits)
+
+    def _append(self, packed):
+        # Drop the bytes that have been used completely, then append the new
+        # block.
+        used_bytes = self._offset // 8
+        self._buffer = np.concatenate([self._buffer[used_bytes:], packed])
+        self._offset -= 8 * used_bytes
+        self.bits_fetched += 8 * len(packed)
+        self._condition.notify_all()
+
+    def _refill_forever(self):
+        while True:
+            with self._condition:
+                while not self._closed and self.available_bits >= max(self.capacity_bits, self._wanted_bits):
+                    self._condition.wait()
+                if self._closed:
+                    return
+            try:
+                packed = self._fetch_block()
+            except Exception as error:
+                with self._condition:
+                    self._error = error
+                    self._condition.notify_all()
+                return
+            with self._condition:
+                self._append(packed)
+
+    def take_bits(self, n_bits):
+        """Removes n_bits random bits from the pool, returning them as an array
+        of 0s and 1s of type uint8, waiting for the pool to be refilled if
+        needed.
+        """
+        with self._condition:
+            while self.available_bits < n_bits:
+                if self._error is not None:
+                    raise RuntimeError("Refilling the entropy pool failed.") from self._error
+                if self._thread is None:
+                    self._append(self._fetch_block())
+                else:
+                    self._wanted_bits = n_bits
+                    self._condition.notify_all()
+                    self._condition.wait()
+            self._wanted_bits = 0
+            start = self._offset
+            self._offset += n_bits
+            first_byte, last_byte = start // 8, (self._offset + 7) // 8
+            bits = np.unpackbits(self._buffer[first_byte:last_byte])
+            # Wake the background thread, now that there is room in the pool.
+            self._condition.notify_all()
+        return bits[start % 8:start % 8 + n_bits]
+
+    def random_bytes(self, n_bytes):
+        """Returns a byte string of n_bytes random bytes."""
+        return np.packbits(self.take_bits(8 * n_bytes)).tobytes()
+
+    def integers(self, low, high, size=None):
+        """Returns uniform random integers in the interval [low, high), as an
+        array of the given size, or as a single integer if size is None.
+
+        Each candidate uses only as many bits as needed to represent
+        high - low - 1, and candidates outside of the range are rejected,
+        such that on average fewer than two candidates are used per integer.
+        """
+        n_values = 1 if size is None else int(np.prod(size))
+        span = high - low
+        if span <= 0:
+            raise ValueError("Expected low < high.")
+        n_bits = (span - 1).bit_length()
+        if n_bits > 63:
+            values = [low + self._large_integer(span, n_bits) for _ in range(n_values)]
+            return values[0] if size is None else np.array(values, dtype=object).reshape(size)
+
+        weights = np.left_shift(np.uint64(1), np.arange(n_bits - 1, -1, -1, dtype=np.uint64))
+        values = np.empty(0, dtype=np.int64)
+        while len(values) < n_values:
+            # Draw the expected number of candidates needed, so that few
+            # random bits are drawn and then left unused, and repeat for any
+            # integers still missing.
+            n_missing = n_values - len(values)
+            n_candidates = -(-n_missing * (1 << n_bits) // span)
+            if n_bits == 0:
+                candidates = np.zeros(n_missing, dtype=np.uint64)
+            else:
+                bits = self.take_bits(n_bits * n_candidates).reshape(n_candidates, n_bits)
+                candidates = bits.astype(np.uint64) @ weights
+            accepted = candidates[candidates < np.uint64(span)].astype(np.int64)
+            values = np.concatenate([values, accepted[:n_missing]])
+        values += low
+        return int(values[0]) if size is None else values.reshape(size)
+
+    def randint(self, low, high):
+        """Returns a uniform random integer n such that low <= n <= high."""
+        return self.integers(low, high + 1)
+
+    def _large_integer(self, span, n_bits):
+        while True:
+            bits = self.take_bits(n_bits)
+            candidate = int("".join(map(str, bits.tolist())), 2)
+            if candidate < span:
+                return candidate
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(
+        description="Compare the throughput of the quantum entropy pool against sampling one bit per call.")
+    parser.add_argument('--bits', type=int, default=100000,
+        help='number of bits to draw from the pool.(default=100000)')
+    parser.add_argument('--per-bit', type=int, default=200,
+        help='number of bits to draw one per call.(default=200)')
+    parser.add_argument('--block-bits', type=int, default=1 << 14,
+        help='number of bits to fetch per call to the quantum operation.(default=16384)')
+    args = parser.parse_args()
+
+    import qsharp
+    from Qrng import SampleQuantumRandomNumberGenerator
+
+    start = time.perf_counter()
+    for _ in range(args.per_bit):
+        SampleQuantumRandomNumberGenerator.simulate()
+    per_bit_rate = args.per_bit / (time.perf_counter() - start)
+    print(f"One bit per call: {per_bit_rate:,.0f} bits/s")
+
+    with QuantumEntropyPool(block_bits=args.block_bits) as pool:
+        start = time.perf_counter()
+        bits = pool.take_bits(args.bits)
+        pool_rate = args.bits / (time.perf_counter() - start)
+    print(f"Entropy pool: {pool_rate:,.0f} bits/s ({pool_rate / per_bit_rate:,.1f}x); "
+          f"fraction of ones: {bits.mean():.4f}")
@@ -2,29 +2,24 @@
 # Licensed under the MIT License.
 
 # This Python script contains a quantum random integer generator
-# using the operation QuantumRandomNumberGenerator defined in
+# using the operation SampleQuantumRandomBits defined in
 # the file qrng.qs.
 
 # For instructions on how to install the qsharp package,
 # see: https://docs.microsoft.com/azure/quantum/install-python-qdk
 
 import qsharp
-from Qrng import SampleQuantumRandomNumberGenerator # We import the 
-# quantum operation from the namespace defined in the file Qrng.qs
+from entropy_pool import QuantumEntropyPool # We import the pool of
+# random bits defined in entropy_pool.py, which calls the quantum
+# operation SampleQuantumRandomBits from the namespace defined in the
+# file Qrng.qs to sample many random bits at once.
 max = 50 # Here we set the maximum of our range
-output = max + 1 # Variable to store the output
-while output > max:
-    bit_string = [] # We initialize a list to store the bits that
-    # will define our random integer
-    for i in range(0, max.bit_length()): # We need to call the quantum
-        # operation as many times as bits are needed to define the
-        # maximum of our range. For example, if max=7 we need 3 bits
-        # to generate all the numbers from 0 to 7. 
-        bit_string.append(SampleQuantumRandomNumberGenerator.simulate()) 
-        # Here we call the quantum operation and store the random bit
-        # in the list
-    output = int("".join(str(x) for x in bit_string), 2) 
-# Transform bit string to integer
+with QuantumEntropyPool(block_bits=64, prefetch=False) as pool:
+    # We need as many bits as are needed to define the maximum of our
+    # range. For example, if max=7 we need 3 bits to generate all the
+    # numbers from 0 to 7. If these bits define a number larger than
+    # max, the pool draws new bits until they do not.
+    output = pool.randint(0, max)
 
 print("The random number generated is " + str(output))
 # We print the random number
@@ -0,0 +1,147 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module classifies the samples of a dataset with a trained
+# half-moons model, in fixed-size batches spread over worker processes,
+# rather than passing every sample to a single call of
+# ClassifyHalfMoonModel.
+#
+# Datasets are loaded with dataset.py, and each worker memory-maps the
+# dataset itself, such that only the bounds of each batch are sent to it.
+# The labels of each batch are written into a single array as batches
+# complete, and the latency of each batch is reported, together with the
+# number of samples in each case of the confusion matrix plotted by
+# host.py. To classify the validation samples of data.json with a model
+# saved by multi_start.py, run e.g.:
+#
+#     python classify.py --model models.json --batch-size 16 --jobs 4
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from dataset import DEFAULT_CACHE_DIR, load_dataset, load_split
+
+SAMPLE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The cases of the confusion matrix, as pairs (actual, classified) of labels.
+CASES = [(0, 0), (0, 1), (1, 1), (1, 0)]
+
+
+def confusion_masks(actual_labels, classified_labels):
+    """Returns a dictionary from each case (actual, classified) in CASES to a
+    mask selecting the samples in that case.
+    """
+    actual_labels, classified_labels = np.asarray(actual_labels), np.asarray(classified_labels)
+    return {
+        (actual, classified): (actual_labels == actual) & (classified_labels == classified)
+        for actual, classified in CASES
+    }
+
+
+def _start_worker(dataset_path, split):
+    # Importing qsharp starts an IQ# kernel, which compiles the Q# files in
+    # its working directory; we do so once per worker, together with
+    # memory-mapping the samples to classify.
+    global _classify, _features
+    os.chdir(SAMPLE_DIR)
+    import qsharp
+    from Microsoft.Quantum.Samples import ClassifyHalfMoonModel
+    _classify = ClassifyHalfMoonModel
+    _features = load_split(dataset_path, split).features
+
+
+def classify_batch(job):
+    """Classifies the samples from index start to index stop, returning the
+    bounds of the batch, its labels and its latency in seconds.
+    """
+    start, stop, parameters, bias, tolerance, n_measurements = job
+    begin = time.perf_counter()
+    labels = _classify.simulate(
+        samples=_features[start:stop].tolist(),
+        parameters=parameters, bias=bias,
+        tolerance=tolerance, nMeasurements=n_measurements
+    )
+    return start, stop, labels, time.perf_counter() - begin
+
+
+def classify_dataset(dataset_path, split, parameters, bias, batch_size=16, jobs=0,
+                     tolerance=0.005, n_measurements=10_000):
+    """Classifies the samples of a split of a converted dataset in batches of
+    batch_size samples, running up to `jobs` batches at once, or one per
+    core if jobs is 0.
+
+    Returns the array of labels and the array of the latency of each batch.
+    """
+    # Workers change to the directory of the sample, so they are given an
+    # absolute path.
+    dataset_path = os.path.abspath(dataset_path)
+    n_samples = len(load_split(dataset_path, split).labels)
+    labels = np.empty(n_samples, dtype=np.int64)
+    latencies = []
+    batches = [
+        (start, min(start + batch_size, n_samples), list(parameters), bias, tolerance, n_measurements)
+        for start in range(0, n_samples, batch_size)
+    ]
+    # Workers start their own IQ# kernel, so we spawn them rather than fork
+    # them from a process that may have started a kernel already.
+    with ProcessPoolExecutor(max_workers=jobs or None, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_start_worker, initargs=(dataset_path, split)) as executor:
+        futures = [executor.submit(classify_batch, batch) for batch in batches]
+        for future in as_completed(futures):
+            start, stop, batch_labels, latency = future.result()
+            labels[start:stop] = batch_labels
+            latencies.append(latency)
+    return labels, np.array(latencies)
+
+
+def load_model(path):
+    """Loads the parameters and bias of a model from a JSON file, either as
+    written by multi_start.py, or holding the keys "parameters" and "bias".
+    """
+    with open(path) as f:
+        model = json.load(f)
+    model = model.get('best', model)
+    return model['parameters'], model['bias']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Classify a dataset with a trained half-moons model, in batches spread over worker processes.")
+    parser.add_argument('-m', '--model', required=True,
+        help='JSON file holding the parameters and bias of the model, such as written by multi_start.py.')
+    parser.add_argument('-d', '--data', default='data.json',
+        help='JSON dataset to classify.(default=data.json)')
+    parser.add_argument('-s', '--split', choices=['train', 'validation'], default='validation',
+        help='split of the dataset to classify.(default=validation)')
+    parser.add_argument('-b', '--batch-size', type=int, default=16,
+        help='number of samples to classify per call.(default=16)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+        help='number of worker processes, or 0 to use all cores.(default=0)')
+    parser.add_argument('--n-measurements', type=int, default=10_000,
+        help='number of measurements used to estimate each classification probability.(default=10000)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+        help=f'directory in which to store converted datasets.(default={DEFAULT_CACHE_DIR})')
+    args = parser.parse_args()
+
+    parameters, bias = load_model(args.model)
+    dataset = load_dataset(args.data, args.cache_dir)
+    actual_labels = getattr(dataset, args.split).labels
+
+    start = time.perf_counter()
+    labels, latencies = classify_dataset(
+        dataset.path, args.split, parameters, bias, args.batch_size, args.jobs, n_measurements=args.n_measurements
+    )
+    wall_time = time.perf_counter() - start
+    print(f"Classified {len(labels)} samples in {len(latencies)} batches in {wall_time:.1f} s "
+          f"({len(labels) / wall_time:.1f} samples/s).")
+    print(f"Batch latency: mean {latencies.mean():.2f} s, median {np.median(latencies):.2f} s, "
+          f"max. {latencies.max():.2f} s.")
+    print(f"Miss rate: {np.mean(labels != actual_labels):0.2%}")
+    for (actual, classified), mask in confusion_masks(actual_labels, labels).items():
+        print(f"    was {actual}, classified {classified}: {np.count_nonzero(mask)}")
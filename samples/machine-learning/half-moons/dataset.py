@@ -0,0 +1,109 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module loads datasets for the quantum machine learning samples
+# as NumPy arrays, rather than as nested lists parsed from JSON each time.
+#
+# Datasets are JSON files of the form used by data.json, with the keys
+# "TrainingData" and "ValidationData", each holding "Features" and
+# "Labels". The first time a dataset is loaded, it is converted into one
+# .npy file per split and array, in a cache directory keyed by the contents
+# of the JSON file; later loads memory-map those files, such that features
+# are only read from disk as they are used. To convert a dataset ahead of
+# time, run e.g.:
+#
+#     python dataset.py data.json
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = ".datasets"
+
+# The splits of a dataset, as named in JSON and in the cache.
+SPLITS = {'train': 'TrainingData', 'validation': 'ValidationData'}
+
+Split = namedtuple('Split', ['features', 'labels'])
+Dataset = namedtuple('Dataset', ['train', 'validation', 'path'])
+Dataset.__doc__ = """The training and validation splits of a dataset, each a Split of a
+features array of shape (n_samples, n_features) and a labels array of shape
+(n_samples,), and the cache directory they were loaded from."""
+
+
+def dataset_key(json_path):
+    """Returns the SHA-256 hash of the contents of a JSON dataset."""
+    digest = hashlib.sha256()
+    with open(json_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def convert_dataset(json_path, cache_dir=DEFAULT_CACHE_DIR):
+    """Converts a JSON dataset into .npy files, unless it was converted
+    already, and returns the directory holding them.
+    """
+    name = os.path.splitext(os.path.basename(json_path))[0]
+    path = os.path.join(cache_dir, f"{name}-{dataset_key(json_path)[:16]}")
+    if os.path.isdir(path):
+        return path
+
+    with open(json_path) as f:
+        data = json.load(f)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary directory first, so that a partially converted
+    # dataset is never loaded.
+    staging = tempfile.mkdtemp(dir=cache_dir, prefix=".staging-")
+    try:
+        for split, key in SPLITS.items():
+            np.save(os.path.join(staging, f"{split}_features.npy"),
+                    np.asarray(data[key]['Features'], dtype=np.float64))
+            np.save(os.path.join(staging, f"{split}_labels.npy"),
+                    np.asarray(data[key]['Labels'], dtype=np.int64))
+        os.replace(staging, path)
+        # mkdtemp creates directories that only their owner can read.
+        os.chmod(path, 0o755)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        # Another process may have converted the same dataset meanwhile.
+        if not os.path.isdir(path):
+            raise
+    return path
+
+
+def load_split(path, split, mmap=True):
+    """Loads a split ("train" or "validation") of a converted dataset."""
+    mmap_mode = 'r' if mmap else None
+    return Split(
+        np.load(os.path.join(path, f"{split}_features.npy"), mmap_mode=mmap_mode),
+        np.load(os.path.join(path, f"{split}_labels.npy"), mmap_mode=mmap_mode)
+    )
+
+
+def load_dataset(json_path='data.json', cache_dir=DEFAULT_CACHE_DIR, mmap=True):
+    """Loads a JSON dataset as NumPy arrays, converting it first if needed.
+    If mmap is True, arrays are memory-mapped rather than read into memory.
+    """
+    path = convert_dataset(json_path, cache_dir)
+    return Dataset(*(load_split(path, split, mmap) for split in SPLITS), path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert JSON datasets into cached NumPy arrays.")
+    parser.add_argument('json_path', nargs='+', help='JSON datasets to convert.')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+        help=f'directory in which to store converted datasets.(default={DEFAULT_CACHE_DIR})')
+    args = parser.parse_args()
+
+    for json_path in args.json_path:
+        dataset = load_dataset(json_path, args.cache_dir)
+        print(f"{json_path} -> {dataset.path}: {len(dataset.train.labels)} training samples, "
+              f"{len(dataset.validation.labels)} validation samples, "
+              f"{dataset.train.features.shape[1]} features.")
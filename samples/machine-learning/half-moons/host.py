@@ -1,8 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-import json
-
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
@@ -15,9 +13,13 @@ from Microsoft.Quantum.Samples import (
     TrainHalfMoonModel, ValidateHalfMoonModel, ClassifyHalfMoonModel
 )
 
+from dataset import load_dataset
+from classify import CASES, confusion_masks
+
 if __name__ == "__main__":
-    with open('data.json') as f:
-        data = json.load(f)
+    # Load the dataset as NumPy arrays, converting data.json the first
+    # time it is used.
+    data = load_dataset('data.json')
     parameter_starting_points = [
         [0.060057, 3.00522,  2.03083,  0.63527,  1.03771, 1.27881, 4.10186,  5.34396],
         [0.586514, 3.371623, 0.860791, 2.92517,  1.14616, 2.99776, 2.26505,  5.62137],
@@ -26,23 +28,23 @@ if __name__ == "__main__":
      ]
 
     (parameters, bias) = TrainHalfMoonModel.simulate(
-        trainingVectors=data['TrainingData']['Features'],
-        trainingLabels=data['TrainingData']['Labels'],
+        trainingVectors=data.train.features.tolist(),
+        trainingLabels=data.train.labels.tolist(),
         initialParameters=parameter_starting_points
     )
 
     miss_rate = ValidateHalfMoonModel.simulate(
-        validationVectors=data['ValidationData']['Features'],
-        validationLabels=data['ValidationData']['Labels'],
+        validationVectors=data.validation.features.tolist(),
+        validationLabels=data.validation.labels.tolist(),
         parameters=parameters, bias=bias
     )
 
     print(f"Miss rate: {miss_rate:0.2%}")
 
     # Classify the validation so that we can plot it.
-    actual_labels = data['ValidationData']['Labels']
+    actual_labels = data.validation.labels
     classified_labels = ClassifyHalfMoonModel.simulate(
-        samples=data['ValidationData']['Features'],
+        samples=data.validation.features.tolist(),
         parameters=parameters, bias=bias,
         tolerance=0.005, nMeasurements=10_000
     )
@@ -54,12 +56,7 @@ if __name__ == "__main__":
     # - actually 0, classified as 1
     # - actually 1, classified as 1
     # - actually 1, classified as 0
-    cases = [
-        (0, 0),
-        (0, 1),
-        (1, 1),
-        (1, 0)
-    ]
+    cases = CASES
     # We can use these cases to define markers and colormaps for plotting.
     markers = [
         '.' if actual == classified else 'x'
@@ -68,17 +65,14 @@ if __name__ == "__main__":
     colormap = cmx.ScalarMappable(colors.Normalize(vmin=0, vmax=len(cases) - 1))
     colors = [colormap.to_rgba(idx_case) for (idx_case, case) in enumerate(cases)]
 
-    # It's also really helpful to have the samples as a NumPy array so that we
-    # can find masks for each of the four cases.
-    samples = np.array(data['ValidationData']['Features'])
+    # We can then find masks for each of the four cases.
+    samples = data.validation.features
+    masks = confusion_masks(actual_labels, classified_labels)
 
     # Finally, we loop over the cases above and plot the samples that match
     # each.
     for (idx_case, ((actual, classified), marker, color)) in enumerate(zip(cases, markers, colors)):
-        mask = np.logical_and(
-            np.equal(actual_labels, actual),
-            np.equal(classified_labels, classified)
-        )
+        mask = masks[(actual, classified)]
         if not np.any(mask):
             continue
         plt.scatter(
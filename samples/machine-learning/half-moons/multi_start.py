@@ -0,0 +1,190 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python script trains the half-moons classifier from many starting
+# points at once, as the C# sample in ../parallel-half-moons does, rather
+# than passing all starting points to a single call of TrainHalfMoonModel,
+# which trains from each of them in turn.
+#
+# Each starting point is trained in a worker process of its own, using the
+# operation TrainHalfMoonModelAtStartPoint defined in Training.qs, and the
+# resulting model is then validated in the same worker. Optionally, every
+# starting point is first trained for only a few epochs, after which only
+# the starting points with the fewest training misses are trained further,
+# from where they left off. To train from the four starting points used by
+# host.py, and from 12 random ones, run e.g.:
+#
+#     python multi_start.py --random 12 --jobs 8 --probe-epochs 4 --keep 0.25 --output models.json
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+SAMPLE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The number of parameters of the classifier, i.e. the number of rotations
+# returned by ClassifierStructure in Training.qs.
+N_PARAMETERS = 8
+
+# The number of epochs TrainHalfMoonModel trains for.
+MAX_EPOCHS = 16
+
+# The starting points used by host.py.
+PARAMETER_STARTING_POINTS = [
+    [0.060057, 3.00522,  2.03083,  0.63527,  1.03771, 1.27881, 4.10186,  5.34396],
+    [0.586514, 3.371623, 0.860791, 2.92517,  1.14616, 2.99776, 2.26505,  5.62137],
+    [1.69704,  1.13912,  2.3595,   4.037552, 1.63698, 1.27549, 0.328671, 0.302282],
+    [5.21662,  6.04363,  0.224184, 1.53913,  1.64524, 4.79508, 1.49742,  1.545]
+]
+
+
+def random_starting_points(n_points, rng):
+    """Returns n_points starting points, with parameters drawn uniformly at
+    random from [0, 2π).
+    """
+    return (2 * np.pi * rng.random((n_points, N_PARAMETERS))).tolist()
+
+
+def _start_worker():
+    # Importing qsharp starts an IQ# kernel, which compiles the Q# files in
+    # its working directory; we do so once per worker, such that each worker
+    # reuses its kernel for every starting point it trains.
+    global _data, _train, _validate
+    os.chdir(SAMPLE_DIR)
+    import qsharp
+    from Microsoft.Quantum.Samples import TrainHalfMoonModelAtStartPoint, ValidateHalfMoonModel
+    from dataset import load_dataset
+    _train, _validate = TrainHalfMoonModelAtStartPoint, ValidateHalfMoonModel
+    # Convert the samples to lists once, rather than for each starting point.
+    dataset = load_dataset('data.json')
+    _data = {
+        split: (getattr(dataset, split).features.tolist(), getattr(dataset, split).labels.tolist())
+        for split in ('train', 'validation')
+    }
+
+
+def train_start(job):
+    """Trains the classifier from a single starting point for a given number
+    of epochs and validates it, returning a dictionary with the parameters,
+    bias, number of training misses and validation miss rate of the model.
+    """
+    index, parameters, bias, n_epochs = job
+    start = time.perf_counter()
+    parameters, bias, training_misses = _train.simulate(
+        trainingVectors=_data['train'][0],
+        trainingLabels=_data['train'][1],
+        startPoint=parameters, startBias=bias, maxEpochs=n_epochs
+    )
+    miss_rate = _validate.simulate(
+        validationVectors=_data['validation'][0],
+        validationLabels=_data['validation'][1],
+        parameters=parameters, bias=bias
+    )
+    return {
+        'index': index,
+        'parameters': list(parameters),
+        'bias': bias,
+        'training_misses': training_misses,
+        'miss_rate': miss_rate,
+        'epochs': n_epochs,
+        'wall_time': time.perf_counter() - start
+    }
+
+
+def _run_round(executor, jobs):
+    results = {}
+    futures = [executor.submit(train_start, job) for job in jobs]
+    for idx_done, future in enumerate(as_completed(futures), 1):
+        result = future.result()
+        results[result['index']] = result
+        print(f"[{idx_done}/{len(jobs)}] start {result['index']}, {result['epochs']} epochs: "
+              f"{result['training_misses']} training misses, miss rate {result['miss_rate']:0.2%} "
+              f"({result['wall_time']:.1f} s)")
+    return results
+
+
+def train_multi_start(starting_points, jobs=0, max_epochs=MAX_EPOCHS, probe_epochs=None, keep=0.25):
+    """Trains the classifier from each starting point in a separate worker
+    process, running up to `jobs` workers at once, or one per core if jobs
+    is 0.
+
+    If probe_epochs is given, every starting point is first trained for
+    probe_epochs epochs only, and only the fraction `keep` of them with the
+    fewest training misses are then trained for the remaining epochs, up to
+    max_epochs in total.
+
+    Returns the result of train_start for the model with the lowest
+    validation miss rate, and the list of results for every starting point,
+    where wall times and epochs add up over both rounds.
+    """
+    first_epochs = max_epochs if probe_epochs is None else min(probe_epochs, max_epochs)
+    # Workers start their own IQ# kernel, so we spawn them rather than fork
+    # them from a process that may have started a kernel already.
+    with ProcessPoolExecutor(max_workers=jobs or None, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_start_worker) as executor:
+        results = _run_round(executor, [
+            (index, list(parameters), 0.0, first_epochs) for index, parameters in enumerate(starting_points)
+        ])
+        if first_epochs < max_epochs:
+            ranked = sorted(results.values(), key=lambda result: result['training_misses'])
+            survivors = ranked[:max(1, math.ceil(keep * len(ranked)))]
+            print(f"Training {len(survivors)} of {len(ranked)} starting points for "
+                  f"{max_epochs - first_epochs} more epochs.")
+            continued = _run_round(executor, [
+                (result['index'], result['parameters'], result['bias'], max_epochs - first_epochs)
+                for result in survivors
+            ])
+            for index, result in continued.items():
+                result['epochs'] += results[index]['epochs']
+                result['wall_time'] += results[index]['wall_time']
+                results[index] = result
+
+    results = [results[index] for index in sorted(results)]
+    best = min(results, key=lambda result: (result['miss_rate'], result['training_misses']))
+    return best, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Train the half-moons classifier from many starting points in parallel.")
+    parser.add_argument('-r', '--random', type=int, default=0,
+        help='number of random starting points to train from, besides those of host.py.(default=0)')
+    parser.add_argument('--no-default-starts', action='store_true', default=False,
+        help='do not train from the starting points of host.py.(default=False)')
+    parser.add_argument('--seed', type=int, default=None,
+        help='seed for the random starting points.(default: random)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+        help='number of worker processes, or 0 to use all cores.(default=0)')
+    parser.add_argument('-e', '--max-epochs', type=int, default=MAX_EPOCHS,
+        help=f'number of epochs to train each surviving starting point for.(default={MAX_EPOCHS})')
+    parser.add_argument('-p', '--probe-epochs', type=int, default=None,
+        help='train every starting point for this many epochs first, and stop the weakest.(default: no early stopping)')
+    parser.add_argument('-k', '--keep', type=float, default=0.25,
+        help='with --probe-epochs, the fraction of starting points to keep training.(default=0.25)')
+    parser.add_argument('-o', '--output', default=None,
+        help='JSON file to write the best model and all results to.(default: none)')
+    args = parser.parse_args()
+
+    starting_points = [] if args.no_default_starts else list(PARAMETER_STARTING_POINTS)
+    starting_points += random_starting_points(args.random, np.random.default_rng(args.seed))
+    if not starting_points:
+        parser.error("No starting points to train from.")
+
+    start = time.perf_counter()
+    best, results = train_multi_start(starting_points, args.jobs, args.max_epochs, args.probe_epochs, args.keep)
+    wall_time = time.perf_counter() - start
+    total_time = sum(result['wall_time'] for result in results)
+    print(f"Trained from {len(results)} starting points in {wall_time:.1f} s "
+          f"({total_time:.1f} s of training, {total_time / wall_time:.1f}x speedup).")
+    print(f"Best model: start {best['index']}, miss rate {best['miss_rate']:0.2%}, "
+          f"parameters {best['parameters']}, bias {best['bias']}")
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'best': best, 'results': results}, f, indent=4)
@@ -0,0 +1,270 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python script sweeps the training options of the wine classifier,
+# rather than training once with the options fixed in TrainWineModel.
+#
+# Each configuration gives the number of starting points and the seed used
+# to draw them, the learning rate, minibatch size, tolerance, number of
+# measurements and number of epochs. Configurations are taken either from
+# the grid of all combinations of the values given on the command line, or
+# drawn at random from the ranges they span, and are trained and validated
+# in parallel across a pool of worker processes, using the operations
+# TrainWineModelAtStartPoints and ValidateWineModel defined in Training.qs.
+#
+# The result of each configuration is cached on disk, keyed by the
+# configuration and by a hash of the Q# code and project that define the
+# data and the classifier, so that an interrupted or extended sweep only
+# trains configurations it has not trained before. To sweep a small grid,
+# run e.g.:
+#
+#     python sweep.py --learning-rate 0.1 0.4 --max-epochs 8 16 --n-starts 4 16 --jobs 0
+#
+# To draw 20 configurations at random instead, run e.g.:
+#
+#     python sweep.py --random 20 --learning-rate 0.05 1.0 --tolerance 0.001 0.05 --seed 42
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+SAMPLE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = ".sweep-cache"
+
+# The training options of TrainWineModel, used for any option not swept.
+DEFAULT_CONFIG = {
+    'n_starts': 16,
+    'seed': 0,
+    'learning_rate': 0.4,
+    'minibatch_size': 2,
+    'tolerance': 0.01,
+    'n_measurements': 10000,
+    'max_epochs': 16
+}
+
+# Options that random search draws log-uniformly, rather than picking one
+# of the values given.
+LOG_UNIFORM_OPTIONS = ('learning_rate', 'tolerance')
+
+# Files that define the data and the classifier; results are recomputed
+# whenever either changes.
+DATA_FILES = ('Training.qs', 'Wine.csproj')
+
+
+def data_key():
+    """Returns a hash of the files that define the data and the classifier."""
+    digest = hashlib.sha256()
+    for name in DATA_FILES:
+        with open(os.path.join(SAMPLE_DIR, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def config_key(config, data_hash):
+    description = {'config': config, 'data': data_hash}
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def grid_configs(options):
+    """Returns every combination of the values given for each option, as a
+    list of configurations.
+    """
+    names = sorted(options)
+    return [
+        dict(DEFAULT_CONFIG, **dict(zip(names, values)))
+        for values in itertools.product(*(options[name] for name in names))
+    ]
+
+
+def random_configs(options, n_configs, rng):
+    """Draws n_configs configurations at random. Options in
+    LOG_UNIFORM_OPTIONS given more than one value are drawn log-uniformly
+    between the smallest and largest value; other options are drawn
+    uniformly from the values given.
+    """
+    configs = []
+    for _ in range(n_configs):
+        config = dict(DEFAULT_CONFIG)
+        for name, values in sorted(options.items()):
+            if name in LOG_UNIFORM_OPTIONS and len(values) > 1:
+                low, high = math.log(min(values)), math.log(max(values))
+                config[name] = float(math.exp(rng.uniform(low, high)))
+            else:
+                config[name] = values[rng.integers(len(values))]
+        configs.append(config)
+    return configs
+
+
+def _start_worker():
+    # Importing qsharp starts an IQ# kernel, which compiles the Q# files in
+    # its working directory; we do so once per worker, such that each worker
+    # reuses its kernel for every configuration it trains.
+    global _train, _validate, _n_parameters, _n_validation_samples
+    os.chdir(SAMPLE_DIR)
+    import qsharp
+    from Microsoft.Quantum.Samples import (
+        TrainWineModelAtStartPoints, ValidateWineModel, NWineParameters, NWineValidationSamples
+    )
+    _train, _validate = TrainWineModelAtStartPoints, ValidateWineModel
+    _n_parameters = NWineParameters.simulate()
+    _n_validation_samples = NWineValidationSamples.simulate()
+
+
+def evaluate(config):
+    """Trains and validates the classifier with a given configuration,
+    returning a dictionary with its parameters, bias, number of training
+    misses, validation miss rate and wall time.
+    """
+    start = time.perf_counter()
+    # Draw starting points from [-π, 0), as SampleInitialParameters does,
+    # but from a seed, so that each configuration is reproducible.
+    rng = np.random.default_rng(config['seed'])
+    initial_parameters = np.pi * (rng.random((config['n_starts'], _n_parameters)) - 1.0)
+    parameters, bias, training_misses = _train.simulate(
+        initialParameters=initial_parameters.tolist(),
+        learningRate=float(config['learning_rate']),
+        minibatchSize=int(config['minibatch_size']),
+        tolerance=float(config['tolerance']),
+        nMeasurements=int(config['n_measurements']),
+        maxEpochs=int(config['max_epochs'])
+    )
+    n_misses = _validate.simulate(parameters=parameters, bias=bias)
+    return {
+        'config': config,
+        'parameters': list(parameters),
+        'bias': bias,
+        'training_misses': training_misses,
+        'miss_rate': n_misses / _n_validation_samples,
+        'wall_time': time.perf_counter() - start
+    }
+
+
+def read_cached(cache_dir, key):
+    try:
+        with open(os.path.join(cache_dir, key + ".json"), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cached(cache_dir, key, result):
+    # Write to a temporary file first, so that an interrupted sweep never
+    # leaves a partially written result behind.
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix=".staging-")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(result, f)
+    os.replace(temp_path, os.path.join(cache_dir, key + ".json"))
+
+
+def run_sweep(configs, jobs=0, cache_dir=DEFAULT_CACHE_DIR):
+    """Evaluates each configuration, reading results from cache_dir where
+    possible, and running up to `jobs` worker processes at once, or one per
+    core if jobs is 0. Returns the list of results, in the order of configs;
+    configurations that failed to train are returned with an "error"
+    describing why, rather than a miss rate, and are not cached.
+    """
+    data_hash = data_key()
+    keys = [config_key(config, data_hash) for config in configs]
+    results = [read_cached(cache_dir, key) for key in keys]
+    pending = {key: config for key, config, result in zip(keys, configs, results) if result is None}
+    print(f"{len(configs) - sum(result is None for result in results)} of {len(configs)} configurations cached; "
+          f"training {len(pending)}.")
+
+    if pending:
+        computed = {}
+        # Workers start their own IQ# kernel, so we spawn them rather than
+        # fork them from a process that may have started a kernel already.
+        with ProcessPoolExecutor(max_workers=jobs or None, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_start_worker) as executor:
+            futures = {executor.submit(evaluate, config): key for key, config in pending.items()}
+            for idx_done, future in enumerate(as_completed(futures), 1):
+                key = futures[future]
+                try:
+                    result = future.result()
+                except Exception as error:
+                    # Report the configuration as failed, without caching
+                    # it, such that it is trained again on the next sweep,
+                    # and carry on with the others.
+                    computed[key] = {'config': pending[key], 'error': f"{type(error).__name__}: {error}"}
+                    print(f"[{idx_done}/{len(pending)}] {format_config(pending[key])}: "
+                          f"failed, {computed[key]['error']}")
+                    continue
+                write_cached(cache_dir, key, result)
+                computed[key] = result
+                print(f"[{idx_done}/{len(pending)}] {format_config(result['config'])}: "
+                      f"miss rate {result['miss_rate']:0.2%} ({result['wall_time']:.1f} s)")
+        results = [computed[key] if result is None else result for key, result in zip(keys, results)]
+    return results
+
+
+def format_config(config):
+    return ", ".join(f"{name}={config[name]:.4g}" if isinstance(config[name], float) else f"{name}={config[name]}"
+                     for name in sorted(config))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Sweep the training options of the wine classifier in parallel, caching each result.")
+    parser.add_argument('--n-starts', type=int, nargs='+', default=[DEFAULT_CONFIG['n_starts']],
+        help=f"numbers of random starting points.(default={DEFAULT_CONFIG['n_starts']})")
+    parser.add_argument('--start-seed', type=int, nargs='+', default=[DEFAULT_CONFIG['seed']],
+        help=f"seeds used to draw starting points.(default={DEFAULT_CONFIG['seed']})")
+    parser.add_argument('--learning-rate', type=float, nargs='+', default=[DEFAULT_CONFIG['learning_rate']],
+        help=f"learning rates.(default={DEFAULT_CONFIG['learning_rate']})")
+    parser.add_argument('--minibatch-size', type=int, nargs='+', default=[DEFAULT_CONFIG['minibatch_size']],
+        help=f"minibatch sizes.(default={DEFAULT_CONFIG['minibatch_size']})")
+    parser.add_argument('--tolerance', type=float, nargs='+', default=[DEFAULT_CONFIG['tolerance']],
+        help=f"training tolerances.(default={DEFAULT_CONFIG['tolerance']})")
+    parser.add_argument('--n-measurements', type=int, nargs='+', default=[DEFAULT_CONFIG['n_measurements']],
+        help=f"numbers of measurements used to estimate probabilities.(default={DEFAULT_CONFIG['n_measurements']})")
+    parser.add_argument('--max-epochs', type=int, nargs='+', default=[DEFAULT_CONFIG['max_epochs']],
+        help=f"numbers of epochs.(default={DEFAULT_CONFIG['max_epochs']})")
+    parser.add_argument('-r', '--random', type=int, default=None,
+        help='draw this many configurations at random, rather than sweeping the whole grid.(default: grid)')
+    parser.add_argument('--seed', type=int, default=None,
+        help='seed for drawing random configurations.(default: random)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+        help='number of worker processes, or 0 to use all cores.(default=0)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+        help=f'directory in which to cache results.(default={DEFAULT_CACHE_DIR})')
+    parser.add_argument('-o', '--output', default=None,
+        help='JSON file to write all results to, best first.(default: none)')
+    args = parser.parse_args()
+
+    options = {
+        'n_starts': args.n_starts,
+        'seed': args.start_seed,
+        'learning_rate': args.learning_rate,
+        'minibatch_size': args.minibatch_size,
+        'tolerance': args.tolerance,
+        'n_measurements': args.n_measurements,
+        'max_epochs': args.max_epochs
+    }
+    if args.random is None:
+        configs = grid_configs(options)
+    else:
+        configs = random_configs(options, args.random, np.random.default_rng(args.seed))
+
+    start = time.perf_counter()
+    results = run_sweep(configs, args.jobs, args.cache_dir)
+    n_failed = sum('error' in result for result in results)
+    print(f"Swept {len(configs) - n_failed} configurations in {time.perf_counter() - start:.1f} s"
+          + (f"; {n_failed} failed." if n_failed else "."))
+
+    results = [result for result in results if 'error' not in result]
+    results.sort(key=lambda result: (result['miss_rate'], result['training_misses']))
+    for result in results[:5]:
+        print(f"Miss rate {result['miss_rate']:0.2%}: {format_config(result['config'])}")
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
@@ -10,28 +10,71 @@
 
 import math
 import numpy as np
-from matplotlib import pyplot as plt
 
 # Return n chebyshev nodes on the interval (a,b)
 def _get_chebyshev_nodes(n, a, b):
-    nodes = [.5 * (a + b) + .5 * (b - a) * math.cos((2 * k + 1) / (2. * n) * math.pi)
-             for k in range(n)]
-    return nodes
-
-# Return the error on given nodes of a polynomial with coefficients poly_coeff
-# approximating the function with function values exact_values (on these nodes).
-def _get_errors(exact_values, poly_coeff, nodes):
-    ys = np.polyval(poly_coeff, nodes)
-    for i in range(len(ys)):
-        ys[i] = abs(ys[i] - exact_values[i])
-    return ys
+    k = np.arange(n)
+    return .5 * (a + b) + .5 * (b - a) * np.cos((2 * k + 1) / (2. * n) * math.pi)
+
+# Evaluate fun on an array of points. Functions that only accept scalars,
+# such as math.sin, are evaluated point by point instead.
+def _evaluate(fun, x):
+    try:
+        values = np.asarray(fun(x), dtype=float)
+        if values.shape == x.shape:
+            return values
+    except (TypeError, ValueError):
+        # e.g. `1 if x > 0 else 0` raises ValueError on arrays
+        pass
+    return np.vectorize(fun, otypes=[float])(x)
+
+# Return the powers of x that make up the polynomial: 0, 1, ..., d in
+# general, and only the odd or even powers up to 2*d+1 or 2*d otherwise.
+def _get_exponents(d, odd, even):
+    if odd:
+        return 2 * np.arange(d + 1) + 1
+    if even:
+        return 2 * np.arange(d + 1)
+    return np.arange(d + 1)
+
+# Return the indices of the local maxima of errs, including either end of
+# the array if the error decreases away from it.
+def _get_maximum_indices(errs):
+    is_maximum = np.empty(len(errs), dtype=bool)
+    is_maximum[0] = errs[0] > errs[1]
+    is_maximum[-1] = errs[-1] > errs[-2]
+    is_maximum[1:-1] = (errs[1:-1] > errs[:-2]) & (errs[1:-1] > errs[2:])
+    return np.flatnonzero(is_maximum)
+
+# Return the points of maximal error near the given maxima on the mesh, by
+# moving each interior maximum to the vertex of the parabola through the
+# errors at it and at its two neighbours. Maxima at either end of the mesh
+# are at the ends of the interval, and stay there.
+def _refine_maxima(mesh, errs, indices):
+    points = mesh[indices].copy()
+    interior = np.flatnonzero((indices > 0) & (indices < len(mesh) - 1))
+    i = indices[interior]
+    x0, x1, x2 = mesh[i - 1], mesh[i], mesh[i + 1]
+    y0, y1, y2 = errs[i - 1], errs[i], errs[i + 1]
+    denominator = (x0 - x1) * (x0 - x2) * (x1 - x2)
+    p = (x2 * (y1 - y0) + x1 * (y0 - y2) + x0 * (y2 - y1)) / denominator
+    q = (x2 * x2 * (y0 - y1) + x1 * x1 * (y2 - y0) + x0 * x0 * (y1 - y2)) / denominator
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vertex = -q / (2 * p)
+    # keep the mesh point wherever the parabola is degenerate or its vertex
+    # lies outside of the neighbourhood of the maximum
+    valid = (p < 0) & (vertex > np.minimum(x0, x2)) & (vertex < np.maximum(x0, x2))
+    points[interior[valid]] = vertex[valid]
+    return points
 
 """
 Return the coefficients of a polynomial of degree d approximating
 the function fun on the interval (a,b).
 
 Args:
-    fun: Function to approximate
+    fun: Function to approximate. Functions accepting and returning NumPy
+        arrays, such as np.sin, are evaluated on all points at once; other
+        functions, such as math.sin, are evaluated point by point.
     a: Left interval border
     b: Right interval border
     d: The polynomial degree will be d, 2*d or 2*d + 1 depending
@@ -39,78 +82,79 @@ Args:
     odd: If True, use odd polynomial of degree 2*d+1
     even: If True, use even polynomial of degree 2*d
     tol: Tolerance to use when checking for convergence
+    refine: If True, locate the points of maximal error between the points
+        of the error mesh rather than only at them, and measure the error
+        there too, which gives a slightly smaller and exactly measured error
+        for one more evaluation of fun per iteration
+    plot: If True, plot the approximation error once done
+    max_iterations: Maximum number of iterations to run
 
 Returns: Tuple where the first entry is the achieved absolute error
     and the second entry is a list of the polynomial coefficients in
     the order that is required by the QDK Numerics library. This is
     the inverse order compared to what np.polyval expects.
 """
-def run_remez(fun, a, b, d=5, odd=False, even=False, tol=1.e-13):
-    finished = False
+def run_remez(fun, a, b, d=5, odd=False, even=False, tol=1.e-13, refine=False, plot=False, max_iterations=50):
+    exponents = _get_exponents(d, odd, even)
     # initial set of points for the interpolation
     cn = _get_chebyshev_nodes(d + 2, a, b)
-    # mesh on which we'll evaluate the error
-    cn2 = _get_chebyshev_nodes(100 * d, a, b)
-
-    # do at most 50 iterations and cancel if we "lose" an interpolation
-    # point
+    fun_cn = _evaluate(fun, cn)
+    # mesh on which we'll evaluate the error, including both ends of the
+    # interval, where the error is often largest; the function values on
+    # the mesh are the same in every iteration, so we only compute them once
+    cn2 = np.concatenate(([b], _get_chebyshev_nodes(100 * d, a, b), [a]))
+    fun_cn2 = _evaluate(fun, cn2)
+
+    # cancel if we "lose" an interpolation point
+    finished = False
     it = 0
-    while not finished and len(cn) == d + 2 and it < 50:
+    while not finished and len(cn) == d + 2 and it < max_iterations:
         it += 1
         # set up the linear system of equations for Remez' algorithm
-        b = np.array([fun(c) for c in cn])
-        A = np.matrix(np.zeros([d + 2,d + 2]))
-        for i in range(d + 2):
-            x = 1.
-            if odd:
-                x *= cn[i]
-            for j in range(d + 2):
-                A[i, j] = x
-                x *= cn[i]
-                if odd or even:
-                    x *= cn[i]
-            A[i, -1] = (-1)**(i + 1)
+        A = np.empty([d + 2, d + 2])
+        A[:, :-1] = cn[:, np.newaxis] ** exponents
+        A[:, -1] = -(-1.) ** np.arange(d + 2)
         # this will give us a polynomial interpolation
-        res = np.linalg.solve(A, b)
+        res = np.linalg.solve(A, fun_cn)
 
         # add padding for even/odd polynomials
-        revlist = reversed(res[0:-1])
-        sc_coeff = []
-        for c in revlist:
-            sc_coeff.append(c)
-            if odd or even:
-                sc_coeff.append(0)
-        if even:
-            sc_coeff = sc_coeff[0:-1]
+        sc_coeff = np.zeros(exponents[-1] + 1)
+        sc_coeff[exponents[-1] - exponents] = res[:-1]
         # evaluate the approximation error
-        errs = _get_errors([fun(c) for c in cn2], sc_coeff, cn2)
-        maximum_indices = []
+        errs = np.abs(np.polyval(sc_coeff, cn2) - fun_cn2)
+        err = np.max(errs)
 
         # determine points of locally maximal absolute error
-        if errs[0] > errs[1]:
-            maximum_indices.append(0)
-        for i in range(1, len(errs) - 1):
-            if errs[i] > errs[i-1] and errs[i] > errs[i+1]:
-                maximum_indices.append(i)
-        if errs[-1] > errs[-2]:
-            maximum_indices.append(-1)
+        maximum_indices = _get_maximum_indices(errs)
+        if not len(maximum_indices):
+            # the error has no strict local maxima, e.g. because the
+            # polynomial fits fun exactly: there is nothing left to improve
+            break
 
         # and choose those as new interpolation points
-        # if not converged already.
-        finished = True
-        for idx in maximum_indices[1:]:
-            if abs(errs[idx] - errs[maximum_indices[0]]) > tol:
-                finished = False
-
-        cn = [cn2[i] for i in maximum_indices]
-
-    # plot approximation error for illustration
-    plt.plot(cn2, abs(errs))
-    plt.title("Plot of the approximation error")
-    plt.xlabel('x')
-    plt.ylabel('|poly_fit(x) - f(x)|')
-    plt.show()
-    return (max(abs(errs)), list(reversed(res[0:-1])))
+        if refine:
+            cn = _refine_maxima(cn2, errs, maximum_indices)
+            fun_cn = _evaluate(fun, cn)
+            maximum_errs = np.abs(np.polyval(sc_coeff, cn) - fun_cn)
+            err = max(err, np.max(maximum_errs))
+        else:
+            cn = cn2[maximum_indices]
+            fun_cn = fun_cn2[maximum_indices]
+            maximum_errs = errs[maximum_indices]
+
+        # if not converged already, i.e. unless the error is the same at
+        # every maximum.
+        finished = bool(np.all(np.abs(maximum_errs - maximum_errs[0]) <= tol))
+
+    if plot:
+        # plot approximation error for illustration
+        from matplotlib import pyplot as plt
+        plt.plot(cn2, errs)
+        plt.title("Plot of the approximation error")
+        plt.xlabel('x')
+        plt.ylabel('|poly_fit(x) - f(x)|')
+        plt.show()
+    return (err, list(reversed(res[0:-1])))
 
 
 if __name__ == "__main__":
@@ -132,7 +176,7 @@ if __name__ == "__main__":
     degree = 3
 
     # run Remez' algorithm
-    err, coeffs = run_remez(f, a, b, degree, odd, even)
+    err, coeffs = run_remez(f, a, b, degree, odd, even, plot=True)
 
     # and output the coefficients & achieved approximation error
     oddEvenStr = ""
@@ -0,0 +1,186 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python script computes polynomial approximations for many functions
+# at once, using Remez's algorithm as implemented by `run_remez` in
+# remez.py, and running the approximations in parallel across a pool of
+# worker processes.
+#
+# Approximations are described by a JSON file listing one job per entry, e.g.:
+#
+#     [
+#         {"function": "sin", "a": 0, "b": 3.14159, "degree": 3, "odd": true},
+#         {"function": "np.exp(-x**2)", "a": 0, "b": 4, "target_error": 1e-6, "max_degree": 8}
+#     ]
+#
+# Functions are given either by the name of a NumPy function, or as an
+# expression in x using `np` and `math`. Expressions are evaluated with
+# Python's eval, so only run job files that you trust. Jobs with a "degree" are fit by a
+# single polynomial of that degree; jobs with a "target_error" instead
+# split their interval into pieces until each piece is fit to within that
+# error by a polynomial of degree at most "max_degree", using the lowest
+# such degree on each piece. Optional keys are "odd", "even" and "tol", as
+# for `run_remez`. Jobs that fail, e.g. because their function cannot be
+# evaluated, are reported with an "error" instead of pieces, rather than
+# stopping the other jobs.
+#
+# Each fit is cached on disk, keyed by everything that determines it, so
+# that rebuilding the same coefficients never recomputes a fit:
+#
+#     python remez_batch.py jobs.json --output coefficients.json --jobs 0
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from remez import run_remez
+
+# Increment whenever run_remez changes in a way that changes its results,
+# so that fits cached by earlier versions are recomputed.
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = ".remez-cache"
+# Intervals are never split into pieces narrower than this fraction of the
+# original interval.
+MIN_PIECE_FRACTION = 2. ** -20
+
+def make_function(expression):
+    """
+    Returns the function described by a given expression: either the name
+    of a NumPy function, such as "sin", or an expression in x, such as
+    "np.exp(-x**2)". Expressions are passed to eval, so they must come
+    from a trusted source.
+    """
+    if isinstance(getattr(np, expression, None), np.ufunc):
+        return getattr(np, expression)
+    code = compile(expression, "<function>", "eval")
+    return lambda x: eval(code, {'np': np, 'math': math, 'x': x})
+
+def cache_key(function, a, b, degree, odd=False, even=False, tol=1.e-13):
+    description = {
+        'cache_version': CACHE_VERSION,
+        'function': function,
+        'interval': [float(a), float(b)],
+        'degree': int(degree),
+        'odd': bool(odd),
+        'even': bool(even),
+        'tol': float(tol)
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+def cached_remez(cache_dir, function, a, b, degree, odd=False, even=False, tol=1.e-13):
+    """
+    Returns a dictionary holding the error and coefficients of the
+    approximation found by run_remez, reading it from cache_dir if it has
+    been computed before, and adding it to cache_dir otherwise.
+    """
+    path = os.path.join(cache_dir, cache_key(function, a, b, degree, odd, even, tol) + ".json")
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    err, coeffs = run_remez(make_function(function), a, b, degree, odd, even, tol)
+    fit = {
+        'a': float(a), 'b': float(b), 'degree': int(degree),
+        'error': float(err), 'coefficients': [float(c) for c in coeffs]
+    }
+    # Write to a temporary file first, so that other workers never read a
+    # partially written fit.
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix=".staging-")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(fit, f)
+    os.replace(temp_path, path)
+    return fit
+
+def fit_piecewise(cache_dir, function, a, b, target_error, max_degree, odd=False, even=False, tol=1.e-13):
+    """
+    Returns a list of fits, one for each piece of the interval (a,b), such
+    that each piece is approximated to within target_error by a polynomial
+    of the lowest degree at most max_degree that achieves it. Pieces that
+    cannot be approximated well enough are split in half.
+    """
+    min_width = (b - a) * MIN_PIECE_FRACTION
+    pieces = []
+    intervals = [(a, b)]
+    while intervals:
+        left, right = intervals.pop()
+        for degree in range(1, max_degree + 1):
+            fit = cached_remez(cache_dir, function, left, right, degree, odd, even, tol)
+            if fit['error'] <= target_error:
+                break
+        if fit['error'] > target_error and right - left > 2 * min_width:
+            middle = .5 * (left + right)
+            # Push the right half first, so that pieces come out in order.
+            intervals += [(middle, right), (left, middle)]
+        else:
+            pieces.append(fit)
+    return pieces
+
+def run_job(job):
+    """
+    Runs a single approximation job, as described at the top of this file,
+    returning the job together with the list of fits for its pieces, or
+    with an error message describing why it failed.
+    """
+    job, cache_dir = job
+    try:
+        options = {key: job[key] for key in ('odd', 'even', 'tol') if key in job}
+        if 'target_error' in job:
+            pieces = fit_piecewise(
+                cache_dir, job['function'], job['a'], job['b'],
+                job['target_error'], job.get('max_degree', 10), **options
+            )
+        else:
+            pieces = [cached_remez(cache_dir, job['function'], job['a'], job['b'], job['degree'], **options)]
+    except Exception as error:
+        return dict(job, error=f"{type(error).__name__}: {error}")
+    return dict(job, pieces=pieces)
+
+def run_jobs(jobs, cache_dir=DEFAULT_CACHE_DIR, max_workers=None):
+    """
+    Runs a list of approximation jobs across a pool of worker processes,
+    returning the results of run_job for each, in order.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run_job, [(job, cache_dir) for job in jobs]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compute polynomial approximations for many functions in parallel, using Remez's algorithm.")
+    parser.add_argument('jobs', help='JSON file listing the approximations to compute.')
+    parser.add_argument('-o', '--output', default='coefficients.json',
+        help='JSON file to write the coefficients to.(default=coefficients.json)')
+    parser.add_argument('-j', '--jobs', dest='n_jobs', type=int, default=1,
+        help='number of worker processes, or 0 to use all cores.(default=1)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+        help=f'directory in which to cache fits.(default={DEFAULT_CACHE_DIR})')
+    args = parser.parse_args()
+
+    with open(args.jobs, 'r') as f:
+        jobs = json.load(f)
+
+    start = time.perf_counter()
+    results = run_jobs(jobs, args.cache_dir, args.n_jobs or None)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for result in results:
+        if 'error' in result:
+            print(f"{result.get('function')}: failed, {result['error']}")
+            continue
+        errors = [piece['error'] for piece in result['pieces']]
+        degrees = [piece['degree'] for piece in result['pieces']]
+        print(f"{result['function']} on ({result['a']}, {result['b']}): {len(errors)} piece(s) "
+              f"of degree {min(degrees)}-{max(degrees)}, max. error {max(errors):.3e}")
+    n_failed = sum('error' in result for result in results)
+    print(f"Computed {len(results) - n_failed} approximations in {time.perf_counter() - start:.2f} s"
+          + (f"; {n_failed} failed." if n_failed else "."))
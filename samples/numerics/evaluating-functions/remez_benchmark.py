@@ -0,0 +1,110 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python script compares the running time of `run_remez` in remez.py
+# against the original, element-by-element implementation of Remez's
+# algorithm, which is kept below as `run_remez_reference` (without its
+# plot), and checks that both find the same approximation error.
+#
+# To run the benchmark, e.g. for odd approximations of sin(x) on (0, pi):
+#
+#     python remez_benchmark.py --degrees 3 5 10 20 30 --repeats 3
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from remez import run_remez
+
+def _get_chebyshev_nodes(n, a, b):
+    nodes = [.5 * (a + b) + .5 * (b - a) * math.cos((2 * k + 1) / (2. * n) * math.pi)
+             for k in range(n)]
+    return nodes
+
+def _get_errors(exact_values, poly_coeff, nodes):
+    ys = np.polyval(poly_coeff, nodes)
+    for i in range(len(ys)):
+        ys[i] = abs(ys[i] - exact_values[i])
+    return ys
+
+def run_remez_reference(fun, a, b, d=5, odd=False, even=False, tol=1.e-13):
+    finished = False
+    cn = _get_chebyshev_nodes(d + 2, a, b)
+    cn2 = _get_chebyshev_nodes(100 * d, a, b)
+
+    it = 0
+    while not finished and len(cn) == d + 2 and it < 50:
+        it += 1
+        b = np.array([fun(c) for c in cn])
+        A = np.matrix(np.zeros([d + 2,d + 2]))
+        for i in range(d + 2):
+            x = 1.
+            if odd:
+                x *= cn[i]
+            for j in range(d + 2):
+                A[i, j] = x
+                x *= cn[i]
+                if odd or even:
+                    x *= cn[i]
+            A[i, -1] = (-1)**(i + 1)
+        res = np.linalg.solve(A, b)
+
+        revlist = reversed(res[0:-1])
+        sc_coeff = []
+        for c in revlist:
+            sc_coeff.append(c)
+            if odd or even:
+                sc_coeff.append(0)
+        if even:
+            sc_coeff = sc_coeff[0:-1]
+        errs = _get_errors([fun(c) for c in cn2], sc_coeff, cn2)
+        maximum_indices = []
+
+        if errs[0] > errs[1]:
+            maximum_indices.append(0)
+        for i in range(1, len(errs) - 1):
+            if errs[i] > errs[i-1] and errs[i] > errs[i+1]:
+                maximum_indices.append(i)
+        if errs[-1] > errs[-2]:
+            maximum_indices.append(-1)
+
+        finished = True
+        for idx in maximum_indices[1:]:
+            if abs(errs[idx] - errs[maximum_indices[0]]) > tol:
+                finished = False
+
+        cn = [cn2[i] for i in maximum_indices]
+
+    return (max(abs(errs)), list(reversed(res[0:-1])))
+
+def best_time(run, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the vectorized Remez implementation against the original one.")
+    parser.add_argument('--degrees', type=int, nargs='+', default=[3, 5, 10, 15, 20, 25, 30],
+        help='polynomial degrees to benchmark.(default=3 5 10 15 20 25 30)')
+    parser.add_argument('--repeats', type=int, default=3,
+        help='number of times to run each implementation, keeping the fastest.(default=3)')
+    args = parser.parse_args()
+
+    # Odd approximations of sin(x) on (0, pi), as in remez.py; the reference
+    # implementation evaluates math.sin point by point, while the vectorized
+    # one evaluates np.sin on whole arrays.
+    a, b = 0., math.pi
+    print(f"{'degree':>6} {'reference (s)':>14} {'vectorized (s)':>15} {'speedup':>8} {'error':>12} {'difference':>11}")
+    for degree in args.degrees:
+        reference_time, (reference_err, _) = best_time(
+            lambda: run_remez_reference(math.sin, a, b, degree, odd=True), args.repeats)
+        vectorized_time, (err, _) = best_time(
+            lambda: run_remez(np.sin, a, b, degree, odd=True), args.repeats)
+        print(f"{degree:>6} {reference_time:14.4f} {vectorized_time:15.4f} {reference_time / vectorized_time:7.1f}x "
+              f"{err:12.3e} {abs(err - reference_err):11.1e}")
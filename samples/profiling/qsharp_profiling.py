@@ -0,0 +1,560 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module profiles the calls that Python host programs make to
+# Q# operations, such as FindOrder.simulate(...), to show where the time of
+# each call goes.
+#
+# To profile a host program, run it with the run command of this module,
+# which runs it after arranging for every call to simulate,
+# estimate_resources or toffoli_simulate to be recorded, and writes the
+# profile to the given file when the program exits:
+#
+#     python qsharp_profiling.py run --output profile.json host.py --jobs 4
+#
+# The profiler is installed when qsharp is first imported, both in the
+# program and in any worker processes it starts, by the sitecustomize
+# module in startup/, which run puts on PYTHONPATH. Setting PYTHONPATH to
+# that folder, and the environment variable QSHARP_PROFILE to the path of
+# the profile, has the same effect without the run command:
+#
+#     PYTHONPATH=path/to/profiling/startup QSHARP_PROFILE=profile.json python host.py
+#
+# The profile gives, for each operation, the number of calls and errors,
+# histograms of the latency of each call and of its phases, and histograms
+# of the sizes of the request sent to the IQ# kernel and of its response.
+# The phases are:
+# - serialization: converting the arguments of the operation to JSON,
+# - kernel round-trip: sending the request to the kernel and receiving
+#   its replies, excluding the time spent simulating,
+# - simulation: the time the kernel was busy with the request, as given
+#   by the timestamps of its status messages,
+# - decoding: converting the result from JSON back to Python values.
+# If the path ends with .trace.json, a trace in the Chrome trace event
+# format is written instead, with one event per call and per phase, which
+# can be opened with chrome://tracing or https://ui.perfetto.dev.
+#
+# Worker processes started by a host program write their own profiles,
+# with their process ID added to the file name. To merge them, and print a
+# summary of a profile, run e.g.:
+#
+#     python qsharp_profiling.py merge merged.json profile.json profile.*.json
+#     python qsharp_profiling.py show merged.json
+
+import bisect
+import datetime
+import functools
+import importlib.abc
+import importlib.util
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import runpy
+import sys
+import threading
+import time
+
+ENVIRONMENT_VARIABLE = 'QSHARP_PROFILE'
+# The folder holding the sitecustomize module that installs the profiler in
+# every process started with it on PYTHONPATH.
+STARTUP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup')
+TRACE_SUFFIX = '.trace.json'
+
+# The methods of Q# callables that run them in the kernel.
+METHODS = ('simulate', 'estimate_resources', 'toffoli_simulate')
+PHASES = ('serialization', 'kernel round-trip', 'simulation', 'decoding')
+
+# Upper bounds of the buckets of latency histograms, in seconds, from 1 µs
+# to about an hour in steps of a quarter of an octave, and of size
+# histograms, in bytes.
+LATENCY_BOUNDS = tuple(1e-6 * 2 ** (k / 4) for k in range(128))
+SIZE_BOUNDS = tuple(2 ** k for k in range(41))
+
+_profiler = None
+
+
+class Histogram:
+    """Counts values in buckets with the given upper bounds, and one more
+    bucket for larger values, together with their count, sum and range.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Returns an upper bound of the q-quantile of the values, given by
+        the bucket it falls in.
+        """
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.bounds + (self.max,), self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count, 'sum': self.sum, 'min': self.min, 'max': self.max,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+            'bounds': list(self.bounds), 'counts': self.counts
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(tuple(data['bounds']))
+        histogram.counts = list(data['counts'])
+        histogram.count, histogram.sum = data['count'], data['sum']
+        histogram.min, histogram.max = data['min'], data['max']
+        return histogram
+
+    def merge(self, other):
+        if other.bounds != self.bounds:
+            raise ValueError("Cannot merge histograms with different buckets.")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+
+class OperationStats:
+    """The calls, errors, latencies and payload sizes of one operation."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.methods = {}
+        self.latency = {phase: Histogram(LATENCY_BOUNDS) for phase in ('total',) + PHASES}
+        self.request_bytes = Histogram(SIZE_BOUNDS)
+        self.response_bytes = Histogram(SIZE_BOUNDS)
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'methods': self.methods,
+            'latency': {phase: histogram.to_dict() for phase, histogram in self.latency.items() if histogram.count},
+            'request_bytes': self.request_bytes.to_dict(),
+            'response_bytes': self.response_bytes.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.calls, stats.errors, stats.methods = data['calls'], data['errors'], dict(data['methods'])
+        for phase, histogram in data['latency'].items():
+            stats.latency[phase] = Histogram.from_dict(histogram)
+        stats.request_bytes = Histogram.from_dict(data['request_bytes'])
+        stats.response_bytes = Histogram.from_dict(data['response_bytes'])
+        return stats
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.errors += other.errors
+        for method, count in other.methods.items():
+            self.methods[method] = self.methods.get(method, 0) + count
+        for phase, histogram in other.latency.items():
+            self.latency[phase].merge(histogram)
+        self.request_bytes.merge(other.request_bytes)
+        self.response_bytes.merge(other.response_bytes)
+
+
+def _kernel_time(date):
+    # Jupyter clients give the dates of message headers either as datetime
+    # objects or as ISO 8601 strings.
+    if isinstance(date, str):
+        date = datetime.datetime.fromisoformat(date.replace('Z', '+00:00'))
+    return date.timestamp() if isinstance(date, datetime.datetime) else None
+
+
+class _Call:
+    # The timestamps and payload sizes recorded during a single call.
+    def __init__(self, name, method):
+        self.name, self.method = name, method
+        self.start = time.perf_counter()
+        self.end = self.serialize = self.execute = self.send = self.reply = self.decoded = None
+        self.kernel_busy = self.kernel_idle = None
+        self.request_bytes = self.response_bytes = None
+        self.error = None
+
+    def phases(self):
+        """Returns the duration of each phase that was recorded, in seconds,
+        and the time at which it started.
+        """
+        phases = {'total': (self.start, self.end - self.start)}
+        if self.serialize is not None and self.execute is not None:
+            phases['serialization'] = (self.serialize, self.execute - self.serialize)
+        if self.send is not None and self.reply is not None:
+            round_trip = self.reply - self.send
+            if self.kernel_busy is not None and self.kernel_idle is not None:
+                # The kernel's clock is not ours, so only the duration of
+                # the simulation is known, which we center in the round-trip.
+                simulation = min(max(self.kernel_idle - self.kernel_busy, 0), round_trip)
+                phases['simulation'] = (self.send + (round_trip - simulation) / 2, simulation)
+                round_trip -= simulation
+            phases['kernel round-trip'] = (self.send, round_trip)
+        if self.reply is not None and self.decoded is not None:
+            phases['decoding'] = (self.reply, self.decoded - self.reply)
+        return phases
+
+
+class Profiler:
+    """Records the calls to Q# operations, and writes them to output when
+    dump is called, as a JSON profile, or as a Chrome trace if trace is True.
+    """
+
+    def __init__(self, output=None, trace=False):
+        self.output = output
+        self.trace = trace
+        self.operations = {}
+        self.events = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start = time.time()
+
+    @property
+    def current_call(self):
+        return getattr(self._local, 'call', None)
+
+    def wrap_method(self, method, name):
+        @functools.wraps(method)
+        def wrapper(operation, *args, **kwargs):
+            if self.current_call is not None:
+                # An operation called from within another call is part of it.
+                return method(operation, *args, **kwargs)
+            call = self._local.call = _Call(getattr(operation, '_name', repr(operation)), name)
+            try:
+                return method(operation, *args, **kwargs)
+            except BaseException as error:
+                call.error = type(error).__name__
+                raise
+            finally:
+                call.end = time.perf_counter()
+                self._local.call = None
+                self.record(call)
+        return wrapper
+
+    def wrap_execute_magic(self, execute_magic):
+        @functools.wraps(execute_magic)
+        def wrapper(*args, **kwargs):
+            if self.current_call is not None:
+                self.current_call.serialize = time.perf_counter()
+            return execute_magic(*args, **kwargs)
+        return wrapper
+
+    def wrap_execute(self, execute):
+        @functools.wraps(execute)
+        def wrapper(input, *args, **kwargs):
+            call = self.current_call
+            if call is None:
+                return execute(input, *args, **kwargs)
+            call.execute = time.perf_counter()
+            call.request_bytes = len(input.encode('utf-8'))
+            result = execute(input, *args, **kwargs)
+            call.decoded = time.perf_counter()
+            return result
+        return wrapper
+
+    def wrap_execute_interactive(self, execute_interactive):
+        @functools.wraps(execute_interactive)
+        def wrapper(*args, output_hook=None, **kwargs):
+            call = self.current_call
+            if call is None or output_hook is None:
+                # Without an output hook, the client prints outputs itself,
+                # which we leave as it is.
+                return execute_interactive(*args, output_hook=output_hook, **kwargs)
+
+            def hook(message):
+                header, content = message.get('header', {}), message.get('content', {})
+                msg_type = header.get('msg_type', message.get('msg_type'))
+                if msg_type == 'status':
+                    state = content.get('execution_state')
+                    if state == 'busy' and call.kernel_busy is None:
+                        call.kernel_busy = _kernel_time(header.get('date'))
+                    elif state == 'idle':
+                        call.kernel_idle = _kernel_time(header.get('date'))
+                elif msg_type in ('execute_result', 'display_data'):
+                    size = sum(len(value) for value in content.get('data', {}).values() if isinstance(value, str))
+                    call.response_bytes = (call.response_bytes or 0) + size
+                return output_hook(message)
+
+            call.send = time.perf_counter()
+            try:
+                return execute_interactive(*args, output_hook=hook, **kwargs)
+            finally:
+                call.reply = time.perf_counter()
+        return wrapper
+
+    def record(self, call):
+        phases = call.phases()
+        with self._lock:
+            stats = self.operations.setdefault(call.name, OperationStats())
+            stats.calls += 1
+            stats.errors += call.error is not None
+            stats.methods[call.method] = stats.methods.get(call.method, 0) + 1
+            for phase, (_, duration) in phases.items():
+                stats.latency[phase].add(duration)
+            if call.request_bytes is not None:
+                stats.request_bytes.add(call.request_bytes)
+            if call.response_bytes is not None:
+                stats.response_bytes.add(call.response_bytes)
+            if self.trace:
+                self.events += self._trace_events(call, phases)
+
+    def _trace_events(self, call, phases):
+        # Complete events, with times in microseconds.
+        thread = threading.get_ident()
+        events = []
+        for phase, (start, duration) in phases.items():
+            event = {
+                'name': call.name if phase == 'total' else phase,
+                'cat': 'qsharp', 'ph': 'X', 'pid': os.getpid(), 'tid': thread,
+                'ts': start * 1e6, 'dur': duration * 1e6
+            }
+            if phase == 'total':
+                event['args'] = {
+                    'method': call.method, 'error': call.error,
+                    'request_bytes': call.request_bytes, 'response_bytes': call.response_bytes
+                }
+            events.append(event)
+        return events
+
+    def to_dict(self):
+        with self._lock:
+            if self.trace:
+                name = {'name': 'process_name', 'ph': 'M', 'pid': os.getpid(), 'args': {'name': ' '.join(sys.argv)}}
+                return {'traceEvents': [name] + self.events, 'displayTimeUnit': 'ms'}
+            return {
+                'meta': {
+                    'argv': sys.argv, 'pid': os.getpid(), 'start': self._start,
+                    'wall_time': time.time() - self._start
+                },
+                'operations': {name: stats.to_dict() for name, stats in sorted(self.operations.items())}
+            }
+
+    def write_at_exit(self):
+        """Arranges for dump to be called when this process exits, including
+        in worker processes forked from it, which only record their own calls.
+        """
+        # Unlike atexit handlers, multiprocessing finalizers also run when
+        # worker processes exit, and forked workers register their own.
+        multiprocessing.util.Finalize(None, self.dump, exitpriority=0)
+        multiprocessing.util.register_after_fork(self, Profiler._after_fork)
+
+    def _after_fork(self):
+        # Forked processes start with a copy of the calls recorded by their
+        # parent, which the parent writes itself.
+        self.operations = {}
+        self.events = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start = time.time()
+        multiprocessing.util.Finalize(None, self.dump, exitpriority=0)
+
+    def dump(self, output=None):
+        """Writes the profile to output, or to the output given when the
+        profiler was created, with the process ID added in worker processes.
+        """
+        output = output or self.output
+        if output is None:
+            return
+        data = self.to_dict()
+        with open(process_output_path(output), 'w') as f:
+            json.dump(data, f)
+
+
+def process_output_path(path):
+    """Returns the path of the profile of this process: path itself for the
+    main process, or path with the process ID added for a worker process.
+    """
+    if multiprocessing.parent_process() is None:
+        return path
+    if path.endswith(TRACE_SUFFIX):
+        return f"{path[:-len(TRACE_SUFFIX)]}.{os.getpid()}{TRACE_SUFFIX}"
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{extension}"
+
+
+def install(output=None, trace=None):
+    """Profiles every call to a Q# operation from this process, writing the
+    profile to output, if given, when the process exits, as a Chrome trace if
+    trace is True or output ends with .trace.json. Returns the
+    profiler, which is shared by every call to install.
+    """
+    global _profiler
+    if _profiler is not None:
+        return _profiler
+    import qsharp
+
+    if trace is None:
+        trace = output is not None and output.endswith(TRACE_SUFFIX)
+    profiler = Profiler(output, trace)
+    callable_class = qsharp.QSharpCallable
+    for method in METHODS:
+        if hasattr(callable_class, method):
+            setattr(callable_class, method, profiler.wrap_method(getattr(callable_class, method), method))
+
+    # The phases of each call are timed by wrapping the internals of the
+    # client, where they exist; otherwise only the total latency is known.
+    client = getattr(qsharp, 'client', None)
+    if hasattr(client, '_execute_magic'):
+        client._execute_magic = profiler.wrap_execute_magic(client._execute_magic)
+    if hasattr(client, '_execute'):
+        client._execute = profiler.wrap_execute(client._execute)
+    kernel_client = getattr(client, 'kernel_client', None)
+    if hasattr(kernel_client, 'execute_interactive'):
+        kernel_client.execute_interactive = profiler.wrap_execute_interactive(kernel_client.execute_interactive)
+
+    profiler.write_at_exit()
+    _profiler = profiler
+    return profiler
+
+
+def install_from_environment():
+    """Calls install if the environment variable QSHARP_PROFILE is set, with
+    the path it gives, and returns the profiler, or None otherwise.
+    """
+    path = os.environ.get(ENVIRONMENT_VARIABLE)
+    if not path:
+        return None
+    return install(path)
+
+
+class _InstallOnImport(importlib.abc.MetaPathFinder):
+    # Finds qsharp with the other finders, and calls install_from_environment
+    # once it has been imported.
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname != 'qsharp':
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(fullname)
+        if spec is None or spec.loader is None:
+            return spec
+        exec_module = spec.loader.exec_module
+
+        def exec_and_install(module):
+            exec_module(module)
+            install_from_environment()
+        spec.loader.exec_module = exec_and_install
+        return spec
+
+
+def install_on_import():
+    """Calls install_from_environment as soon as qsharp is imported, or
+    immediately if it already has been.
+    """
+    if 'qsharp' in sys.modules:
+        install_from_environment()
+    elif not any(isinstance(finder, _InstallOnImport) for finder in sys.meta_path):
+        sys.meta_path.insert(0, _InstallOnImport())
+
+
+def run_program(path, args, output):
+    """Runs the Python program at path with the given command line arguments,
+    as `python path *args` would, profiling it and the processes it starts,
+    and writing the profile to output.
+    """
+    os.environ[ENVIRONMENT_VARIABLE] = os.path.abspath(output)
+    # Worker processes inherit the environment, so they install the profiler
+    # from sitecustomize when they start.
+    os.environ['PYTHONPATH'] = os.pathsep.join(
+        [STARTUP_DIR] + [entry for entry in os.environ.get('PYTHONPATH', '').split(os.pathsep) if entry]
+    )
+    install_on_import()
+    sys.argv = [path] + list(args)
+    sys.path[0] = os.path.dirname(os.path.abspath(path))
+    runpy.run_path(path, run_name='__main__')
+
+
+def merge_profiles(profiles):
+    """Merges profiles loaded from JSON, which are either all JSON profiles
+    or all Chrome traces.
+    """
+    if all('traceEvents' in profile for profile in profiles):
+        return {'traceEvents': [event for profile in profiles for event in profile['traceEvents']],
+                'displayTimeUnit': 'ms'}
+    operations = {}
+    for profile in profiles:
+        if 'operations' not in profile:
+            raise ValueError("Cannot merge JSON profiles with Chrome traces.")
+        for name, data in profile['operations'].items():
+            operations.setdefault(name, OperationStats()).merge(OperationStats.from_dict(data))
+    return {
+        'meta': {'merged': [profile['meta'] for profile in profiles]},
+        'operations': {name: stats.to_dict() for name, stats in sorted(operations.items())}
+    }
+
+
+def print_profile(profile):
+    def milliseconds(value):
+        return f"{value * 1e3:10.3f}" if value is not None else f"{'-':>10}"
+
+    width = max([40] + [len(name) for name in profile['operations']])
+    print(f"{'operation':{width}} {'calls':>7} {'errors':>7} {'phase':>18} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, stats in profile['operations'].items():
+        first = True
+        for phase in ('total',) + PHASES:
+            latency = stats['latency'].get(phase)
+            if latency is None:
+                continue
+            prefix = f"{name:{width}} {stats['calls']:7} {stats['errors']:7}" if first else " " * (width + 16)
+            print(f"{prefix} {phase:>18} {milliseconds(latency['mean'])} "
+                  f"{milliseconds(latency['p50'])} {milliseconds(latency['p99'])}")
+            first = False
+        for direction in ('request', 'response'):
+            sizes = stats[f'{direction}_bytes']
+            if sizes['count']:
+                print(f"{'':{width + 16}} {direction + ' bytes':>18} {sizes['mean']:10.0f} {sizes['p50']:10.0f} {sizes['p99']:10.0f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Profile, merge and summarize profiles of calls to Q# operations.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='run a Python program, profiling its calls to Q# operations.')
+    run_parser.add_argument('--output', '-o', default='profile.json',
+                            help='file in which to write the profile; a Chrome trace if it ends with .trace.json (default=profile.json)')
+    run_parser.add_argument('program', help='Python program to run.')
+    run_parser.add_argument('args', nargs=argparse.REMAINDER, help='arguments of the program.')
+    merge_parser = subparsers.add_parser('merge', help='merge the profiles of several processes.')
+    merge_parser.add_argument('output', help='file in which to write the merged profile.')
+    merge_parser.add_argument('profiles', nargs='+', help='profiles to merge.')
+    show_parser = subparsers.add_parser('show', help='print a summary of a JSON profile.')
+    show_parser.add_argument('profile', help='JSON profile to summarize.')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        # Profile with this module, rather than with the copy of it run as
+        # __main__, so that the program shares its profiler.
+        import qsharp_profiling
+        qsharp_profiling.run_program(args.program, args.args, args.output)
+    elif args.command == 'merge':
+        profiles = []
+        for path in args.profiles:
+            with open(path, 'r') as f:
+                profiles.append(json.load(f))
+        with open(args.output, 'w') as f:
+            json.dump(merge_profiles(profiles), f)
+    else:
+        with open(args.profile, 'r') as f:
+            print_profile(json.load(f))
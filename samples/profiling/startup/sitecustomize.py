@@ -0,0 +1,31 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# Python imports this module when it starts, if this folder is on PYTHONPATH,
+# as `python qsharp_profiling.py run` arranges for the programs it runs and
+# their worker processes. If the environment variable QSHARP_PROFILE is set,
+# the profiler of qsharp_profiling.py is then installed when qsharp is first
+# imported.
+#
+# Python only imports the first sitecustomize module it finds, so this one
+# also runs the sitecustomize module that would otherwise have been
+# imported, if any, such as one installed by the interpreter or distribution.
+
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+_startup_dir = os.path.dirname(os.path.abspath(__file__))
+
+if os.environ.get('QSHARP_PROFILE'):
+    sys.path.append(os.path.dirname(_startup_dir))
+    import qsharp_profiling
+    qsharp_profiling.install_on_import()
+
+_spec = importlib.machinery.PathFinder.find_spec(
+    'sitecustomize', [entry for entry in sys.path if os.path.abspath(entry or os.curdir) != _startup_dir]
+)
+if _spec is not None:
+    _module = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(_module)
@@ -1,7 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-import json
+import argparse
 
 import qsharp
 from Microsoft.Quantum.Samples.GaussianPreparation import RunProgram
@@ -9,43 +9,24 @@ from Microsoft.Quantum.Samples.GaussianPreparation import RunProgram
 import numpy as np
 import matplotlib.pyplot as plt
 
-def main():
-    n_qubits = 7
-    recursive = True
-
-    states = []
-
-    # Add a new message handler to the IQ# client that listens for the output
-    # of DumpMachine and DumpRegister. This will let us make nicer plots
-    # in matplotlib.
-    old_handler = qsharp.client._handle_message
-    def handle_state_dump(message, **kwargs):
-        if message['msg_type'] == 'display_data':
-            data = (
-                # Check both the old and new MIME types used by the IQ#
-                # kernel.
-                json.loads(message['content']['data'].get('application/json', "null")) or
-                json.loads(message['content']['data'].get('application/x-qsharp-data', "null"))
-            )
-            if data is not None and 'amplitudes' in data:
-                states.append(data['amplitudes'])
-                return
-
-        old_handler(message, **kwargs)
-    qsharp.client._handle_message = handle_state_dump
-
-    # Once we have our handlers set up, we can go on and simulate our Q#
-    # program that we use to prepare a Gaussian state.
-    RunProgram.simulate(recursive=recursive, nQubits=n_qubits)
+from state_capture import StateCapture
+
+def main(n_qubits=7, recursive=True, memmap_dir=None):
+    # Capture the output of DumpMachine and DumpRegister into NumPy arrays,
+    # rather than printing it. This will let us make nicer plots in
+    # matplotlib.
+    with StateCapture(memmap_dir=memmap_dir) as capture:
+        # Once we have our capture set up, we can go on and simulate our Q#
+        # program that we use to prepare a Gaussian state.
+        RunProgram.simulate(recursive=recursive, nQubits=n_qubits)
 
     # Read the probability amplitudes from the state we captured out of
     # DumpMachine / DumpRegister.
-    real = [amplitude['Real'] for amplitude in states[0]]
-    imag = [amplitude['Imaginary'] for amplitude in states[0]]
+    state = capture.states[0]
 
     # Plot the resulting state.
-    plt.plot(np.arange(len(real)), real, label='Real')
-    plt.plot(np.arange(len(imag)), imag, label='Imaginary')
+    plt.plot(np.arange(len(state)), state.real, label='Real')
+    plt.plot(np.arange(len(state)), state.imag, label='Imaginary')
     plt.legend()
 
     # Save the plot out to a file and show it to the screen.
@@ -53,4 +34,13 @@ def main():
     plt.show()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description="Prepare a Gaussian state and plot its amplitudes.")
+    parser.add_argument('-n', '--n-qubits', type=int, default=7,
+        help='number of qubits to prepare the state on.(default=7)')
+    parser.add_argument('--iterative', action='store_true', default=False,
+        help='use the iterative rather than the recursive preparation.(default=False)')
+    parser.add_argument('--memmap-dir', default=None,
+        help='directory in which to store the states of large registers as memory-mapped files.(default: keep in memory)')
+    args = parser.parse_args()
+    main(args.n_qubits, not args.iterative, args.memmap_dir)
@@ -0,0 +1,378 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python module defines the benchmarks run by run_benchmarks.py, for the
+# classical hot paths of the Python host programs of the samples, and for
+# the overhead of the Python code orchestrating their calls to Q#.
+#
+# Each benchmark is a function decorated with @benchmark, which prepares its
+# inputs, registers stand-in handlers for the Q# operations it calls, and
+# returns a function taking no arguments to be timed. Q# operations are
+# provided by the stand-in qsharp package in stand_in/, which must be
+# imported before this module, as run_benchmarks.py does.
+
+import atexit
+import contextlib
+import importlib.util
+import io
+import math
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+import warnings
+
+import numpy as np
+
+import qsharp
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+SAMPLES_DIR = os.path.join(REPO_ROOT, 'samples')
+
+# Benchmark setup functions, keyed by name, in the order they are defined.
+BENCHMARKS = {}
+
+_modules = {}
+
+
+def benchmark(name):
+    """Registers a benchmark setup function under the given name."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def load_sample(path, name):
+    """Imports the Python file at path, relative to the root of the
+    repository, as a module with the given name, with its directory on
+    sys.path so that it can import the modules next to it.
+    """
+    if name not in _modules:
+        path = os.path.join(REPO_ROOT, path)
+        directory = os.path.dirname(path)
+        if directory not in sys.path:
+            sys.path.append(directory)
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+        _modules[name] = module
+    return _modules[name]
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def quietly(fun):
+    """Returns a function that calls fun with its standard output discarded,
+    for benchmarks of functions that print their results.
+    """
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fun()
+    return run
+
+
+## Order finding ##
+
+@benchmark('order_finding.permutation_cycles')
+def bench_permutation_cycles():
+    permutation_cycles = load_sample('samples/algorithms/permutation_cycles.py', 'permutation_cycles')
+    perm = np.random.default_rng(42).permutation(1 << 20)
+    return lambda: permutation_cycles.PermutationCycles(perm).permutation_order()
+
+
+@benchmark('order_finding.guesses_from_histogram')
+def bench_guesses_from_histogram():
+    order_finding = load_sample('samples/algorithms/order_finding.py', 'order_finding')
+    histogram = np.random.default_rng(42).integers(0, 1000, size=8)
+    rng = np.random.default_rng(42)
+    return lambda: order_finding.guesses_from_histogram(histogram, rng)
+
+
+def _register_order_finding():
+    namespace = 'Microsoft.Quantum.Samples.OrderFinding'
+    qsharp.register(f'{namespace}.FindOrder', lambda rng, perm, input: rng.randrange(8))
+    qsharp.register(
+        f'{namespace}.FindOrderHistogram',
+        lambda rng, perm, input, shots: np.random.default_rng(rng.getrandbits(64)).multinomial(shots, [1 / 8] * 8).tolist()
+    )
+
+
+@benchmark('order_finding.guess_order')
+def bench_guess_order():
+    _register_order_finding()
+    order_finding = load_sample('samples/algorithms/order_finding.py', 'order_finding')
+    return quietly(lambda: order_finding.guess_order([1, 2, 3, 0], 0, 1024))
+
+
+@benchmark('order_finding.guess_order_batched')
+def bench_guess_order_batched():
+    _register_order_finding()
+    order_finding = load_sample('samples/algorithms/order_finding.py', 'order_finding')
+    return quietly(lambda: order_finding.guess_order_batched([1, 2, 3, 0], 0, 1024, chunk_size=256, seed=42))
+
+
+## Integer factorization ##
+
+@benchmark('integer_factorization.classical_prescreen')
+def bench_classical_prescreen():
+    host = load_sample('samples/algorithms/integer-factorization/host.py', 'integer_factorization_host')
+    numbers = np.random.default_rng(42).integers(1 << 30, 1 << 40, size=256).tolist()
+    return lambda: [host.classical_prescreen(number, 1000) for number in numbers]
+
+
+@benchmark('integer_factorization.factor_integer')
+def bench_factor_integer():
+    trials = iter(range(sys.maxsize))
+
+    def factor(rng, number, useRobustPhaseEstimation):
+        # Every fourth trial finds the factors, and the others fail as
+        # Shor's algorithm can.
+        if next(trials) % 4 != 3:
+            raise qsharp.IQSharpError("The period found is odd.")
+        return next((p, number // p) for p in range(2, number) if number % p == 0)
+
+    qsharp.register('Microsoft.Quantum.Samples.IntegerFactorization.FactorSemiprimeInteger', factor)
+    host = load_sample('samples/algorithms/integer-factorization/host.py', 'integer_factorization_host')
+    return quietly(lambda: host.factor_integers([15, 21, 35, 77, 143, 221], 10, False))
+
+
+## Random number generation ##
+
+def _register_qrng():
+    qsharp.register('Qrng.SampleQuantumRandomNumberGenerator', lambda rng: rng.getrandbits(1))
+    qsharp.register('Qrng.SampleQuantumRandomBits', lambda rng, nBits: [rng.getrandbits(1) for _ in range(nBits)])
+
+
+@benchmark('qrng.getting_started_host')
+def bench_getting_started_qrng():
+    _register_qrng()
+    path = os.path.join(SAMPLES_DIR, 'getting-started', 'qrng', 'host.py')
+    return quietly(lambda: runpy.run_path(path))
+
+
+@benchmark('qrng.interoperability_host')
+def bench_interoperability_qrng():
+    _register_qrng()
+    load_sample('samples/interoperability/qrng/entropy_pool.py', 'entropy_pool')
+    path = os.path.join(SAMPLES_DIR, 'interoperability', 'qrng', 'host.py')
+    return quietly(lambda: runpy.run_path(path))
+
+
+@benchmark('qrng.entropy_pool_integers')
+def bench_entropy_pool():
+    entropy_pool = load_sample('samples/interoperability/qrng/entropy_pool.py', 'entropy_pool')
+    rng = np.random.default_rng(42)
+    source = lambda n_bits: rng.integers(0, 2, size=n_bits, dtype=np.uint8)
+
+    def run():
+        with entropy_pool.QuantumEntropyPool(source, prefetch=False) as pool:
+            pool.integers(0, 1000, size=10_000)
+            pool.random_bytes(4096)
+    return run
+
+
+## Evaluating functions ##
+
+@benchmark('remez.run_remez')
+def bench_run_remez():
+    remez = load_sample('samples/numerics/evaluating-functions/remez.py', 'remez')
+    return quietly(lambda: remez.run_remez(np.sin, 0., 1., 5))
+
+
+## Chemistry ##
+
+def _synthetic_two_electron_rows(n_orbitals, n_rows, seed):
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(1, n_orbitals + 1, size=(n_rows, 4)).tolist()
+    values = rng.normal(size=n_rows).tolist()
+    return [row + [value] for row, value in zip(indices, values)]
+
+
+@benchmark('broombridge.check_integrals')
+def bench_check_integrals():
+    integral_arrays = load_sample('Chemistry/Schema/integral_arrays.py', 'integral_arrays')
+    rows = _synthetic_two_electron_rows(40, 100_000, 42)
+    return lambda: integral_arrays.check_integrals(rows, 'two_electron_integrals', 40)
+
+
+@benchmark('broombridge.validate_file')
+def bench_validate_file():
+    schema_dir = os.path.join(REPO_ROOT, 'Chemistry', 'Schema')
+    validator = load_sample('Chemistry/Schema/validator.py', 'broombridge_validator')
+    instance = os.path.join(SAMPLES_DIR, 'chemistry', 'IntegralData', 'YAML', 'H2_n', 'h2_8_sto6g_1.0au.yaml')
+    with working_directory(schema_dir):
+        validator.load_validators([validator.broombridge_v0_1, validator.broombridge_v0_2], validator.broombridge_v0_2)
+    return lambda: validator.validate_file(instance, arrays=True)
+
+
+def _fermion_term_type(indices):
+    n_distinct = len(set(indices))
+    if len(indices) == 2:
+        return 'PP' if n_distinct == 1 else 'PQ'
+    return {3: 'PQQR', 4: 'PQRS'}.get(n_distinct, 'PQQP')
+
+
+def _register_chemistry():
+    # Stands in for the kernel loading Broombridge files, parsing each file
+    # once. The fermion Hamiltonian of a problem has a term of the type of
+    # each integral for each spin, which is as many terms as the real one
+    # has, but not the same coefficients.
+    import yaml
+    files = {}
+
+    def load_broombridge(rng, file_name):
+        path = os.path.abspath(file_name)
+        if path not in files:
+            with open(path, 'r') as f:
+                files[path] = {'problem_description': yaml.safe_load(f)['integral_sets']}
+        return files[path]
+
+    def load_fermion_hamiltonian(rng, problem_description, index_convention):
+        n_orbitals = problem_description['n_orbitals']
+        if index_convention == 'UpDown':
+            spin_orbital = lambda index, spin: 2 * index + spin
+        else:
+            spin_orbital = lambda index, spin: index + spin * n_orbitals
+        terms = {}
+        for name in ('one_electron_integrals', 'two_electron_integrals'):
+            for *indices, value in problem_description['hamiltonian'][name]['values']:
+                for spin in (0, 1):
+                    term = [spin_orbital(index - 1, spin) for index in indices]
+                    terms.setdefault(_fermion_term_type(indices), []).append((term, value))
+        return list(terms.items())
+
+    qsharp.register('qsharp.chemistry.load_broombridge', load_broombridge)
+    qsharp.register('qsharp.chemistry.load_fermion_hamiltonian', load_fermion_hamiltonian)
+
+
+@benchmark('analyze_hamiltonian.host')
+def bench_analyze_hamiltonian_host():
+    _register_chemistry()
+    sample_dir = os.path.join(SAMPLES_DIR, 'chemistry', 'AnalyzeHamiltonian')
+    path = os.path.join(sample_dir, 'host.py')
+
+    def run():
+        with working_directory(sample_dir):
+            runpy.run_path(path)
+    return quietly(run)
+
+
+@benchmark('analyze_hamiltonian.term_statistics')
+def bench_term_statistics():
+    batch_analyze = load_sample('samples/chemistry/AnalyzeHamiltonian/batch_analyze.py', 'batch_analyze')
+    coefficients = np.random.default_rng(42).normal(scale=1e-3, size=1 << 20).tolist()
+    return lambda: batch_analyze.term_statistics(coefficients, 1e-4)
+
+
+## Machine learning ##
+
+@benchmark('half_moons.load_dataset')
+def bench_load_dataset():
+    dataset = load_sample('samples/machine-learning/half-moons/dataset.py', 'dataset')
+    json_path = os.path.join(SAMPLES_DIR, 'machine-learning', 'half-moons', 'data.json')
+    cache_dir = tempfile.mkdtemp(prefix='benchmark-datasets-')
+    atexit.register(shutil.rmtree, cache_dir, ignore_errors=True)
+    dataset.load_dataset(json_path, cache_dir)
+    # Loads from the converted cache, as every run after the first does.
+    return lambda: dataset.load_dataset(json_path, cache_dir, mmap=False)
+
+
+@benchmark('half_moons.confusion_masks')
+def bench_confusion_masks():
+    load_sample('samples/machine-learning/half-moons/dataset.py', 'dataset')
+    classify = load_sample('samples/machine-learning/half-moons/classify.py', 'classify')
+    rng = np.random.default_rng(42)
+    actual, classified = rng.integers(0, 2, size=(2, 1 << 20))
+    return lambda: classify.confusion_masks(actual, classified)
+
+
+@benchmark('half_moons.host')
+def bench_half_moons_host():
+    # Plots without a display, and without showing the plot.
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    import matplotlib.pyplot as plt
+    load_sample('samples/machine-learning/half-moons/dataset.py', 'dataset')
+    load_sample('samples/machine-learning/half-moons/classify.py', 'classify')
+    namespace = 'Microsoft.Quantum.Samples'
+    qsharp.register(
+        f'{namespace}.TrainHalfMoonModel',
+        lambda rng, trainingVectors, trainingLabels, initialParameters:
+            (initialParameters[rng.randrange(len(initialParameters))], rng.uniform(-0.5, 0.5))
+    )
+    qsharp.register(
+        f'{namespace}.ValidateHalfMoonModel',
+        lambda rng, validationVectors, validationLabels, parameters, bias: rng.uniform(0., 0.2)
+    )
+    qsharp.register(
+        f'{namespace}.ClassifyHalfMoonModel',
+        lambda rng, samples, parameters, bias, tolerance, nMeasurements: [rng.getrandbits(1) for _ in samples]
+    )
+    sample_dir = os.path.join(SAMPLES_DIR, 'machine-learning', 'half-moons')
+    path = os.path.join(sample_dir, 'host.py')
+
+    def run():
+        with working_directory(sample_dir), warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            runpy.run_path(path, run_name='__main__')
+        plt.close('all')
+    return quietly(run)
+
+
+@benchmark('wine.host')
+def bench_wine_host():
+    namespace = 'Microsoft.Quantum.Samples'
+    qsharp.register(f'{namespace}.TrainWineModel', lambda rng: ([rng.uniform(-math.pi, 0.) for _ in range(8)], 0.))
+    qsharp.register(f'{namespace}.ValidateWineModel', lambda rng, parameters, bias: rng.randrange(35))
+    path = os.path.join(SAMPLES_DIR, 'machine-learning', 'wine', 'host.py')
+    return quietly(lambda: runpy.run_path(path, run_name='__main__'))
+
+
+## Reversible logic synthesis ##
+
+@benchmark('reversible_logic.synthesize')
+def bench_synthesize():
+    permutation_synthesis = load_sample(
+        'samples/algorithms/reversible-logic-synthesis/permutation_synthesis.py', 'permutation_synthesis')
+    perm = np.random.default_rng(42).permutation(1 << 10)
+    return lambda: permutation_synthesis.synthesize(perm)
+
+
+@benchmark('reversible_logic.verify_circuit')
+def bench_verify_circuit():
+    permutation_synthesis = load_sample(
+        'samples/algorithms/reversible-logic-synthesis/permutation_synthesis.py', 'permutation_synthesis')
+    bitsliced_simulator = load_sample(
+        'samples/algorithms/reversible-logic-synthesis/bitsliced_simulator.py', 'bitsliced_simulator')
+    perm = np.random.default_rng(42).permutation(1 << 14)
+    gates = permutation_synthesis.synthesize(perm)
+    return lambda: bitsliced_simulator.verify_circuit(gates, perm)
+
+
+## Simulation ##
+
+@benchmark('gaussian_state.parse_state')
+def bench_parse_state():
+    state_capture = load_sample('samples/simulation/gaussian-initial-state/state_capture.py', 'state_capture')
+    n_qubits = 16
+    amplitudes = np.random.default_rng(42).normal(size=(1 << n_qubits, 2)) / math.sqrt(2 << n_qubits)
+    payload = '{"n_qubits": %d, "qubit_ids": %s, "amplitudes": [%s]}' % (
+        n_qubits, list(range(n_qubits)),
+        ', '.join('{"Real": %r, "Imaginary": %r}' % (real, imaginary) for real, imaginary in amplitudes.tolist())
+    )
+    out = np.empty(1 << n_qubits, dtype=np.complex128)
+
+    def run():
+        _, _, chunks = state_capture.parse_state(payload)
+        state_capture.fill_state(chunks, out)
+    return run
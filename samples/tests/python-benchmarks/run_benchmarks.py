@@ -0,0 +1,173 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# This Python script runs the benchmarks defined in benchmarks.py without an
+# IQ# kernel, using the stand-in qsharp package in stand_in/, and compares
+# their results against a baseline.
+#
+# To record a baseline, and later check a change against it, run e.g.:
+#
+#     python run_benchmarks.py run --output baseline.json
+#     python run_benchmarks.py run --output current.json
+#     python run_benchmarks.py compare baseline.json current.json --threshold 0.25
+#
+# compare exits with a nonzero code if any benchmark is slower than in the
+# baseline by more than the threshold. Timings depend on the machine, so
+# baselines should be recorded on the machine that later runs compare.
+
+import argparse
+import datetime
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+# The stand-in must shadow any installed qsharp package before the samples
+# import it.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stand_in'))
+
+import numpy as np
+
+import qsharp
+from benchmarks import BENCHMARKS
+
+
+def time_benchmark(fun, repeat=5, min_time=0.2):
+    """Times fun, calling it in loops that take at least min_time seconds,
+    repeat times. Returns the number of calls per loop, and the list of the
+    times per call of each loop, in seconds.
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fun()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= max(2, min(10, int(min_time / max(elapsed, 1e-9))))
+    times = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fun()
+        times.append((time.perf_counter() - start) / loops)
+    return loops, times
+
+
+def run_benchmarks(pattern='*', repeat=5, min_time=0.2):
+    """Runs every benchmark whose name matches the glob pattern, returning a
+    dictionary of results keyed by name.
+    """
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        try:
+            fun = setup()
+        except ImportError as error:
+            # Benchmarks of samples that need optional packages, such as
+            # Matplotlib, are skipped where those are not installed.
+            print(f"{name:45} skipped, {error}")
+            continue
+        qsharp.call_counts.clear()
+        fun()
+        # Calls to Q# operations per call of fun, which give the cost of
+        # orchestration once multiplied by the latency of the kernel.
+        calls = dict(qsharp.call_counts)
+        loops, times = time_benchmark(fun, repeat, min_time)
+        results[name] = {
+            'min': min(times),
+            'median': statistics.median(times),
+            'loops': loops,
+            'repeat': repeat,
+            'qsharp_calls': calls
+        }
+        print(f"{name:45} {statistics.median(times) * 1e3:10.3f} ms"
+              f"{'  (' + str(sum(calls.values())) + ' Q# calls)' if calls else ''}")
+    return results
+
+
+def compare_results(baseline, current, threshold=0.25):
+    """Compares the median times of the benchmarks in two results files.
+    Returns the list of names of the benchmarks that are slower in current
+    by more than the given fraction.
+    """
+    regressions = []
+    for name in sorted(set(baseline['benchmarks']) | set(current['benchmarks'])):
+        if name not in current['benchmarks']:
+            print(f"{name:45} missing from current results")
+            continue
+        if name not in baseline['benchmarks']:
+            print(f"{name:45} new")
+            continue
+        before = baseline['benchmarks'][name]['median']
+        after = current['benchmarks'][name]['median']
+        ratio = after / before
+        if ratio > 1 + threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            status = "improved"
+        else:
+            status = ""
+        print(f"{name:45} {before * 1e3:10.3f} ms -> {after * 1e3:10.3f} ms  {ratio:6.2f}x  {status}")
+    if baseline['meta'].get('latency') != current['meta'].get('latency'):
+        print("Warning: the results were recorded with different stand-in latencies.")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Python host programs of the samples with a stand-in qsharp package.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks.')
+    run_parser.add_argument('-k', '--pattern', default='*',
+        help='only run benchmarks whose names match this glob pattern.(default=*)')
+    run_parser.add_argument('-r', '--repeat', type=int, default=5,
+        help='number of timed loops of each benchmark.(default=5)')
+    run_parser.add_argument('--min-time', type=float, default=0.2,
+        help='minimum duration of each timed loop, in seconds.(default=0.2)')
+    run_parser.add_argument('--latency', type=float, default=qsharp.latency,
+        help='latency of each call to a stand-in Q# operation, in seconds.'
+             f'(default=$QSHARP_STAND_IN_LATENCY or 0)')
+    run_parser.add_argument('-o', '--output', default=None,
+        help='JSON file in which to write the results.(default: none)')
+
+    compare_parser = subparsers.add_parser('compare', help='compare results against a baseline.')
+    compare_parser.add_argument('baseline', help='JSON file of baseline results.')
+    compare_parser.add_argument('current', help='JSON file of current results.')
+    compare_parser.add_argument('-t', '--threshold', type=float, default=0.25,
+        help='fraction by which a benchmark may be slower than its baseline.(default=0.25)')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        qsharp.configure(latency=args.latency)
+        results = {
+            'meta': {
+                'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'machine': platform.machine(),
+                'cpu_count': os.cpu_count(),
+                'latency': args.latency
+            },
+            'benchmarks': run_benchmarks(args.pattern, args.repeat, args.min_time)
+        }
+        if args.output is not None:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+    else:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        with open(args.current, 'r') as f:
+            current = json.load(f)
+        regressions = compare_results(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}.")
+            sys.exit(1)
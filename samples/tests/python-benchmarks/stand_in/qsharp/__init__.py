@@ -0,0 +1,147 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# A stand-in for the qsharp package, so that the Python host programs of the
+# samples can be imported and benchmarked without an IQ# kernel.
+#
+# Putting the directory containing this package first on sys.path makes
+# `import qsharp` load it instead of the real package. Q# namespaces can
+# then be imported as Python modules, as with the real package, and each
+# operation imported from them is a StandInOperation: calling its simulate
+# method sleeps for a configurable latency, and then returns the result of
+# the handler registered for that operation, if any:
+#
+#     import qsharp
+#     qsharp.register("Microsoft.Quantum.Samples.OrderFinding.FindOrder",
+#                     lambda rng, perm, input: rng.randrange(8))
+#     from Microsoft.Quantum.Samples.OrderFinding import FindOrder
+#     FindOrder.simulate(perm=[1, 2, 3, 0], input=0)
+#
+# Handlers are passed the keyword arguments of the call, and a random.Random
+# seeded from the operation name and those arguments, so that the same call
+# always returns the same result. The latency defaults to the value of the
+# environment variable QSHARP_STAND_IN_LATENCY, in seconds, or 0.
+
+import hashlib
+import importlib.abc
+import importlib.machinery
+import json
+import os
+import random
+import sys
+import threading
+import time
+import types
+from collections import Counter
+
+__version__ = "0.0.0-stand-in"
+
+# Top-level Q# namespaces importable without registering an operation in
+# them first.
+DEFAULT_NAMESPACES = ('Microsoft',)
+
+latency = float(os.environ.get('QSHARP_STAND_IN_LATENCY', '0'))
+call_counts = Counter()
+_handlers = {}
+_lock = threading.Lock()
+
+
+class IQSharpError(RuntimeError):
+    """Raised by handlers to stand in for errors reported by the kernel."""
+
+
+class _Client:
+    # The attributes of qsharp.client used by the samples.
+    display_data_callback = None
+
+
+client = _Client()
+
+
+def reload():
+    pass
+
+
+def configure(latency=None):
+    """Sets the latency, in seconds, of every call to simulate."""
+    if latency is not None:
+        globals()['latency'] = float(latency)
+
+
+def register(name, handler):
+    """Registers a handler for the operation with the given fully qualified
+    name, replacing any previous handler.
+    """
+    with _lock:
+        _handlers[name] = handler
+
+
+def _seed(name, kwargs):
+    description = json.dumps([name, kwargs], sort_keys=True, default=repr)
+    return int.from_bytes(hashlib.sha256(description.encode('utf-8')).digest()[:8], 'little')
+
+
+class StandInOperation:
+    """Stands in for a Q# callable imported from a namespace."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __repr__(self):
+        return f"<stand-in operation {self._name}>"
+
+    def simulate(self, **kwargs):
+        # Options of the qsharp package, rather than arguments of the
+        # operation.
+        kwargs.pop('raise_on_stderr', None)
+        with _lock:
+            call_counts[self._name] += 1
+            handler = _handlers.get(self._name)
+        if latency:
+            time.sleep(latency)
+        if handler is None:
+            return None
+        return handler(random.Random(_seed(self._name, kwargs)), **kwargs)
+
+    # Other ways of running an operation behave in the same way.
+    estimate_resources = toffoli_simulate = simulate
+
+
+# Callables imported from Q# namespaces are instances of this class.
+QSharpCallable = StandInOperation
+
+
+class _NamespaceModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        operation = StandInOperation(f"{self.__name__}.{name}")
+        setattr(self, name, operation)
+        return operation
+
+
+class _NamespaceFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    # Imports any module within a default namespace, or within a namespace
+    # of a registered operation, as a namespace of stand-in operations.
+
+    def _is_namespace(self, fullname):
+        if fullname.split('.')[0] in DEFAULT_NAMESPACES:
+            return True
+        with _lock:
+            return any(name.startswith(fullname + '.') for name in _handlers)
+
+    def find_spec(self, fullname, path=None, target=None):
+        if not self._is_namespace(fullname):
+            return None
+        return importlib.machinery.ModuleSpec(fullname, self, is_package=True)
+
+    def create_module(self, spec):
+        module = _NamespaceModule(spec.name)
+        module.__path__ = []
+        return module
+
+    def exec_module(self, module):
+        pass
+
+
+sys.meta_path.append(_NamespaceFinder())
@@ -0,0 +1,87 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# A stand-in for the qsharp.chemistry module, with the functions and classes
+# used by the chemistry samples.
+#
+# The real module asks the IQ# kernel to load Broombridge files, fermion
+# Hamiltonians and input states, and to encode them for Q#. Here, each of
+# these requests is a call to a stand-in operation named after the function
+# making it, such as "qsharp.chemistry.load_broombridge", which waits for
+# the latency of the stand-in and returns the result of the handler
+# registered for it, if any:
+#
+#     qsharp.register("qsharp.chemistry.load_broombridge",
+#                     lambda rng, file_name: {'problem_description': [...]})
+#
+# Handlers return the data that the kernel would: a dictionary with a list
+# of problem descriptions for load_broombridge, a list of (term type,
+# [(indices, coefficient), ...]) pairs for load_fermion_hamiltonian, and
+# a dictionary for load_input_state and the result for encode. Without a
+# handler, a Broombridge file has no problem descriptions, and a fermion
+# Hamiltonian has no terms.
+
+import enum
+
+from qsharp import StandInOperation
+
+
+class IndexConvention(enum.IntEnum):
+    UpDown = 0
+    HalfUp = 1
+
+
+def _request(name, **kwargs):
+    return StandInOperation(f"{__name__}.{name}").simulate(**kwargs)
+
+
+class FermionHamiltonian:
+    def __init__(self, terms):
+        self.terms = list(terms or [])
+
+
+class InputState:
+    def __init__(self, data):
+        self.__dict__.update(data or {})
+
+
+class ProblemDescription:
+    def __init__(self, data):
+        self.data = data
+        self.__dict__.update(data)
+
+    def load_fermion_hamiltonian(self, index_convention=IndexConvention.UpDown):
+        return FermionHamiltonian(_request(
+            'load_fermion_hamiltonian', problem_description=self.data,
+            index_convention=IndexConvention(index_convention).name
+        ))
+
+    def load_input_state(self, wavefunction_label='', index_convention=IndexConvention.UpDown):
+        return InputState(_request(
+            'load_input_state', problem_description=self.data, wavefunction_label=wavefunction_label,
+            index_convention=IndexConvention(index_convention).name
+        ))
+
+
+class Broombridge:
+    def __init__(self, data):
+        self.problem_description = [ProblemDescription(problem) for problem in (data or {}).get('problem_description', [])]
+
+
+def load_broombridge(file_name):
+    return Broombridge(_request('load_broombridge', file_name=file_name))
+
+
+def load_fermion_hamiltonian(file_name, problem_description_index=0, index_convention=IndexConvention.UpDown):
+    problem = load_broombridge(file_name).problem_description[problem_description_index]
+    return problem.load_fermion_hamiltonian(index_convention)
+
+
+def load_input_state(file_name, wavefunction_label='', problem_description_index=0,
+                     index_convention=IndexConvention.UpDown):
+    problem = load_broombridge(file_name).problem_description[problem_description_index]
+    return problem.load_input_state(wavefunction_label, index_convention)
+
+
+def encode(hamiltonian, input_state):
+    return _request('encode', terms=hamiltonian.terms, input_state=vars(input_state))